@@ -24,6 +24,24 @@ def mass_spring(state, t, K, g):
     return [xd, xdd]
 
 
+def mass_spring_batch(state, t, K, g):
+    '''
+    Vectorized version of mass_spring(); state holds the positions of all
+    systems followed by their velocities, and K and g are arrays
+    '''
+
+    # unpack the state vector
+    num_systems = len(K)
+    x = state[:num_systems]
+    xd = state[num_systems:]
+
+    # compute acceleration xdd
+    xdd = -K * x + g
+
+    # return the stacked state derivatives
+    return np.concatenate((xd, xdd))
+
+
 #------------------------------------------------------
 
 class SpringMassModel(BaseModel):
@@ -55,6 +73,18 @@ class SpringMassModel(BaseModel):
         # return acc
         return results[:, 0]
 
+    def evaluate_batch(self, param_matrix, param_names):
+        '''
+        Simulate spring mass systems for many parameter sets with a single
+        call to the integrator. Returns the position at all points in the time
+        grid for each parameter set (one row per set).
+        '''
+        K = param_matrix[:, param_names.index('K')]
+        g = param_matrix[:, param_names.index('g')]
+        state0 = np.repeat(self._state0, len(K))
+        results = odeint(mass_spring_batch, state0, self._t, args=(K, g))
+        return results[:, :len(K)].T
+
 
 if __name__ == '__main__':
 
@@ -18,7 +18,8 @@ setuptools.setup(
               "smcpy.mcmc",
               "smcpy.model",
               "smcpy.utils",
-              "smcpy.hdf5"],
+              "smcpy.hdf5",
+              "smcpy.priors"],
     install_requires=['numpy', 'scipy', 'matplotlib', 'h5py', 'pymc', 'statsmodels', 'tqdm'],
     classifiers=[
         "Programming Language :: Python :: 2.7",
@@ -31,14 +31,34 @@ AGREEMENT.
 '''
 
 import h5py
+import numpy as np
 import os
 from ..particles.particle import Particle
+from ..particles.particle_array import ParticleArray
 from ..smc.smc_step import SMCStep
 
 
 class HDF5Storage(object):
+    '''
+    Stores SMC steps in an hdf5 file. Two on-disk layouts are supported:
 
-    def __init__(self, h5_filename, mode):
+        - format version 2 (default for new files): each step group holds a
+          2D 'params' dataset (particles x parameters, with the parameter
+          names in its 'param_names' attribute) and 1D 'log_weights' and
+          'log_likes' datasets. Datasets are chunked and can be compressed.
+        - format version 1 (legacy): one group per particle holding one
+          scalar dataset per parameter, log weight and log likelihood.
+
+    The version of an existing file is read from its 'format_version'
+    attribute (files without it are version 1), so legacy files can still be
+    opened, read and appended to.
+    '''
+
+    available_format_versions = [1, 2]
+    current_format_version = 2
+
+    def __init__(self, h5_filename, mode, format_version=None,
+                 compression=None):
         '''
         :param h5_filename: name of hdf5 file in which to save or from which
             to load a particle, a collection of particles, referred to as a
@@ -48,24 +68,65 @@ class HDF5Storage(object):
         :param mode: mode used when opening hdf5 file specified by h5_filename;
             can be 'w', 'r', 'r+', or 'a'. See h5py docs for details.
         :type mode: string
+        :param format_version: on-disk layout used when creating a new file;
+            default is current_format_version. Ignored for existing files,
+            which keep their layout.
+        :type format_version: int or None
+        :param compression: compression filter for the datasets of format
+            version 2 files (e.g., 'gzip' or 'lzf'); default is None.
+        :type compression: string or None
         '''
+        format_version = self._check_format_version(format_version)
         self._h5 = h5py.File(h5_filename, mode=mode)
         self._mode = mode
+        self._compression = compression
         if 'steps' not in self._h5:
+            self._set_format_version(format_version)
             self._step_parent_grp = self._h5.create_group('steps')
         else:
             self._step_parent_grp = self._h5['steps']
+        self._format_version = int(self._h5.attrs.get('format_version', 1))
+
+    def get_format_version(self,):
+        '''
+        Returns the on-disk format version of the hdf5 file.
+        '''
+        return self._format_version
 
     def close(self,):
         self._h5.close()
         return None
 
+    def flush(self,):
+        '''
+        Flushes buffered data to disk.
+        '''
+        self._h5.flush()
+        return None
+
     def get_num_steps(self,):
         '''
         Returns number of steps currently stored in the hdf5 file.
         '''
         return len(self._step_parent_grp.keys())
 
+    def get_step_indices(self,):
+        '''
+        Returns the sorted indices of the steps stored in the hdf5 file.
+        '''
+        return sorted(int(step_name.split('_')[-1])
+                      for step_name in self._step_parent_grp.keys())
+
+    def delete_step(self, step_index):
+        '''
+        Removes a step (and all particles in that step) from the hdf5 file.
+
+        :param step_index: index of step to remove
+        :type step_index: integer
+        '''
+        del self._step_parent_grp['step_{0:03}'.format(step_index)]
+        return None
+
     def get_num_particles_in_step(self, step_index):
         '''
         Returns the number of particles in a particular step.
@@ -73,8 +134,10 @@ class HDF5Storage(object):
         :param step_index: index of step that the particle belongs too
         :type step_index: integer
         '''
-        step_name = 'step_{0:03}'.format(step_index)
-        return len(self._step_parent_grp[step_name].keys())
+        step_grp = self._get_step_group(step_index)
+        if self._format_version == 1:
+            return len(step_grp.keys())
+        return step_grp['log_weights'].shape[0]
 
     def write_particle(self, particle, step_index, particle_index):
         '''
@@ -90,14 +153,13 @@ class HDF5Storage(object):
         :type particle_index: integer
         '''
         step_name = 'step_{0:03}'.format(step_index)
-        particle_name = 'particle_%s' % particle_index
         if step_name not in self._step_parent_grp:
             self._create_step_group(step_index)
         step_grp = self._step_parent_grp[step_name]
-        particle_grp = step_grp.create_group(particle_name)
-        self._write_particle_params(particle.params, particle_grp)
-        self._write_particle_log_weight(particle.log_weight, particle_grp)
-        self._write_particle_log_like(particle.log_like, particle_grp)
+        if self._format_version == 1:
+            self._write_legacy_particle(particle, step_grp, particle_index)
+        else:
+            self._write_particle_row(particle, step_grp, particle_index)
         return None
 
     def read_particle(self, step_index, particle_index):
@@ -110,13 +172,14 @@ class HDF5Storage(object):
         :param particle_index: index of particle within a given step
         :type particle_index: integer
         '''
-        particle_grp = self._get_particle_group(step_index, particle_index)
-        log_weight = particle_grp['log_weight'][()]
-        log_like = particle_grp['log_like'][()]
-        params_grp = particle_grp['parameters']
-        params = {key: params_grp[key][()] for key in params_grp.keys()}
-        particle = Particle(params, log_weight, log_like)
-        return particle
+        if self._format_version == 1:
+            return self._read_legacy_particle(step_index, particle_index)
+        step_grp = self._get_step_group(step_index)
+        param_names = self._read_param_names(step_grp)
+        params = dict(zip(param_names, step_grp['params'][particle_index]))
+        log_weight = step_grp['log_weights'][particle_index]
+        log_like = step_grp['log_likes'][particle_index]
+        return Particle(params, log_weight, log_like)
 
     def write_step(self, step, step_index):
         '''
@@ -129,8 +192,14 @@ class HDF5Storage(object):
         :type step_index: integer
         '''
         self._create_step_group(step_index)
-        for particle_index, particle in enumerate(step.particles):
-            self.write_particle(particle, step_index, particle_index)
+        step_grp = self._get_step_group(step_index)
+        if step.get_temperature() is not None:
+            step_grp.attrs['temperature'] = step.get_temperature()
+        if self._format_version == 1:
+            for particle_index, particle in enumerate(step.particles):
+                self.write_particle(particle, step_index, particle_index)
+        else:
+            self._write_particle_array(step.get_particle_array(), step_grp)
         return None
 
     def read_step(self, step_index):
@@ -142,9 +211,12 @@ class HDF5Storage(object):
         '''
         step_grp = self._get_step_group(step_index)
         step = SMCStep()
-        for particle_name in step_grp.keys():
-            particle_index = int(particle_name.split('_')[-1])
-            step.add_particle(self.read_particle(step_index, particle_index))
+        if self._format_version == 1:
+            step.set_particles(self._read_legacy_particles(step_index))
+        else:
+            step.set_particle_array(self._read_particle_array(step_grp))
+        if 'temperature' in step_grp.attrs:
+            step.set_temperature(step_grp.attrs['temperature'])
         return step
 
     def write_step_list(self, step_list):
@@ -172,10 +244,116 @@ class HDF5Storage(object):
             step_list.append(step)
         return step_list
 
+    @classmethod
+    def _check_format_version(cls, format_version):
+        if format_version is None:
+            format_version = cls.current_format_version
+        if format_version not in cls.available_format_versions:
+            raise ValueError('format_version must be one of %s.' %
+                             cls.available_format_versions)
+        return format_version
+
+    def _set_format_version(self, format_version):
+        if format_version != 1:
+            self._h5.attrs['format_version'] = format_version
+        return None
+
     def _create_step_group(self, step_index):
         self._step_parent_grp.create_group('step_{0:03}'.format(step_index))
         return None
 
+    def _write_particle_array(self, particle_array, step_grp):
+        num_particles = len(particle_array)
+        num_params = len(particle_array.param_names)
+        self._create_step_datasets(step_grp, particle_array.param_names,
+                                   num_particles)
+        if num_particles > 0:
+            if num_params > 0:
+                step_grp['params'][...] = particle_array.params
+            step_grp['log_weights'][...] = particle_array.log_weights
+            step_grp['log_likes'][...] = particle_array.log_likes
+        return None
+
+    def _create_step_datasets(self, step_grp, param_names, num_particles):
+        num_params = len(param_names)
+        chunks = self._get_chunks(num_particles, num_params)
+        step_grp.create_dataset('params', shape=(num_particles, num_params),
+                                maxshape=(None, num_params), dtype=float,
+                                chunks=chunks, compression=self._compression)
+        step_grp['params'].attrs['param_names'] = \
+            np.array([str(name) for name in param_names], dtype=np.string_)
+        for name in ['log_weights', 'log_likes']:
+            step_grp.create_dataset(name, shape=(num_particles,),
+                                    maxshape=(None,), dtype=float,
+                                    chunks=(chunks[0],),
+                                    compression=self._compression)
+        return None
+
+    @staticmethod
+    def _get_chunks(num_particles, num_params):
+        '''
+        Chunks hold whole rows and up to ~64k values per chunk.
+        '''
+        num_params = max(num_params, 1)
+        max_rows = max(65536 // num_params, 1)
+        return (max(min(num_particles, max_rows), 1), num_params)
+
+    def _read_particle_array(self, step_grp):
+        param_names = self._read_param_names(step_grp)
+        num_particles = step_grp['log_weights'].shape[0]
+        if num_particles > 0 and param_names:
+            params = step_grp['params'][...]
+        else:
+            params = np.empty((num_particles, len(param_names)))
+        return ParticleArray(param_names, params, step_grp['log_weights'][...],
+                             step_grp['log_likes'][...])
+
+    @staticmethod
+    def _read_param_names(step_grp):
+        return [str(name) for name in step_grp['params'].attrs['param_names']]
+
+    def _write_particle_row(self, particle, step_grp, particle_index):
+        params = particle.params
+        if 'params' not in step_grp:
+            self._create_step_datasets(step_grp, sorted(params.keys()), 0)
+        param_names = self._read_param_names(step_grp)
+        if sorted(param_names) != sorted(params.keys()):
+            raise ValueError('particle parameters do not match those of '
+                             'step group %s.' % step_grp.name)
+        num_particles = step_grp['log_weights'].shape[0]
+        if particle_index >= num_particles:
+            for name in ['params', 'log_weights', 'log_likes']:
+                step_grp[name].resize(particle_index + 1, axis=0)
+        step_grp['params'][particle_index] = [params[key] for key in
+                                              param_names]
+        step_grp['log_weights'][particle_index] = particle.log_weight
+        step_grp['log_likes'][particle_index] = particle.log_like
+        return None
+
+    def _write_legacy_particle(self, particle, step_grp, particle_index):
+        particle_name = 'particle_%s' % particle_index
+        particle_grp = step_grp.create_group(particle_name)
+        self._write_particle_params(particle.params, particle_grp)
+        self._write_particle_log_weight(particle.log_weight, particle_grp)
+        self._write_particle_log_like(particle.log_like, particle_grp)
+        return None
+
+    def _read_legacy_particle(self, step_index, particle_index):
+        particle_grp = self._get_particle_group(step_index, particle_index)
+        log_weight = particle_grp['log_weight'][()]
+        log_like = particle_grp['log_like'][()]
+        params_grp = particle_grp['parameters']
+        params = {key: params_grp[key][()] for key in params_grp.keys()}
+        particle = Particle(params, log_weight, log_like)
+        return particle
+
+    def _read_legacy_particles(self, step_index):
+        step_grp = self._get_step_group(step_index)
+        particle_indices = sorted(int(particle_name.split('_')[-1])
+                                  for particle_name in step_grp.keys())
+        return [self._read_legacy_particle(step_index, particle_index)
+                for particle_index in particle_indices]
+
     def _write_particle_params(self, params, particle_grp):
         parameters_grp = particle_grp.create_group('parameters')
         for key, value in params.iteritems():
@@ -0,0 +1,168 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import Queue
+import threading
+from .hdf5_storage import HDF5Storage
+
+
+class HDF5StreamWriter(object):
+    '''
+    Append-only checkpoint writer for SMC steps. Steps handed to write_step()
+    are snapshot (see SMCStep.copy, which is copy-on-write) and queued; a
+    background thread appends them to an hdf5 file in the HDF5Storage layout
+    and flushes the file after every complete step, so the file on disk
+    always holds a readable prefix of the step list. The caller only pays
+    for the snapshot and the queue handoff.
+
+    Errors raised while writing are re-raised by the next call to
+    write_step(), flush() or close().
+
+    When an existing file is opened in 'a' or 'r+' mode (e.g., to keep
+    autosaving into the file a run is restarted from), write_step_list()
+    only queues the steps that are not yet stored in it.
+    '''
+
+    def __init__(self, h5_filename, mode='w', format_version=None,
+                 compression=None):
+        '''
+        :param h5_filename: name of hdf5 file in which to save steps
+        :type h5_filename: string
+        :param mode: mode used when opening hdf5 file specified by h5_filename;
+            can be 'w', 'r+', or 'a'. See h5py docs for details.
+        :type mode: string
+        :param format_version: see HDF5Storage
+        :type format_version: int or None
+        :param compression: see HDF5Storage
+        :type compression: string or None
+        '''
+        self._storage = HDF5Storage(h5_filename, mode, format_version,
+                                    compression)
+        self._step_indices = set(self._storage.get_step_indices())
+        self._queue = Queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._write_queued_steps,
+                                        name='HDF5StreamWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write_step(self, step, step_index):
+        '''
+        Queues a step to be appended to the hdf5 file; returns immediately.
+
+        :param step: step to save
+        :type step: SMCStep class instance
+        :param step_index: index of step being written
+        :type step_index: integer
+        '''
+        self._raise_if_closed()
+        self._raise_write_error()
+        self._queue.put((step.copy(), step_index))
+        self._step_indices.add(step_index)
+        return None
+
+    def write_step_list(self, step_list):
+        '''
+        Queues the steps of a step list that are not already stored in the
+        hdf5 file to be appended to it. Stored steps past the end of the
+        step list are removed, so that the steps that follow it can be
+        appended.
+
+        :param step_list: a list of steps
+        :type step_list: list of SMCStep classes
+        '''
+        self._raise_if_closed()
+        self._raise_write_error()
+        for step_index in sorted(self._step_indices):
+            if step_index > len(step_list):
+                self._queue.put((None, step_index))
+                self._step_indices.remove(step_index)
+        for step_index, step in enumerate(step_list, 1):
+            if step_index not in self._step_indices:
+                self.write_step(step, step_index)
+        return None
+
+    def flush(self,):
+        '''
+        Blocks until all queued steps have been written and flushed to disk.
+        '''
+        self._raise_if_closed()
+        self._queue.join()
+        self._raise_write_error()
+        return None
+
+    def close(self, raise_errors=True):
+        '''
+        Writes all queued steps, stops the writer thread and closes the file.
+
+        :param raise_errors: if False, a pending write error is discarded
+            instead of raised
+        :type raise_errors: bool
+        '''
+        if self._thread is None:
+            return None
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._storage.close()
+        if raise_errors:
+            self._raise_write_error()
+        return None
+
+    def _write_queued_steps(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return None
+                if self._error is None:
+                    step, step_index = item
+                    if step is None:
+                        self._storage.delete_step(step_index)
+                    else:
+                        self._storage.write_step(step, step_index)
+                    self._storage.flush()
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _raise_if_closed(self):
+        if self._thread is None:
+            raise ValueError('HDF5StreamWriter is closed.')
+        return None
+
+    def _raise_write_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        return None
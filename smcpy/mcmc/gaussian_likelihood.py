@@ -0,0 +1,98 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import numpy as np
+
+
+class GaussianLikelihood(object):
+    '''
+    Independent Gaussian measurement error likelihood, equivalent to the
+    PyMC node Normal('results', mu=model, tau=1/std_dev**2, value=data)
+    generated by MCMCSampler.generate_pymc_model(), evaluated for a batch of
+    model outputs at once. Terms that depend only on the data are computed
+    once, when the likelihood is created.
+    '''
+
+    def __init__(self, data):
+        '''
+        :param data: observed data
+        :type data: array_like
+        '''
+        self._data = np.ravel(np.asarray(data, dtype=float))
+        self._num_data = self._data.shape[0]
+        self._log_norm = -0.5 * self._num_data * np.log(2 * np.pi)
+
+    @property
+    def num_data(self):
+        return self._num_data
+
+    def compute_sum_of_squares(self, outputs):
+        '''
+        :param outputs: model outputs, one (flattened) row per sample; shape =
+            (num_samples, num_data)
+        :type outputs: 2D array
+
+        :Returns: 1D array of the sum of squared residuals of each sample
+        '''
+        residuals = np.atleast_2d(outputs) - self._data
+        return np.einsum('ij,ij->i', residuals, residuals)
+
+    def compute_log_likelihood(self, outputs, std_devs):
+        '''
+        :param outputs: model outputs, one (flattened) row per sample; shape =
+            (num_samples, num_data)
+        :type outputs: 2D array
+        :param std_devs: measurement error standard deviation for each sample
+            (or a single value shared by all samples)
+        :type std_devs: float or 1D array
+
+        :Returns: 1D array of log likelihoods
+        '''
+        std_devs = np.asarray(std_devs, dtype=float)
+        ssq = self.compute_sum_of_squares(outputs)
+        return self._log_norm - self._num_data * np.log(std_devs) - \
+            0.5 * ssq / std_devs**2
+
+    def compute_max_log_likelihood(self, std_devs):
+        '''
+        Upper bound of compute_log_likelihood(), reached by an output that
+        matches the data exactly; a larger log likelihood cannot come from
+        this likelihood.
+
+        :param std_devs: measurement error standard deviation for each sample
+            (or a single value shared by all samples)
+        :type std_devs: float or 1D array
+
+        :Returns: maximum log likelihood (float or 1D array)
+        '''
+        std_devs = np.asarray(std_devs, dtype=float)
+        return self._log_norm - self._num_data * np.log(std_devs)
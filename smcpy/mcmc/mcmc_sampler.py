@@ -37,6 +37,7 @@ import os
 import pickle
 import pymc
 
+from gaussian_likelihood import GaussianLikelihood
 from step_methods import DelayedRejectionAdaptiveMetropolis
 from step_methods import SMC_Metropolis
 from scipy.optimize import minimize
@@ -51,6 +52,9 @@ class MCMCSampler:
     quantified uncertainty based on a set of observations. 
     '''
 
+    # prior used for the measurement error standard deviation when sampled
+    std_dev_prior = ['Uniform', 0., 1000.]
+
     def __init__(self, data, model, params, working_dir='./',
                  storage_backend='pickle'):
         '''
@@ -118,6 +122,7 @@ class MCMCSampler:
         # Initialize pymc model and MCMC database
         self.pymc_mod = None
         self.db = None
+        self._likelihood = None
 
         self._initialize_plotting()
 
@@ -354,7 +359,8 @@ class MCMCSampler:
             pymc_mod_addon = []
             pymc_mod_order_addon = []
         else:
-            std_dev = pymc.Uniform('std_dev', lower=0, upper=1000)
+            std_dev = pymc.Uniform('std_dev', lower=self.std_dev_prior[1],
+                                   upper=self.std_dev_prior[2])
 
             # Since variance will be sampled, need to set initial value
             # if ssq0 provided, calculated std_dev0
@@ -478,6 +484,18 @@ class MCMCSampler:
         return parents, pymc_mod, pymc_mod_order
 
 
+    def get_likelihood(self):
+        '''
+        Returns the native (PyMC-free) GaussianLikelihood of self.data. Terms
+        that depend only on the data are computed on the first call and
+        reused until self.data is replaced.
+        '''
+        if self._likelihood is None or self._likelihood_data is not self.data:
+            self._likelihood = GaussianLikelihood(self.data)
+            self._likelihood_data = self.data
+        return self._likelihood
+
+
     def save_model(self, fname='model.p'):
         '''
         Saves model in pickle file with name working_dir + fname.
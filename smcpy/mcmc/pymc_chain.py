@@ -0,0 +1,168 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+from copy import copy
+import numpy as np
+import pymc
+from .step_methods import SMC_Metropolis
+from ..utils.factorized_covariance import factorize
+
+
+class PyMCChain(object):
+    '''
+    Runs short SMC_Metropolis chains for many particles with one PyMC model.
+    The model (see MCMCSampler.generate_pymc_model()), its pymc.MCMC sampler
+    and step methods are built for the first particle only; for every other
+    particle, the values of the stochastics, the known log likelihood at
+    the starting point and the step method proposal widths are reset, so
+    that the per-particle cost no longer includes building the PyMC graph
+    and database. Chains are stepped directly (nothing is traced).
+    '''
+
+    def __init__(self, mcmc, covariance, phi, measurement_std_dev=None):
+        '''
+        :param mcmc: MCMCSampler defining the data, model and priors; it is
+            copied, so the PyMC model of the original is left unchanged.
+        :type mcmc: MCMCSampler class instance
+        :param covariance: proposal covariance of the model parameters
+        :type covariance: 2D array or FactorizedCovariance
+        :param phi: current temperature (exponent of the likelihood)
+        :type phi: float
+        :param measurement_std_dev: standard deviation of the measurement
+            error; if None, std_dev is sampled along with the parameters.
+        :type measurement_std_dev: float or None
+        '''
+        self._mcmc = copy(mcmc)
+        self._covariance = factorize(covariance)
+        self._phi = phi
+        self._measurement_std_dev = measurement_std_dev
+        self._step_methods = None
+
+    @property
+    def num_accepted(self):
+        '''
+        Number of accepted SMC_Metropolis proposals of the model parameters
+        over all chains run so far (std_dev moves are not included).
+        '''
+        return sum(step_method.accepted
+                   for step_method in self._get_smc_step_methods())
+
+    @property
+    def num_proposed(self):
+        '''
+        Number of SMC_Metropolis proposals of the model parameters over all
+        chains run so far.
+        '''
+        return sum(step_method.accepted + step_method.rejected
+                   for step_method in self._get_smc_step_methods())
+
+    def run(self, params, num_steps, log_like0=None):
+        '''
+        :param params: starting point of the chain; includes std_dev if it is
+            sampled
+        :type params: dict
+        :param num_steps: number of Metropolis steps
+        :type num_steps: int
+        :param log_like0: log likelihood at params, if already known; it is
+            used as the cached log probability of the 'results' node, so the
+            model is only evaluated at points where it is not known.
+        :type log_like0: float or None
+
+        :Returns: tuple of the parameters (dict) and the log likelihood at
+            the end of the chain
+        '''
+        if self._step_methods is None:
+            self._build(params)
+        else:
+            self._reset(params, log_like0)
+        for _ in range(num_steps):
+            for step_method in self._step_methods:
+                step_method.step()
+        new_params = {key: self._get_node(key).value for key in params}
+        return new_params, self._get_node('results').logp
+
+    def _build(self, params):
+        '''
+        Building the PyMC model evaluates the model at params, so the log
+        likelihood of the first particle is always computed.
+        '''
+        if self._measurement_std_dev is None:
+            std_dev0 = params['std_dev']
+        else:
+            std_dev0 = self._measurement_std_dev
+        self._mcmc.generate_pymc_model(fix_var=bool(self._measurement_std_dev),
+                                       std_dev0=std_dev0, q0=params)
+        sampler = pymc.MCMC(self._mcmc.pymc_mod, db='ram')
+        parameter_rvs = self._mcmc.pymc_mod[:self._mcmc.p]
+        sampler.use_step_method(SMC_Metropolis, parameter_rvs,
+                                cov=self._covariance.covariance,
+                                proposal_sd=self._covariance.cholesky,
+                                phi=self._phi, verbose=-1)
+        sampler.assign_step_methods(verbose=-1)
+        self._step_methods = list(sampler.step_methods)
+        return None
+
+    def _reset(self, params, log_like0):
+        '''
+        The known log likelihood is cached for the current values of the
+        stochastics only; it is recomputed (i.e., the model is evaluated) as
+        soon as any of them changes, including a std_dev move.
+        '''
+        for key, value in params.iteritems():
+            self._get_node(key).value = value
+        if log_like0 is not None:
+            self._get_node('results')._logp.force_cache(log_like0)
+        for step_method in self._step_methods:
+            if isinstance(step_method, pymc.Metropolis):
+                self._reset_proposal_sd(step_method)
+        return None
+
+    @staticmethod
+    def _reset_proposal_sd(step_method):
+        '''
+        Same initial proposal width as a new pymc.Metropolis step method,
+        i.e. proportional to the current value of its stochastic.
+        '''
+        value = step_method.stochastic.value
+        if np.all(value != 0.):
+            step_method.proposal_sd = np.ones(np.shape(value)) * np.abs(value)
+        else:
+            step_method.proposal_sd = np.ones(np.shape(value))
+        step_method.adaptive_scale_factor = 1.
+        return None
+
+    def _get_smc_step_methods(self):
+        return [step_method for step_method in self._step_methods or []
+                if isinstance(step_method, SMC_Metropolis)]
+
+    def _get_node(self, key):
+        return self._mcmc.pymc_mod[self._mcmc.pymc_mod_order.index(key)]
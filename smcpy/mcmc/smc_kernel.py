@@ -0,0 +1,173 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import numpy as np
+from .gaussian_likelihood import GaussianLikelihood
+from ..model.base_model import evaluate_model_batch
+from ..particles.particle_array import ParticleArray
+from ..priors.prior_distributions import JointPrior, create_prior
+from ..utils.factorized_covariance import factorize
+
+
+class SMCMetropolisKernel(object):
+    '''
+    Native (PyMC-free) Metropolis mutation kernel for Sequential Monte Carlo.
+    All particles are advanced together: jumps for every particle are drawn
+    from a multivariate normal with the given covariance, prior log
+    densities are evaluated as arrays, the model is evaluated only for
+    proposals inside the prior support, and acceptance is decided with a
+    single array comparison. The target for each chain is the tempered
+    posterior log p(theta) + phi * log p(y|theta). Models that define
+    evaluate_batch() (see BaseModel) are evaluated once per Metropolis step
+    for all proposals.
+    '''
+
+    def __init__(self, model, data, param_priors, std_dev_prior):
+        '''
+        :param model: model with an evaluate(param_dict) method (and
+            optionally evaluate_batch()) returning an output of the same size
+            as data
+        :type model: object
+        :param data: observed data
+        :type data: array_like
+        :param param_priors: prior definitions of the model parameters in the
+            format used by MCMCSampler (e.g., {'a': ['Uniform', 0., 1.]})
+        :type param_priors: dict
+        :param std_dev_prior: prior definition of the measurement error
+            standard deviation (used only when it is sampled)
+        :type std_dev_prior: list
+        '''
+        self._model = model
+        self._likelihood = GaussianLikelihood(data)
+        self._param_priors = {key: create_prior(prior)
+                              for key, prior in param_priors.iteritems()}
+        self._param_priors['std_dev'] = create_prior(std_dev_prior)
+        self._model_param_names = list(param_priors.keys())
+        self.num_proposed = 0
+        self.num_accepted = 0
+        self.num_moved = 0
+        self.moved = np.zeros(0, dtype=bool)
+
+    def mutate(self, particle_array, covariance, phi, num_mcmc_steps,
+               measurement_std_dev=None):
+        '''
+        Runs num_mcmc_steps Metropolis steps for every particle.
+
+        :param particle_array: particles to mutate; log likelihoods must be
+            consistent with the particle parameters
+        :type particle_array: ParticleArray class instance
+        :param covariance: proposal covariance; rows/columns ordered as
+            particle_array.param_names
+        :type covariance: 2D array or FactorizedCovariance
+        :param phi: current temperature (exponent of the likelihood)
+        :type phi: float
+        :param num_mcmc_steps: number of Metropolis steps per particle
+        :type num_mcmc_steps: int
+        :param measurement_std_dev: standard deviation of the measurement
+            error; if None, it must be one of the particle parameters.
+        :type measurement_std_dev: float or None
+
+        :Returns: new ParticleArray with mutated parameters and log
+            likelihoods (log weights unchanged); the particles that moved are
+            flagged in the moved attribute.
+        '''
+        param_names = list(particle_array.param_names)
+        self._setup_columns(param_names, measurement_std_dev)
+        proposal_sd = factorize(covariance).cholesky
+
+        params = np.array(particle_array.params)
+        log_likes = np.array(particle_array.log_likes)
+        log_priors = self._compute_log_prior(params)
+        initial_params = params.copy()
+
+        self.num_proposed = 0
+        self.num_accepted = 0
+        for _ in range(num_mcmc_steps):
+            proposed = self._propose(params, proposal_sd)
+            proposed_log_priors = self._compute_log_prior(proposed)
+            in_support = np.isfinite(proposed_log_priors)
+            proposed_log_likes = np.tile(-np.inf, params.shape[0])
+            if np.any(in_support):
+                proposed_log_likes[in_support] = \
+                    self._compute_log_likelihood(proposed[in_support])
+
+            log_ratio = np.tile(-np.inf, params.shape[0])
+            log_ratio[in_support] = \
+                proposed_log_priors[in_support] + \
+                phi * proposed_log_likes[in_support] - \
+                (log_priors[in_support] + phi * log_likes[in_support])
+            uniforms = np.random.uniform(0, 1, params.shape[0])
+            accept = np.log(uniforms) < log_ratio
+
+            params[accept] = proposed[accept]
+            log_likes[accept] = proposed_log_likes[accept]
+            log_priors[accept] = proposed_log_priors[accept]
+            self.num_proposed += params.shape[0]
+            self.num_accepted += np.sum(accept)
+
+        self.moved = np.any(params != initial_params, axis=1)
+        self.num_moved = np.sum(self.moved)
+        return ParticleArray(param_names, params, particle_array.log_weights,
+                             log_likes)
+
+    def _setup_columns(self, param_names, measurement_std_dev):
+        self._param_names = param_names
+        self._model_columns = [param_names.index(key)
+                               for key in self._model_param_names]
+        self._joint_prior = JointPrior(self._param_priors, param_names)
+        self._discrete_columns = self._joint_prior.is_discrete
+        if measurement_std_dev is None:
+            self._std_dev_column = param_names.index('std_dev')
+        else:
+            self._std_dev_column = None
+            self._measurement_std_dev = measurement_std_dev
+        return None
+
+    def _propose(self, params, proposal_sd):
+        normals = np.random.normal(size=params.shape)
+        jumps = np.dot(normals, proposal_sd.T)
+        jumps[:, self._discrete_columns] = \
+            np.round(jumps[:, self._discrete_columns])
+        return params + jumps
+
+    def _compute_log_prior(self, params):
+        return self._joint_prior.logpdf(params)
+
+    def _compute_log_likelihood(self, params):
+        outputs = evaluate_model_batch(self._model,
+                                       params[:, self._model_columns],
+                                       self._model_param_names)
+        if self._std_dev_column is None:
+            std_devs = self._measurement_std_dev
+        else:
+            std_devs = params[:, self._std_dev_column]
+        return self._likelihood.compute_log_likelihood(outputs, std_devs)
@@ -673,6 +673,13 @@ class SMC_Metropolis(StepMethod):
     distribution is asymmetric, it has correct ergodic properties. See
     (Haario et al., 2001) for details.
 
+    This step method advances a single chain. SMCMetropolisKernel
+    (smcpy.mcmc.smc_kernel) is the population version used by the native
+    mutation kernel: it holds the states of all chains as one matrix, draws
+    all jumps with a single product with the Cholesky factor of cov and
+    evaluates the tempered target p(theta) * p(y|theta)**phi (see
+    get_gamma_smc()) for all chains at once.
+
     :Parameters:
       - stochastic : PyMC objects
           Stochastic objects to be handled by the AM algorith,
@@ -684,6 +691,10 @@ class SMC_Metropolis(StepMethod):
           It is suggested to provide a sensible guess for the covariance, and
           not rely on the automatic assignment from stochastics value.
 
+      - proposal_sd : array
+          Lower Cholesky factor of cov, if already known (e.g., from a
+          FactorizedCovariance); otherwise it is computed from cov.
+
       - shrink_if_necessary : bool
           If True, the acceptance rate is checked when the step method tunes. If
           the acceptance rate is small, the proposal covariance is shrunk according
@@ -708,7 +719,8 @@ class SMC_Metropolis(StepMethod):
           Bernouilli, vol. 7 (2), pp. 223-242, 2001.
     """
 
-    def __init__(self, stochastic, cov, phi, verbose=-1, tally=False):
+    def __init__(self, stochastic, cov, phi, verbose=-1, tally=False,
+                 proposal_sd=None):
         # assign cooling step
         self.phi = phi
 
@@ -739,9 +751,13 @@ class SMC_Metropolis(StepMethod):
         self.check_type()
         self.dimension()
 
-        # Set the initial covariance using cov
+        # Set the initial covariance using cov; a known Cholesky factor of
+        # cov (proposal_sd) is used as is
         self.C = cov
-        self.updateproposal_sd()
+        if proposal_sd is None:
+            self.updateproposal_sd()
+        else:
+            self.proposal_sd = proposal_sd
 
         # Keep track of the internal trace length
         self._trace_count = 0
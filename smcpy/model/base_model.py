@@ -65,6 +65,25 @@ class BaseModel(object):
         '''
         return None
 
+    def evaluate_batch(self, param_matrix, param_names):
+        '''
+        Evaluates the model for many parameter sets at once. The default
+        implementation calls evaluate() once per row; users may redefine this
+        method with a vectorized implementation (e.g., integrating many
+        parameter sets in a single call). SMC components use this method
+        whenever it is available.
+
+        :param param_matrix: parameter values; shape = (num_samples,
+            num_params)
+        :type param_matrix: 2D array
+        :param param_names: parameter names corresponding to the columns of
+            param_matrix
+        :type param_names: list
+        :return: 2D numpy array of outputs; row i is the flattened output of
+            evaluate() for row i of param_matrix
+        '''
+        return _evaluate_each(self, param_matrix, param_names)
+
     def process_args(self, args, kwargs):
         '''
         Converts args or kwargs into a dictionary mapping input names to their
@@ -89,3 +108,35 @@ class BaseModel(object):
         synth_data = self.evaluate(true_params)
         noisy_data = synth_data + np.random.normal(0, stdv, synth_data.shape)
         return noisy_data
+
+
+def evaluate_model_batch(model, param_matrix, param_names):
+    '''
+    Evaluates a model for many parameter sets, using model.evaluate_batch()
+    if the model provides it (e.g., any BaseModel subclass) and otherwise
+    calling model.evaluate() once per parameter set.
+
+    :param model: model with an evaluate(param_dict) method
+    :type model: object
+    :param param_matrix: parameter values; shape = (num_samples, num_params)
+    :type param_matrix: 2D array
+    :param param_names: parameter names corresponding to the columns of
+        param_matrix
+    :type param_names: list
+    :return: 2D numpy array of outputs, one (flattened) row per parameter set
+    '''
+    param_matrix = np.atleast_2d(param_matrix)
+    if param_matrix.shape[0] == 0:
+        return np.empty((0, 0))
+    if hasattr(model, 'evaluate_batch'):
+        outputs = model.evaluate_batch(param_matrix, list(param_names))
+        return np.asarray(outputs, dtype=float).reshape(len(param_matrix), -1)
+    return _evaluate_each(model, param_matrix, param_names)
+
+
+def _evaluate_each(model, param_matrix, param_names):
+    if len(param_matrix) == 0:
+        return np.empty((0, 0))
+    outputs = [np.ravel(model.evaluate(dict(zip(param_names, row))))
+               for row in param_matrix]
+    return np.array(outputs, dtype=float).reshape(len(param_matrix), -1)
@@ -0,0 +1,278 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import h5py
+import numpy as np
+import os
+import threading
+from collections import OrderedDict
+from .base_model import BaseModel, evaluate_model_batch
+
+
+class CachedModel(BaseModel):
+    '''
+    Wraps a model with a bounded least-recently-used cache of model outputs
+    keyed by parameter vector, so that parameter sets that are evaluated
+    repeatedly (e.g., the current state of each PyMC chain, resampled
+    duplicates, or posterior particles passed to SMCPropagator) only run the
+    model once. Pass the same CachedModel to SMCSampler and SMCPropagator
+    to share the cache between initialization, mutation and propagation.
+
+    Parameter vectors are matched exactly, independent of the ordering of
+    the parameter names. Log likelihoods are computed from the (cached)
+    outputs, since they also depend on the measurement error. Entries are
+    stored read-only and callers receive copies, so modifying a returned
+    output does not change the cache.
+
+    The cache can be persisted with save() and is loaded on construction if
+    cache_file exists. Each process of a ProcessPool or mpi run holds its
+    own cache.
+    '''
+
+    def __init__(self, model, max_bytes=2 ** 27, cache_file=None):
+        '''
+        :param model: model with an evaluate(param_dict) method (and
+            optionally evaluate_batch())
+        :type model: object
+        :param max_bytes: memory cap of the cached outputs and keys; least
+            recently used entries are evicted beyond it. Default is 128 MiB.
+        :type max_bytes: int
+        :param cache_file: HDF5 file used by save(); loaded on construction
+            if it exists. Default is None.
+        :type cache_file: string or None
+        '''
+        if max_bytes < 0:
+            raise ValueError('max_bytes must be non-negative.')
+        self._model = model
+        self._max_bytes = max_bytes
+        self._cache_file = cache_file
+        self._entries = OrderedDict()
+        self._num_bytes = 0
+        self._output_shape = None
+        self._lock = threading.Lock()
+        self.num_hits = 0
+        self.num_misses = 0
+        if cache_file is not None and os.path.exists(cache_file):
+            self.load(cache_file)
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def num_entries(self):
+        return len(self._entries)
+
+    @property
+    def num_bytes(self):
+        return self._num_bytes
+
+    @property
+    def hit_rate(self):
+        num_lookups = self.num_hits + self.num_misses
+        if num_lookups == 0:
+            return 0.
+        return float(self.num_hits) / num_lookups
+
+    def evaluate(self, *args, **kwargs):
+        params = self.process_args(args, kwargs)
+        param_names = sorted(params.keys())
+        key = self._make_key(param_names,
+                             [params[name] for name in param_names])
+        output = self._lookup([key])[0]
+        if output is not None:
+            if self._output_shape is not None:
+                return output.reshape(self._output_shape).copy()
+            self._adjust_counters(-1, 1)
+        output = np.asarray(self._model.evaluate(params))
+        self._output_shape = output.shape
+        self._store([key], [np.ravel(output)])
+        return output
+
+    def evaluate_batch(self, param_matrix, param_names):
+        '''
+        Returns the cached outputs of previously evaluated rows of
+        param_matrix and evaluates the remaining rows in a single batch.
+
+        :param param_matrix: parameter values; shape = (num_samples,
+            num_params)
+        :type param_matrix: 2D array
+        :param param_names: parameter names corresponding to the columns of
+            param_matrix
+        :type param_names: list
+        '''
+        param_matrix = np.atleast_2d(param_matrix)
+        sorted_names = sorted(param_names)
+        columns = [list(param_names).index(name) for name in sorted_names]
+        keys = [self._make_key(sorted_names, row)
+                for row in param_matrix[:, columns]]
+        outputs = self._lookup(keys)
+        missing = OrderedDict()
+        for i, output in enumerate(outputs):
+            if output is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            rows = [indices[0] for indices in missing.values()]
+            new_outputs = evaluate_model_batch(self._model, param_matrix[rows],
+                                               param_names)
+            self._store(list(missing.keys()), new_outputs)
+            for indices, output in zip(missing.values(), new_outputs):
+                for i in indices:
+                    outputs[i] = output
+            num_repeats = sum(len(indices) - 1 for indices in missing.values())
+            self._adjust_counters(num_repeats, -num_repeats)
+        return np.array(outputs, dtype=float).reshape(len(param_matrix), -1)
+
+    def clear(self):
+        '''
+        Removes all entries and resets the hit and miss counters.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._num_bytes = 0
+            self.num_hits = 0
+            self.num_misses = 0
+        return None
+
+    def save(self, cache_file=None):
+        '''
+        Writes all entries, from least to most recently used, to an HDF5
+        file.
+
+        :param cache_file: file name; default is the cache_file given on
+            construction.
+        :type cache_file: string or None
+        '''
+        cache_file = self._get_cache_file(cache_file)
+        groups = OrderedDict()
+        with self._lock:
+            for (param_names, key), output in self._entries.items():
+                group_key = (param_names, output.size)
+                groups.setdefault(group_key, []).append((key, output))
+        with h5py.File(cache_file, 'w') as h5:
+            if self._output_shape is not None:
+                h5.attrs['output_shape'] = self._output_shape
+            for i, ((param_names, _), entries) in enumerate(groups.items()):
+                group = h5.create_group('entries_%d' % i)
+                group.attrs['param_names'] = \
+                    np.array([str(name) for name in param_names],
+                             dtype=np.string_)
+                params = [np.frombuffer(key, dtype=float)
+                          for key, _ in entries]
+                group.create_dataset('params', data=np.array(params))
+                group.create_dataset('outputs',
+                                     data=np.array([output for _, output
+                                                    in entries]))
+        return None
+
+    def load(self, cache_file=None):
+        '''
+        Adds the entries of an HDF5 file written by save(); does not change
+        the hit and miss counters.
+
+        :param cache_file: file name; default is the cache_file given on
+            construction.
+        :type cache_file: string or None
+        '''
+        cache_file = self._get_cache_file(cache_file)
+        with h5py.File(cache_file, 'r') as h5:
+            if 'output_shape' in h5.attrs:
+                self._output_shape = tuple(h5.attrs['output_shape'])
+            for name in sorted(h5.keys(), key=lambda n: int(n.split('_')[1])):
+                group = h5[name]
+                param_names = [str(param_name) for param_name
+                               in group.attrs['param_names']]
+                keys = [self._make_key(param_names, row)
+                        for row in group['params'][()]]
+                self._store(keys, group['outputs'][()])
+        return None
+
+    def _lookup(self, keys):
+        outputs = []
+        with self._lock:
+            for key in keys:
+                output = self._entries.pop(key, None)
+                if output is None:
+                    self.num_misses += 1
+                else:
+                    self.num_hits += 1
+                    self._entries[key] = output
+                outputs.append(output)
+        return outputs
+
+    def _adjust_counters(self, num_hits, num_misses):
+        '''
+        Corrects lookups that turned out to be hits (rows repeated within a
+        batch) or misses (entries added by evaluate_batch() are flattened,
+        so evaluate() needs one call to learn the output shape).
+        '''
+        with self._lock:
+            self.num_hits += num_hits
+            self.num_misses += num_misses
+        return None
+
+    def _store(self, keys, outputs):
+        with self._lock:
+            for key, output in zip(keys, outputs):
+                output = np.array(output, dtype=float).ravel()
+                output.flags.writeable = False
+                if key in self._entries:
+                    self._num_bytes -= self._entry_bytes(key,
+                                                         self._entries[key])
+                    del self._entries[key]
+                self._entries[key] = output
+                self._num_bytes += self._entry_bytes(key, output)
+            while self._num_bytes > self._max_bytes:
+                key, output = self._entries.popitem(last=False)
+                self._num_bytes -= self._entry_bytes(key, output)
+        return None
+
+    def _get_cache_file(self, cache_file):
+        if cache_file is None:
+            cache_file = self._cache_file
+        if cache_file is None:
+            raise ValueError('no cache_file given.')
+        return cache_file
+
+    @staticmethod
+    def _make_key(param_names, values):
+        return (tuple(param_names),
+                np.asarray(values, dtype=float).tobytes())
+
+    @staticmethod
+    def _entry_bytes(key, output):
+        return len(key[1]) + output.nbytes
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('_model', '_lock'):
+            raise AttributeError(name)
+        return getattr(self._model, name)
@@ -0,0 +1,137 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import multiprocessing
+import numpy as np
+import os
+from multiprocessing.pool import ThreadPool
+from .base_model import BaseModel, evaluate_model_batch
+
+
+class ThreadedModel(BaseModel):
+    '''
+    Wraps a model so that batches of parameter sets (see
+    BaseModel.evaluate_batch) are split into one chunk per thread and
+    evaluated on a pool of threads. Everything that evaluates the model in
+    batches (particle initialization, the native mutation kernel and
+    SMCPropagator) runs concurrently without pickling or copying particles;
+    this pays off for models that spend their time in code that releases the
+    GIL (e.g., scipy's odeint or BLAS). Single evaluations and all other
+    attributes are delegated to the wrapped model.
+    '''
+
+    def __init__(self, model, num_threads=None):
+        '''
+        :param model: model with an evaluate(param_dict) method (and
+            optionally evaluate_batch())
+        :type model: object
+        :param num_threads: number of threads; default is None, which uses
+            the number of cpus.
+        :type num_threads: int or None
+        '''
+        if num_threads is None:
+            num_threads = multiprocessing.cpu_count()
+        if num_threads < 1:
+            raise ValueError('num_threads must be a positive integer.')
+        self._model = model
+        self._num_threads = num_threads
+        self._pool = None
+        self._pool_pid = None
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def num_threads(self):
+        return self._num_threads
+
+    def evaluate(self, *args, **kwargs):
+        return self._model.evaluate(*args, **kwargs)
+
+    def evaluate_batch(self, param_matrix, param_names):
+        '''
+        Evaluates the wrapped model for each row of param_matrix, with the
+        rows split into contiguous chunks that are evaluated concurrently.
+
+        :param param_matrix: parameter values; shape = (num_samples,
+            num_params)
+        :type param_matrix: 2D array
+        :param param_names: parameter names corresponding to the columns of
+            param_matrix
+        :type param_names: list
+        '''
+        param_matrix = np.atleast_2d(param_matrix)
+        chunks = [chunk for chunk in
+                  np.array_split(param_matrix, self._num_threads)
+                  if len(chunk) > 0]
+        if len(chunks) <= 1:
+            return evaluate_model_batch(self._model, param_matrix, param_names)
+        inputs = [(chunk, param_names) for chunk in chunks]
+        outputs = self._get_pool().map(self._evaluate_chunk, inputs)
+        return np.vstack(outputs)
+
+    def _evaluate_chunk(self, chunk_input):
+        chunk, param_names = chunk_input
+        return evaluate_model_batch(self._model, chunk, param_names)
+
+    def close(self):
+        '''
+        Stops the threads of the pool; a new pool is started if the model is
+        evaluated again.
+        '''
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+        self._pool = None
+        return None
+
+    def _get_pool(self):
+        '''
+        Pool threads do not survive a fork (see ProcessPool), so a new pool
+        is started in each process.
+        '''
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPool(self._num_threads)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('_model', '_pool'):
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_pool_pid'] = None
+        return state
@@ -33,10 +33,12 @@ AGREEMENT.
 from copy import deepcopy
 
 
-class Particle():
+class Particle(object):
     '''
     Class defining data structure of an SMC particle (a member of an SMC
-    particle chain).
+    particle chain). A particle either stores its own values or acts as a
+    view onto a single row of a ParticleArray (see from_particle_array()), in
+    which case reads and writes go directly to the shared arrays.
     '''
 
     def __init__(self, params, log_weight, log_like):
@@ -49,9 +51,79 @@ class Particle():
         :param log_like: the log likelihood of the particle
         :type log_like: float or int
         '''
-        self.params = self._check_params(params)
-        self.log_weight = self._check_log_weight(log_weight)
-        self.log_like = self._check_log_like(log_like)
+        self._particle_array = None
+        self._index = None
+        self._params = self._check_params(params)
+        self._log_weight = self._check_log_weight(log_weight)
+        self._log_like = self._check_log_like(log_like)
+
+    @classmethod
+    def from_particle_array(cls, particle_array, index):
+        '''
+        Returns a particle that is a view onto row <index> of particle_array.
+
+        :param particle_array: columnar particle storage
+        :type particle_array: ParticleArray class instance
+        :param index: row of particle_array
+        :type index: int
+        '''
+        particle = cls.__new__(cls)
+        particle._bind(particle_array, index)
+        return particle
+
+    @property
+    def params(self):
+        '''
+        Parameter dictionary. For views, a read-only copy of the row is
+        returned; assign a new dictionary (particle.params = {...}) to change
+        the parameters.
+        '''
+        if self._particle_array is None:
+            return self._params
+        params = self._particle_array.get_param_dict(self._index)
+        return _ReadOnlyParams(params)
+
+    @params.setter
+    def params(self, params):
+        if self._particle_array is None:
+            self._params = params
+        elif sorted(params) == sorted(self._particle_array.param_names):
+            self._particle_array.set_param_dict(self._index, params)
+        else:
+            self._detach()
+            self._params = params
+
+    @property
+    def log_weight(self):
+        if self._particle_array is None:
+            return self._log_weight
+        return self._particle_array.log_weights[self._index]
+
+    @log_weight.setter
+    def log_weight(self, log_weight):
+        if self._particle_array is None:
+            self._log_weight = log_weight
+        else:
+            self._particle_array.set_log_weight(self._index, log_weight)
+
+    @property
+    def log_like(self):
+        if self._particle_array is None:
+            return self._log_like
+        return self._particle_array.log_likes[self._index]
+
+    @log_like.setter
+    def log_like(self, log_like):
+        if self._particle_array is None:
+            self._log_like = log_like
+        else:
+            self._particle_array.set_log_like(self._index, log_like)
+
+    def is_view(self):
+        '''
+        Returns True if the particle is a view onto a ParticleArray row.
+        '''
+        return self._particle_array is not None
 
     def print_particle_info(self):
         '''
@@ -63,13 +135,30 @@ class Particle():
 
     def copy(self):
         '''
-        Returns a deep copy of self.
+        Returns a deep copy of self. Copies of views own their values.
         '''
         return deepcopy(self)
 
+    def __getstate__(self):
+        return {'_particle_array': None, '_index': None,
+                '_params': dict(self.params), '_log_weight': self.log_weight,
+                '_log_like': self.log_like}
+
+    def _bind(self, particle_array, index):
+        self._particle_array = particle_array
+        self._index = index
+        self._params = None
+        self._log_weight = None
+        self._log_like = None
+        return None
+
+    def _detach(self):
+        self.__dict__.update(self.__getstate__())
+        return None
+
     @staticmethod
     def _check_params(params):
-        if type(params) is not dict:
+        if not isinstance(params, dict):
             raise TypeError('Input "params" must be a dictionary.')
         return params
 
@@ -86,3 +175,20 @@ class Particle():
         if log_like > 0:
             raise ValueError('Input "log_like" must be negative.')
         return log_like
+
+
+class _ReadOnlyParams(dict):
+    '''
+    Parameter dictionary of a particle view; item assignment raises instead
+    of silently modifying a copy of the particle's row.
+    '''
+
+    def _raise_read_only(self, *args, **kwargs):
+        raise TypeError('parameters of a particle view are read-only; assign '
+                        'a new dictionary to Particle.params instead.')
+
+    __setitem__ = __delitem__ = _raise_read_only
+    clear = pop = popitem = setdefault = update = _raise_read_only
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
@@ -0,0 +1,370 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import numpy as np
+from .particle import Particle
+
+
+class ParticleArray(object):
+    '''
+    Columnar storage for a collection of SMC particles. Parameter values are
+    held in a 2D float64 array (one row per particle, one column per
+    parameter) alongside 1D arrays of log weights and log likelihoods. The
+    parameter name ordering is fixed at construction and defines the column
+    ordering of the parameter array.
+
+    The arrays exposed through the params, log_weights and log_likes
+    properties are read-only; all modifications go through the set_*
+    methods, which increment a version counter so that dependent quantities
+    (e.g., weighted moments cached by SMCStep) can detect changes.
+
+    snapshot() returns a copy-on-write copy: the underlying arrays are frozen
+    and shared, and whichever instance writes to a column first makes its
+    own copy of that column only.
+    '''
+
+    def __init__(self, param_names, params, log_weights, log_likes):
+        '''
+        :param param_names: parameter names, in column order
+        :type param_names: list or tuple of strings
+        :param params: parameter values; shape = (num_particles, num_params)
+        :type params: array_like
+        :param log_weights: log weight of each particle
+        :type log_weights: array_like
+        :param log_likes: log likelihood of each particle
+        :type log_likes: array_like
+        '''
+        self._param_names = tuple(param_names)
+        self._params = self._check_params(params, len(self._param_names))
+        self._log_weights = self._check_column(log_weights, 'log_weights')
+        self._log_likes = self._check_column(log_likes, 'log_likes')
+        self._version = 0
+        self._buffers = None
+
+    @classmethod
+    def from_particles(cls, particles):
+        '''
+        Builds a ParticleArray from a list of Particle instances. The column
+        ordering is taken from the parameter dictionary of the first particle.
+
+        :param particles: list of particle instances
+        :type particles: list
+        '''
+        if len(particles) == 0:
+            return cls([], np.empty((0, 0)), [], [])
+        param_names = list(particles[0].params.keys())
+        params = np.empty((len(particles), len(param_names)))
+        for i, particle in enumerate(particles):
+            particle_params = particle.params
+            if len(particle_params) != len(param_names):
+                cls._raise_param_name_mismatch()
+            try:
+                params[i] = [particle_params[key] for key in param_names]
+            except KeyError:
+                cls._raise_param_name_mismatch()
+        log_weights = [particle.log_weight for particle in particles]
+        log_likes = [particle.log_like for particle in particles]
+        return cls(param_names, params, log_weights, log_likes)
+
+    @classmethod
+    def concatenate(cls, particle_arrays):
+        '''
+        Stacks ParticleArrays row-wise; parameter columns of later arrays
+        are reordered to match the first.
+
+        :param particle_arrays: list of ParticleArray instances
+        :type particle_arrays: list
+        '''
+        param_names = particle_arrays[0].param_names
+        particle_arrays = [particle_array.reorder_params(param_names)
+                           for particle_array in particle_arrays]
+        params = np.vstack([pa.params.reshape(-1, len(param_names))
+                            for pa in particle_arrays])
+        log_weights = np.concatenate([pa.log_weights
+                                      for pa in particle_arrays])
+        log_likes = np.concatenate([pa.log_likes for pa in particle_arrays])
+        return cls(param_names, params, log_weights, log_likes)
+
+    def __len__(self):
+        return self._log_weights.shape[0]
+
+    @property
+    def param_names(self):
+        return self._param_names
+
+    @property
+    def params(self):
+        return self._read_only(self._params)
+
+    @property
+    def log_weights(self):
+        return self._read_only(self._log_weights)
+
+    @property
+    def log_likes(self):
+        return self._read_only(self._log_likes)
+
+    def get_version(self):
+        '''
+        Returns a counter that is incremented every time the stored params,
+        log weights or log likelihoods are modified.
+        '''
+        return self._version
+
+    def get_param_index(self, key):
+        '''
+        Returns the column index of the parameter named <key>.
+
+        :param key: parameter name
+        :type key: str
+        '''
+        return self._param_names.index(key)
+
+    def get_param_dict(self, index):
+        '''
+        Returns the parameters of a single particle as a dictionary.
+
+        :param index: index of the particle
+        :type index: int
+        '''
+        return dict(zip(self._param_names, self._params[index]))
+
+    def set_param_dict(self, index, params):
+        '''
+        Overwrites the parameters of a single particle.
+
+        :param index: index of the particle
+        :type index: int
+        :param params: parameter dictionary; keys must match self.param_names
+        :type params: dict
+        '''
+        self._params = self._writable(self._params)
+        self._params[index] = [params[key] for key in self._param_names]
+        self._version += 1
+        return None
+
+    def set_params(self, params):
+        '''
+        Overwrites the parameters of every particle.
+
+        :param params: shape = (num_particles, num_params)
+        :type params: array_like
+        '''
+        params = self._check_params(params, len(self._param_names))
+        if params.shape[0] != len(self):
+            raise ValueError('"params" must have one row per particle.')
+        self._params = params
+        self._version += 1
+        return None
+
+    def set_log_weight(self, index, log_weight):
+        self._log_weights = self._writable(self._log_weights)
+        self._log_weights[index] = log_weight
+        self._version += 1
+        return None
+
+    def set_log_like(self, index, log_like):
+        self._log_likes = self._writable(self._log_likes)
+        self._log_likes[index] = log_like
+        self._version += 1
+        return None
+
+    def set_log_weights(self, log_weights):
+        self._log_weights = self._check_column(log_weights, 'log_weights')
+        self._version += 1
+        return None
+
+    def set_log_likes(self, log_likes):
+        self._log_likes = self._check_column(log_likes, 'log_likes')
+        self._version += 1
+        return None
+
+    def append(self, params, log_weight, log_like):
+        '''
+        Appends a single particle. Storage grows geometrically, so building
+        an array one particle at a time takes amortized constant time per
+        particle.
+
+        :param params: parameter dictionary; keys must match self.param_names
+        :type params: dict
+        :param log_weight: log weight of the particle
+        :type log_weight: float
+        :param log_like: log likelihood of the particle
+        :type log_like: float
+        '''
+        if sorted(params) != sorted(self._param_names):
+            self._raise_param_name_mismatch()
+        num_particles = len(self)
+        params_buffer, log_weights_buffer, log_likes_buffer = \
+            self._get_append_buffers(num_particles + 1)
+        params_buffer[num_particles] = [params[key]
+                                        for key in self._param_names]
+        log_weights_buffer[num_particles] = log_weight
+        log_likes_buffer[num_particles] = log_like
+        self._params = params_buffer[:num_particles + 1]
+        self._log_weights = log_weights_buffer[:num_particles + 1]
+        self._log_likes = log_likes_buffer[:num_particles + 1]
+        self._version += 1
+        return None
+
+    def _get_append_buffers(self, num_particles):
+        '''
+        Returns buffers (params, log weights, log likelihoods) with room for
+        num_particles rows whose leading rows hold the current arrays. The
+        buffers of the last append() are reused while the arrays are still
+        writable views of them; a snapshot() or set_*() call makes new ones.
+        '''
+        columns = (self._params, self._log_weights, self._log_likes)
+        if self._buffers is not None and \
+                all(column.flags.writeable and column.base is buffer
+                    for column, buffer in zip(columns, self._buffers)) and \
+                self._buffers[1].shape[0] >= num_particles:
+            return self._buffers
+        capacity = max(2 * num_particles, 8)
+        buffers = []
+        for column in columns:
+            buffer = np.empty((capacity,) + column.shape[1:])
+            buffer[:column.shape[0]] = column
+            buffers.append(buffer)
+        self._buffers = tuple(buffers)
+        return self._buffers
+
+    def take(self, indices):
+        '''
+        Returns a new ParticleArray containing the particles at <indices>
+        (repeats allowed); arrays are copied.
+
+        :param indices: integer indices of particles to keep
+        :type indices: array_like
+        '''
+        indices = np.asarray(indices, dtype=int)
+        return ParticleArray(self._param_names, self._params[indices],
+                             self._log_weights[indices],
+                             self._log_likes[indices])
+
+    def reorder_params(self, param_names):
+        '''
+        Returns a ParticleArray with the parameter columns in the order given
+        by <param_names>; returns self if the ordering already matches. An
+        empty ParticleArray may be reordered to any parameter names.
+
+        :param param_names: parameter names, in the desired column order
+        :type param_names: list or tuple of strings
+        '''
+        if tuple(param_names) == self._param_names:
+            return self
+        if len(self) == 0:
+            params = np.empty((0, len(param_names)))
+        else:
+            if sorted(param_names) != sorted(self._param_names):
+                self._raise_param_name_mismatch()
+            columns = [self.get_param_index(key) for key in param_names]
+            params = self._params[:, columns]
+        return ParticleArray(param_names, params, self._log_weights,
+                             self._log_likes)
+
+    def copy(self):
+        '''
+        Returns a copy with independent underlying arrays.
+        '''
+        return ParticleArray(self._param_names, self._params.copy(),
+                             self._log_weights.copy(), self._log_likes.copy())
+
+    def snapshot(self):
+        '''
+        Returns a copy-on-write copy that shares the underlying arrays with
+        self. No data is copied until either instance is modified, and then
+        only the modified column is copied.
+        '''
+        for array in (self._params, self._log_weights, self._log_likes):
+            array.flags.writeable = False
+        snapshot = ParticleArray.__new__(ParticleArray)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot._version = 0
+        return snapshot
+
+    def shares_memory_with(self, other):
+        '''
+        Returns a dictionary indicating, for each column (params, log_weights
+        and log_likes), whether it is shared with another ParticleArray.
+        '''
+        return {'params': self._params is other._params,
+                'log_weights': self._log_weights is other._log_weights,
+                'log_likes': self._log_likes is other._log_likes}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_buffers'] = None
+        return state
+
+    def get_particle(self, index):
+        '''
+        Returns a Particle instance that acts as a view onto row <index>.
+        '''
+        return Particle.from_particle_array(self, index)
+
+    def get_particles(self):
+        '''
+        Returns a list of Particle views, one per row.
+        '''
+        return [self.get_particle(i) for i in range(len(self))]
+
+    @staticmethod
+    def _writable(array):
+        if array.flags.writeable:
+            return array
+        return array.copy()
+
+    @staticmethod
+    def _read_only(array):
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+    @staticmethod
+    def _check_params(params, num_params):
+        params = np.array(params, dtype=float)
+        if params.ndim != 2 or params.shape[1] != num_params:
+            raise ValueError('"params" must have shape (num_particles, %s).'
+                             % num_params)
+        return params
+
+    def _check_column(self, column, name):
+        column = np.array(column, dtype=float).ravel()
+        if column.shape[0] != self._params.shape[0]:
+            raise ValueError('"%s" length must equal number of particles.'
+                             % name)
+        return column
+
+    @staticmethod
+    def _raise_param_name_mismatch():
+        raise ValueError('All particles must share the same parameter names.')
@@ -31,19 +31,69 @@ AGREEMENT.
 '''
 
 import numpy as np
+from .particle_array import ParticleArray
 
 
 class ParticleDistributor():
     '''
     Manages partitioning, scattering, and gathering of particles for a given
     particle step in an MPI operating environment.
+
+    Particle data is moved as contiguous float64 buffers with the buffer-based
+    collectives Scatterv/Gatherv (see scatter_particle_array() and
+    gather_particle_array()), so communication cost scales with the number
+    of bytes moved rather than with the number of particle objects. The
+    parameter name ordering (the column ordering of the buffers) is
+    broadcast once per distributor; reuse one distributor for an entire run
+    via set_step().
     '''
 
-    def __init__(self, step, mpi_comm):
+    def __init__(self, step, mpi_comm, param_names=None):
+        '''
+        :param step: step to distribute (only used on rank 0)
+        :type step: SMCStep class instance or None
+        :param mpi_comm: mpi communicator (or SingleRankComm)
+        :type mpi_comm: object
+        :param param_names: parameter name ordering used for all transfers;
+            default is None, in which case the ordering of the step on rank
+            0 is broadcast the first time it is needed.
+        :type param_names: list or None
+        '''
         self._comm = mpi_comm
         self._size = self._comm.Get_size()
         self._rank = self._comm.Get_rank()
         self._step = step
+        self._param_names = param_names
+
+    def set_step(self, step):
+        '''
+        Sets the step to distribute, keeping the parameter name ordering.
+
+        :param step: step to distribute (only used on rank 0)
+        :type step: SMCStep class instance or None
+        '''
+        self._step = step
+        return None
+
+    def get_param_names(self, local_param_names=None):
+        '''
+        Returns the parameter name ordering shared by all ranks. The ordering
+        is broadcast from rank 0 the first time this method is called (all
+        ranks must call it together); later calls use the cached ordering.
+
+        :param local_param_names: ordering to broadcast from rank 0; default
+            is the parameter ordering of the step on rank 0
+        :type local_param_names: list or None
+        '''
+        if self._param_names is None:
+            if self._rank == 0:
+                if local_param_names is None:
+                    local_param_names = self._step.get_param_names()
+                param_names = list(local_param_names)
+            else:
+                param_names = None
+            self._param_names = self._comm.bcast(param_names, root=0)
+        return self._param_names
 
     def partition_particles(self):
         '''
@@ -84,3 +134,101 @@ class ParticleDistributor():
             particles = list(np.concatenate(particles))
 
         return particles
+
+    def get_partition_counts(self, num_particles):
+        '''
+        Returns the number of particles assigned to each mpi process; counts
+        differ by at most one (same partitioning as np.array_split).
+
+        :param num_particles: total number of particles
+        :type num_particles: int
+        '''
+        counts = np.tile(num_particles // self._size, self._size)
+        counts[:num_particles % self._size] += 1
+        return counts
+
+    def scatter_particle_array(self):
+        '''
+        Partitions the particles of the step on rank 0 and scatters them to
+        all mpi processes as contiguous buffers.
+
+        :returns: ParticleArray holding the local partition of particles
+        '''
+        param_names = self.get_param_names()
+        if self._rank == 0:
+            particle_array = self._step.get_particle_array()
+            particle_array = particle_array.reorder_params(param_names)
+            num_particles = len(particle_array)
+        else:
+            particle_array = None
+            num_particles = None
+        num_particles = self._comm.bcast(num_particles, root=0)
+        counts = self.get_partition_counts(num_particles)
+        num_local = counts[self._rank]
+
+        num_params = len(param_names)
+        params = np.empty((num_local, num_params))
+        log_weights = np.empty(num_local)
+        log_likes = np.empty(num_local)
+        if self._rank == 0:
+            send = [particle_array.params, particle_array.log_weights,
+                    particle_array.log_likes]
+        else:
+            send = [None] * 3
+        self._scatterv(send[0], params, counts * num_params)
+        self._scatterv(send[1], log_weights, counts)
+        self._scatterv(send[2], log_likes, counts)
+        return ParticleArray(param_names, params, log_weights, log_likes)
+
+    def gather_particle_array(self, particle_array):
+        '''
+        Gathers the local particles of all mpi processes to rank 0 as
+        contiguous buffers.
+
+        :param particle_array: local particles
+        :type particle_array: ParticleArray class instance
+
+        :returns: ParticleArray holding all particles (rank 0)
+                  None (all other ranks)
+        '''
+        param_names = self.get_param_names(particle_array.param_names)
+        particle_array = particle_array.reorder_params(param_names)
+        counts = self._comm.gather(len(particle_array), root=0)
+
+        num_params = len(param_names)
+        if self._rank == 0:
+            counts = np.array(counts)
+            num_particles = np.sum(counts)
+            params = np.empty((num_particles, num_params))
+            log_weights = np.empty(num_particles)
+            log_likes = np.empty(num_particles)
+        else:
+            params = log_weights = log_likes = None
+        self._gatherv(particle_array.params, params, counts, num_params)
+        self._gatherv(particle_array.log_weights, log_weights, counts)
+        self._gatherv(particle_array.log_likes, log_likes, counts)
+
+        if self._rank == 0:
+            return ParticleArray(param_names, params, log_weights, log_likes)
+        return None
+
+    def _scatterv(self, send_array, recv_array, counts):
+        if self._rank == 0:
+            displacements = np.insert(np.cumsum(counts), 0, 0)[:-1]
+            send_array = np.ascontiguousarray(send_array, dtype=float)
+            send = [send_array, (counts, displacements)]
+        else:
+            send = None
+        self._comm.Scatterv(send, recv_array, root=0)
+        return None
+
+    def _gatherv(self, send_array, recv_array, counts, row_size=1):
+        send_array = np.ascontiguousarray(send_array, dtype=float)
+        if self._rank == 0:
+            counts = counts * row_size
+            displacements = np.insert(np.cumsum(counts), 0, 0)[:-1]
+            recv = [recv_array, (counts, displacements)]
+        else:
+            recv = None
+        self._comm.Gatherv(send_array, recv, root=0)
+        return None
@@ -31,8 +31,11 @@ AGREEMENT.
 '''
 
 from copy import copy
-from pymc import Normal, Deterministic
-from ..particles.particle import Particle
+from pymc import Normal
+from scipy.stats import norm
+from ..model.base_model import evaluate_model_batch
+from ..particles.particle_array import ParticleArray
+from ..priors.prior_distributions import JointPrior, is_supported
 from ..utils.single_rank_comm import SingleRankComm
 import numpy as np
 import warnings
@@ -41,6 +44,12 @@ import warnings
 class ParticleInitializer():
     '''
     Class to initialize particles prior to Sequential Monte Carlo sampling.
+
+    Parameters are drawn from the prior (or the proposal distribution, see
+    set_proposal_distribution()) for all particles at once as arrays, and
+    the model is evaluated for all particles in one batch. Priors that are
+    not supported by smcpy.priors.prior_distributions (e.g., KDE) are
+    sampled particle by particle through PyMC.
     '''
 
     def __init__(self, mcmc, temp_schedule, mpi_comm=SingleRankComm()):
@@ -56,33 +65,47 @@ class ParticleInitializer():
         Initializes first set of particles based on the prior and proposal
         distributions.
 
-        :param measurement_std_dev: standard deviation of the measurement error;
-            if unknown, set to None and it will be estimated along with other
-            model parameters.
+        :param measurement_std_dev: standard deviation of the measurement
+            error; if unknown, set to None and it will be estimated along with
+            other model parameters.
         :type measurement_std_dev: float or None
         :param num_particles: number of particles to use during sampling
         :type num_particles: int
+
+        :Returns: list of Particle instances (the partition of this rank)
         '''
-        self.num_particles = num_particles
-        m_std = measurement_std_dev
+        particle_array = self.initialize_particle_array(measurement_std_dev,
+                                                        num_particles)
+        return [particle.copy() for particle in particle_array.get_particles()]
 
-        if m_std is not None:
-            self._mcmc.generate_pymc_model(fix_var=True, std_dev0=m_std)
-        else:
-            self._mcmc.generate_pymc_model(fix_var=False, std_dev0=1.0)
+    def initialize_particle_array(self, measurement_std_dev, num_particles):
+        '''
+        Same as initialize_particles(), but returns the particles of this
+        rank as a ParticleArray.
 
+        :param measurement_std_dev: standard deviation of the measurement
+            error; if unknown, set to None and it will be estimated along with
+            other model parameters.
+        :type measurement_std_dev: float or None
+        :param num_particles: number of particles to use during sampling
+        :type num_particles: int
+        '''
+        self.num_particles = num_particles
+        m_std = measurement_std_dev
         num_particles_per_partition = self._get_num_particles_per_partition()
 
-        particles = []
-        prior_variables = self._create_prior_random_variables()
-        if self.proposal_center is not None:
-            proposal_variables = self._create_proposal_random_variables()
+        param_names = self._get_param_names(m_std)
+        param_priors = self._get_param_priors()
+        if is_supported(param_priors):
+            params, log_prob_ratios = self._sample_params(
+                param_priors, param_names, num_particles_per_partition)
         else:
-            proposal_variables = None
-        for _ in range(num_particles_per_partition):
-            part = self._create_particle(prior_variables, proposal_variables)
-            particles.append(part)
-        return particles
+            params, log_prob_ratios = self._sample_params_with_pymc(
+                m_std, param_names, num_particles_per_partition)
+
+        log_likes = self._evaluate_likelihoods(params, param_names, m_std)
+        log_weights = log_likes * self.temp_schedule[1] + log_prob_ratios
+        return ParticleArray(param_names, params, log_weights, log_likes)
 
     def set_proposal_distribution(self, proposal_center, proposal_scales=None):
         '''
@@ -124,6 +147,74 @@ class ParticleInitializer():
             num_particles_per_partition += 1
         return num_particles_per_partition
 
+    def _get_param_names(self, measurement_std_dev):
+        param_names = list(self._mcmc.params.keys())
+        if measurement_std_dev is None:
+            param_names.append('std_dev')
+        return param_names
+
+    def _get_param_priors(self):
+        param_priors = dict(self._mcmc.params)
+        param_priors['std_dev'] = self._mcmc.std_dev_prior
+        return param_priors
+
+    def _sample_params(self, param_priors, param_names, num_samples):
+        '''
+        Draws all particles at once; parameters without a proposal center
+        (e.g., std_dev) are drawn from their prior, so they do not contribute
+        to the prior to proposal density ratio.
+        '''
+        if self.proposal_center is None:
+            params = JointPrior(param_priors, param_names).sample(num_samples)
+            return params, np.zeros(num_samples)
+
+        proposed = [key for key in param_names if key in self.proposal_center]
+        not_proposed = [key for key in param_names if key not in proposed]
+        centers = np.array([self.proposal_center[key] for key in proposed],
+                           dtype=float)
+        scales = np.array([self.proposal_scales[key] for key in proposed],
+                          dtype=float)
+        proposed_params = np.random.normal(centers, scales,
+                                           (num_samples, len(proposed)))
+        prior_params = JointPrior(param_priors,
+                                  not_proposed).sample(num_samples)
+
+        params = np.empty((num_samples, len(param_names)))
+        for names, values in [(proposed, proposed_params),
+                              (not_proposed, prior_params)]:
+            for i, key in enumerate(names):
+                params[:, param_names.index(key)] = values[:, i]
+
+        prop_logp = np.sum(norm.logpdf(proposed_params, centers, scales),
+                           axis=1)
+        prior_logp = JointPrior(param_priors, proposed).logpdf(proposed_params)
+        if not np.all(np.isfinite(prior_logp)):
+            raise ValueError('Proposal distribution produced particles with '
+                             'zero prior probability.')
+        return params, prior_logp - prop_logp
+
+    def _sample_params_with_pymc(self, measurement_std_dev, param_names,
+                                 num_samples):
+        if measurement_std_dev is not None:
+            self._mcmc.generate_pymc_model(fix_var=True,
+                                           std_dev0=measurement_std_dev)
+        else:
+            self._mcmc.generate_pymc_model(fix_var=False, std_dev0=1.0)
+
+        prior_variables = self._create_prior_random_variables()
+        if self.proposal_center is not None:
+            proposal_variables = self._create_proposal_random_variables()
+        else:
+            proposal_variables = None
+
+        params = np.empty((num_samples, len(param_names)))
+        log_prob_ratios = np.empty(num_samples)
+        for i in range(num_samples):
+            param_dict, log_prob_ratios[i] = self._sample_particle_params(
+                prior_variables, proposal_variables)
+            params[i] = [param_dict[key] for key in param_names]
+        return params, log_prob_ratios
+
     def _create_prior_random_variables(self,):
         mcmc = copy(self._mcmc)
         random_variables = dict()
@@ -153,20 +244,15 @@ class ParticleInitializer():
 
         return random_variables
 
-    def _create_particle(self, prior_variables, prop_variables=None):
+    def _sample_particle_params(self, prior_variables, prop_variables=None):
         if prop_variables is None:
             params = self._sample_random_variables(prior_variables)
-            prior_logp = self._compute_log_prob(prior_variables)
-            prop_logp = prior_logp
-        else:
-            params = self._sample_random_variables(prop_variables)
-            prop_logp = self._compute_log_prob(prop_variables)
-            self._set_random_variables_value(prior_variables, params)
-            prior_logp = self._compute_log_prob(prior_variables)
-        log_like = self._evaluate_likelihood(params)
-        temp_step = self.temp_schedule[1]
-        log_weight = log_like * temp_step + prior_logp - prop_logp
-        return Particle(params, log_weight, log_like)
+            return params, 0.
+        params = self._sample_random_variables(prop_variables)
+        prop_logp = self._compute_log_prob(prop_variables)
+        self._set_random_variables_value(prior_variables, params)
+        prior_logp = self._compute_log_prob(prior_variables)
+        return params, prior_logp - prop_logp
 
     def _sample_random_variables(self, random_variables):
         param_keys = random_variables.keys()
@@ -184,18 +270,24 @@ class ParticleInitializer():
         param_log_prob = np.sum([rv.logp for rv in random_variables.values()])
         return param_log_prob
 
-    def _evaluate_likelihood(self, param_vals):
+    def _evaluate_likelihoods(self, params, param_names, measurement_std_dev):
         '''
-        Note: this method performs 1 model evaluation per call.
+        Note: this method evaluates the model for all particles at once using
+        the model's evaluate_batch() method, if available.
         '''
-        mcmc = copy(self._mcmc)
-        for key, value in param_vals.iteritems():
-            index = mcmc.pymc_mod_order.index(key)
-            mcmc.pymc_mod[index].value = value
-        results_index = mcmc.pymc_mod_order.index('results')
-        results_rv = mcmc.pymc_mod[results_index]
-        log_like = results_rv.logp
-        return log_like
+        if len(params) == 0:
+            return np.array([])
+        model_param_names = list(self._mcmc.params.keys())
+        model_columns = [param_names.index(key) for key in model_param_names]
+        outputs = evaluate_model_batch(self._mcmc.model,
+                                       params[:, model_columns],
+                                       model_param_names)
+        if measurement_std_dev is None:
+            std_devs = params[:, param_names.index('std_dev')]
+        else:
+            std_devs = measurement_std_dev
+        likelihood = self._mcmc.get_likelihood()
+        return likelihood.compute_log_likelihood(outputs, std_devs)
 
     @staticmethod
     def _check_proposal_dist_inputs(proposal_center, proposal_scales):
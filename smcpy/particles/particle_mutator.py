@@ -31,9 +31,18 @@ AGREEMENT.
 '''
 
 
+from ..mcmc.pymc_chain import PyMCChain
+from ..mcmc.smc_kernel import SMCMetropolisKernel
+from ..particles.particle_array import ParticleArray
+from ..particles.particle_distributor import ParticleDistributor
+from ..priors.prior_distributions import is_supported
+from ..utils.factorized_covariance import factorize_step_covariance
+from ..utils import mpi_ops
 from ..utils.single_rank_comm import SingleRankComm
-from copy import copy
+from ..utils.weighted_moments import WeightedMoments
+from ..utils.work_queue import WorkQueue
 import numpy as np
+import time
 
 
 class ParticleMutator():
@@ -41,17 +50,90 @@ class ParticleMutator():
     Class for mutating particles at each step of Sequential Monte Carlo sampling
     with the main `mutate_new_particles` method, which uses the MCMC kernal to
     determine the distribution along the temperature schedule path.
+
+    Available mutation kernels:
+        o native - vectorized Metropolis kernel that advances all particles
+              on a rank together (SMCMetropolisKernel); priors it does not
+              support (e.g., KDE priors) fall back to the pymc kernel, as in
+              ParticleInitializer
+        o pymc - one PyMC model and SMC_Metropolis chain per particle
+
+    By default the particles of the step on rank 0 are scattered to all
+    ranks, mutated and gathered back. In distributed mode each rank mutates
+    the particles of its local step in place and only the step covariance
+    is computed collectively.
+
+    Available load balancing modes:
+        o static - each rank mutates an equal share of the particles
+        o dynamic - rank 0 hands out chunks of particles on demand (see
+              WorkQueue), so ranks that draw cheap model evaluations mutate
+              more particles; not available in distributed mode
+
+    After mutate_particles(), load_report holds (on rank 0) one dictionary
+    per rank with the time spent mutating ('busy_time') and waiting for
+    other ranks ('idle_time'), and the number of chunks and particles
+    mutated.
+
+    The proposal covariance is the weighted step covariance times
+    proposal_scale**2 (see ProposalScaler for adaptive scaling).
+
+    Available MCMC step control modes:
+        o fixed - every particle takes num_mcmc_steps Metropolis steps
+        o adaptive - after num_mcmc_steps steps, all particles keep taking
+              single steps until the fraction of particles that moved at
+              least once reaches target_moved_fraction or max_mcmc_steps
+              steps (model evaluations per particle) were taken; with
+              dynamic load balancing the criterion is applied per chunk
+
+    The number of steps taken is stored in num_steps_taken (the mean over
+    chunks, weighted by their size, with dynamic load balancing), and the
+    fraction of accepted parameter proposals over all ranks in
+    acceptance_rate (None if nothing was proposed). The acceptance rate
+    counts the block proposals of the model parameters only, not the
+    separate std_dev moves of the pymc kernel.
     '''
 
-    def __init__(self, step, mcmc, num_mcmc_steps, mpi_comm=SingleRankComm()):
+    available_kernels = ['native', 'pymc']
+    available_load_balancing = ['static', 'dynamic']
+    available_mcmc_step_control = ['fixed', 'adaptive']
+
+    def __init__(self, step, mcmc, num_mcmc_steps, mpi_comm=SingleRankComm(),
+                 mutation_kernel='native', distributor=None,
+                 distributed=False, load_balancing='static',
+                 proposal_scale=1., mcmc_step_control='fixed',
+                 target_moved_fraction=0.9, max_mcmc_steps=None):
         self.step = step
+        self.proposal_scale = proposal_scale
         self._comm = mpi_comm
+        self._distributed = distributed
+        self._check_load_balancing(load_balancing, distributed)
+        self.load_balancing = load_balancing
+        self.load_report = None
+        if distributor is None:
+            distributor = ParticleDistributor(step, mpi_comm)
+        else:
+            distributor.set_step(step)
+        self._distributor = distributor
         self._mcmc = mcmc
         self.num_mcmc_steps = num_mcmc_steps
+        if max_mcmc_steps is None:
+            max_mcmc_steps = 10 * num_mcmc_steps
+        self._check_mcmc_step_control(mcmc_step_control, target_moved_fraction,
+                                      num_mcmc_steps, max_mcmc_steps)
+        self.mcmc_step_control = mcmc_step_control
+        self.target_moved_fraction = target_moved_fraction
+        self.max_mcmc_steps = max_mcmc_steps
+        self.num_steps_taken = None
+        self.acceptance_rate = None
+        self._acceptance_counts = np.zeros(2)
         self._size = self._comm.Get_size()
         self._rank = self._comm.Get_rank()
+        self._check_mutation_kernel(mutation_kernel)
+        self.mutation_kernel = mutation_kernel
+        self._native_kernel = None
+        self._pymc_chain = None
 
-    def mutate_particles(self, measurement_std_dev=None, temperature_step=1):
+    def mutate_particles(self, measurement_std_dev=None, temperature=1):
         '''
         Predicts next distribution along the temperature schedule path using
         the MCMC kernel.
@@ -60,77 +142,308 @@ class ParticleMutator():
             if unknown, set to None and it will be sampled along with other
             model parameters.
         :type measurement_std_dev: float or None
-        :param temperature_step: difference in temp schedule between steps
-        :type temperature_step: float
+        :param temperature: current temperature, i.e. the exponent of the
+            likelihood in the target distribution of the mutation
+        :type temperature: float
 
         :Returns: An SMCStep class instance that contains all particles after
             mutation.
         '''
         covariance = self._compute_step_covariance()
-        particles = self._partition_and_scatter_particles()
-        mcmc = copy(self._mcmc)
-        step_method = 'smc_metropolis'
-        new_particles = []
+        if self.proposal_scale != 1.:
+            covariance = covariance.scaled(self.proposal_scale)
+        self._pymc_chain = None
+        self._acceptance_counts = np.zeros(2)
+        if self._rank == 0 or self._distributed:
+            self._check_log_likes(self.step.get_particle_array(),
+                                  measurement_std_dev)
+        mutate = self._get_mutate_function()
+        if self.load_balancing == 'dynamic':
+            return self._mutate_with_work_queue(mutate, covariance,
+                                                measurement_std_dev,
+                                                temperature)
+
+        if self._distributed:
+            particle_array = self.step.get_particle_array()
+        else:
+            particle_array = self._distributor.scatter_particle_array()
+        start_time = time.time()
+        new_particle_array, mutation_count, self.num_steps_taken = \
+            self._run_mcmc(mutate, particle_array, covariance,
+                           measurement_std_dev, temperature,
+                           self._compute_global_mutation_ratio)
+        self.load_report = self._gather_static_load_report(
+            time.time() - start_time, len(particle_array))
+
+        self._mutation_ratio = self._compute_global_mutation_ratio(
+            mutation_count, len(particle_array))
+        self.acceptance_rate = self._compute_global_acceptance_rate()
+        if self._distributed:
+            self.step.set_particle_array(new_particle_array)
+            return self.step
+
+        new_particle_array = self._distributor.gather_particle_array(
+            new_particle_array)
+        self.step = self._update_step_with_new_particles(new_particle_array)
+        return self.step
+
+    def _mutate_with_work_queue(self, mutate, covariance, measurement_std_dev,
+                                temperature):
+        particle_array = None
+        num_particles = 0
+        if self._rank == 0:
+            particle_array = self.step.get_particle_array()
+            num_particles = len(particle_array)
+
+        def load_chunk(start, stop):
+            return particle_array.take(np.arange(start, stop))
+
+        def mutate_chunk(start, stop, chunk):
+            return self._run_mcmc(mutate, chunk, covariance,
+                                  measurement_std_dev, temperature,
+                                  self._compute_local_mutation_ratio)
+
+        work_queue = WorkQueue(self._comm)
+        results = work_queue.map(mutate_chunk, num_particles, load_chunk)
+        self.load_report = work_queue.load_report
+
         mutation_count = 0
-        for particle in particles:
+        num_steps_taken = self.num_mcmc_steps
+        new_particle_array = None
+        if self._rank == 0:
+            mutation_count = sum(count for _, count, _ in results)
+            if results:
+                num_steps_taken = float(
+                    sum(len(chunk) * num_steps for chunk, _, num_steps
+                        in results)) / num_particles
+            chunks = [chunk for chunk, _, _ in results] or [particle_array]
+            new_particle_array = ParticleArray.concatenate(chunks)
+        mutation_count, num_particles, self.num_steps_taken = \
+            self._comm.bcast((mutation_count, num_particles, num_steps_taken),
+                             root=0)
+        self._mutation_ratio = float(mutation_count) / max(num_particles, 1)
+        self.acceptance_rate = self._compute_global_acceptance_rate()
+        self.step = self._update_step_with_new_particles(new_particle_array)
+        return self.step
 
-            if measurement_std_dev is None:
-                std_dev0 = particle.params['std_dev']
-            else:
-                std_dev0 = measurement_std_dev
+    def _run_mcmc(self, mutate, particle_array, covariance,
+                  measurement_std_dev, temperature, compute_ratio):
+        '''
+        Runs the MCMC steps of the step control mode and returns the mutated
+        particles, the number of particles that moved and the number of
+        steps taken. compute_ratio(num_moved, num_particles) returns the
+        fraction of moved particles that is compared with
+        target_moved_fraction; in static load balancing it is a collective
+        call, so all ranks take the same number of steps.
+        '''
+        particle_array, moved = mutate(particle_array, covariance,
+                                       measurement_std_dev, temperature,
+                                       self.num_mcmc_steps)
+        num_steps = self.num_mcmc_steps
+        if self.mcmc_step_control == 'adaptive':
+            while num_steps < self.max_mcmc_steps and \
+                    compute_ratio(np.sum(moved), len(moved)) < \
+                    self.target_moved_fraction:
+                particle_array, step_moved = mutate(particle_array,
+                                                    covariance,
+                                                    measurement_std_dev,
+                                                    temperature, 1)
+                moved = moved | step_moved
+                num_steps += 1
+        return particle_array, np.sum(moved), num_steps
 
-            mcmc.generate_pymc_model(fix_var=bool(measurement_std_dev),
-                                     std_dev0=std_dev0, q0=particle.params)
+    @staticmethod
+    def _compute_local_mutation_ratio(mutation_count, num_particles):
+        return float(mutation_count) / max(num_particles, 1)
 
-            mcmc.sample(self.num_mcmc_steps, burnin=0, step_method=step_method,
-                        cov=covariance, verbose=-1, phi=temperature_step)
-            stochastics = mcmc.MCMC.db.getstate()['stochastics']
-            params = {key: stochastics[key] for key in particle.params.keys()}
+    def _compute_global_mutation_ratio(self, mutation_count, num_particles):
+        '''
+        Fraction of all particles (on all ranks) that moved during mutation.
+        '''
+        totals = np.zeros(2)
+        self._comm.Allreduce(np.array([mutation_count, num_particles],
+                                      dtype=float), totals, op=mpi_ops.SUM)
+        return totals[0] / max(totals[1], 1)
+
+    def _compute_global_acceptance_rate(self):
+        '''
+        Fraction of the proposals made by the kernels on all ranks that were
+        accepted; None if there were none.
+        '''
+        totals = np.zeros(2)
+        self._comm.Allreduce(self._acceptance_counts, totals, op=mpi_ops.SUM)
+        if totals[1] == 0:
+            return None
+        return totals[0] / totals[1]
+
+    def _gather_static_load_report(self, busy_time, num_particles):
+        local_report = {'busy_time': busy_time, 'num_chunks': 1,
+                        'num_items': num_particles}
+        load_report = self._comm.gather(local_report, root=0)
+        if load_report is not None:
+            max_busy_time = max(report['busy_time'] for report in load_report)
+            for report in load_report:
+                report['idle_time'] = max_busy_time - report['busy_time']
+        return load_report
+
+    def _get_mutate_function(self):
+        if self.mutation_kernel == 'native' and \
+                is_supported(self._mcmc.params):
+            return self._mutate_with_native_kernel
+        return self._mutate_with_pymc
+
+    def _mutate_with_native_kernel(self, particle_array, covariance,
+                                   measurement_std_dev, temperature,
+                                   num_steps):
+        if len(particle_array) == 0:
+            return particle_array, np.zeros(0, dtype=bool)
+        kernel = self._get_native_kernel()
+        particle_array = kernel.mutate(particle_array, covariance,
+                                       temperature, num_steps,
+                                       measurement_std_dev)
+        self._acceptance_counts += [kernel.num_accepted, kernel.num_proposed]
+        return particle_array, kernel.moved
+
+    def _get_native_kernel(self):
+        if self._native_kernel is None:
+            self._native_kernel = SMCMetropolisKernel(self._mcmc.model,
+                                                      self._mcmc.data,
+                                                      self._mcmc.params,
+                                                      self._mcmc.std_dev_prior)
+        return self._native_kernel
+
+    def _mutate_with_pymc(self, particle_array, covariance,
+                          measurement_std_dev, temperature, num_steps):
+        particles = [particle_array.get_particle(i).copy()
+                     for i in range(len(particle_array))]
+        chain = self._get_pymc_chain(covariance, measurement_std_dev,
+                                     temperature)
+        new_particles = []
+        moved = np.zeros(len(particles), dtype=bool)
+        initial_counts = [chain.num_accepted, chain.num_proposed]
+        for i, particle in enumerate(particles):
+            params, log_like = chain.run(particle.params, num_steps,
+                                         particle.log_like)
 
             if particle.params != params:
-                mutation_count += 1
+                moved[i] = True
 
             particle.params = params
-            particle.log_like = mcmc.MCMC.logp
+            particle.log_like = log_like
             new_particles.append(particle)
+        self._acceptance_counts += [chain.num_accepted - initial_counts[0],
+                                    chain.num_proposed - initial_counts[1]]
 
-        new_particles = self._gather_and_concat_particles(new_particles)
-        self._mutation_ratio = float(mutation_count) / len(particles)
-        self.step = self._update_step_with_new_particles(new_particles)
-        return self.step
+        new_particle_array = self._to_particle_array(new_particles,
+                                                     particle_array)
+        return new_particle_array, moved
 
-    def _gather_and_concat_particles(self, new_particles):
-        new_particles = self._comm.gather(new_particles, root=0)
+    def _get_pymc_chain(self, covariance, measurement_std_dev,
+                        temperature):
+        '''
+        One PyMC model per rank and call of mutate_particles(); it is reused
+        for all particles (and chunks, with dynamic load balancing).
+        '''
+        if self._pymc_chain is None:
+            self._pymc_chain = PyMCChain(self._mcmc, covariance,
+                                         temperature, measurement_std_dev)
+        return self._pymc_chain
 
-        if self._rank == 0:
-            new_particles = list(np.concatenate(new_particles))
+    def _check_log_likes(self, particle_array, measurement_std_dev):
+        '''
+        Both kernels start each chain from the stored log likelihood of its
+        particle instead of re-evaluating the model, so the stored values must
+        be Gaussian log likelihoods. Values above the maximum of the
+        likelihood (e.g., the joint log density that older versions stored)
+        are rejected.
+        '''
+        if len(particle_array) == 0:
+            return None
+        if measurement_std_dev is None:
+            std_devs = particle_array.params[
+                :, particle_array.get_param_index('std_dev')]
+        else:
+            std_devs = measurement_std_dev
+        likelihood = self._mcmc.get_likelihood()
+        max_log_likes = likelihood.compute_max_log_likelihood(std_devs)
+        log_likes = particle_array.log_likes
+        invalid = (log_likes > max_log_likes) & \
+            ~np.isclose(log_likes, max_log_likes)
+        if np.any(invalid):
+            raise ValueError('stored log likelihoods exceed the maximum of '
+                             'the Gaussian likelihood; particles must store '
+                             'the log likelihood only.')
+        return None
 
-        return new_particles
+    @staticmethod
+    def _to_particle_array(particles, template):
+        if len(particles) == 0:
+            return template
+        particle_array = ParticleArray.from_particles(particles)
+        return particle_array.reorder_params(template.param_names)
 
-    def _update_step_with_new_particles(self, particles):
+    def _update_step_with_new_particles(self, particle_array):
         if self._rank == 0:
-            self.step.set_particles(particles)
+            self.step.set_particle_array(particle_array)
         else:
             self.step = None
         return self.step
 
-    def _partition_and_scatter_particles(self):
-        if self._rank == 0:
-            particles = self._partition_new_particles()
-        else:
-            particles = []
-        particles = self._comm.scatter(particles, root=0)
-        return particles
-
-    def _partition_new_particles(self):
-        partitions = np.array_split(self.step.get_particles(),
-                                    self._size)
-        return partitions
-
     def _compute_step_covariance(self):
+        if self._distributed:
+            return self._compute_distributed_covariance()
         if self._rank == 0:
-            covariance = self.step.get_covariance()
+            covariance = self.step.get_factorized_covariance()
         else:
             covariance = None
-        covariance = self._comm.scatter([covariance] * self._size, root=0)
+        covariance = self._comm.bcast(covariance, root=0)
         return covariance
+
+    def _compute_distributed_covariance(self):
+        '''
+        Merges the weighted moments of the local partitions; assumes log
+        weights are normalized across ranks (see ParticleUpdater).
+        '''
+        particle_array = self.step.get_particle_array()
+        param_names = self._distributor.get_param_names(
+            particle_array.param_names)
+        particle_array = particle_array.reorder_params(param_names)
+        local_moments = WeightedMoments(len(param_names))
+        local_moments.update(particle_array.params,
+                             np.exp(particle_array.log_weights))
+        moments = WeightedMoments(len(param_names))
+        for rank_moments in self._comm.allgather(local_moments):
+            moments.merge(rank_moments)
+        return factorize_step_covariance(moments.covariance)
+
+    @classmethod
+    def _check_load_balancing(cls, load_balancing, distributed):
+        if load_balancing not in cls.available_load_balancing:
+            raise ValueError('Unknown load balancing "%s"; options are %s.'
+                             % (load_balancing, cls.available_load_balancing))
+        if load_balancing == 'dynamic' and distributed:
+            raise ValueError('dynamic load balancing requires the particles '
+                             'on rank 0 and is not available in distributed '
+                             'mode.')
+        return None
+
+    @classmethod
+    def _check_mcmc_step_control(cls, mcmc_step_control, target_moved_fraction,
+                                 num_mcmc_steps, max_mcmc_steps):
+        if mcmc_step_control not in cls.available_mcmc_step_control:
+            raise ValueError('Unknown mcmc step control "%s"; options are %s.'
+                             % (mcmc_step_control,
+                                cls.available_mcmc_step_control))
+        if not 0. < target_moved_fraction <= 1.:
+            raise ValueError('target_moved_fraction must be in (0, 1].')
+        if max_mcmc_steps < num_mcmc_steps:
+            raise ValueError('max_mcmc_steps must be at least '
+                             'num_mcmc_steps.')
+        return None
+
+    @classmethod
+    def _check_mutation_kernel(cls, mutation_kernel):
+        if mutation_kernel not in cls.available_kernels:
+            raise ValueError('Unknown mutation kernel "%s"; options are %s.'
+                             % (mutation_kernel, cls.available_kernels))
+        return None
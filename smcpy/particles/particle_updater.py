@@ -29,12 +29,16 @@ PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
 ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
 AGREEMENT.
 '''
+
+import numpy as np
+from ..smc.distributed_resampler import DistributedResampler
+from ..utils import mpi_ops
 from ..utils.single_rank_comm import SingleRankComm
 
 
 def _mpi_decorator(func):
     def wrapper(self, *args, **kwargs):
-        if self._rank == 0:
+        if self._rank == 0 or self._distributed:
             return func(self, *args, **kwargs)
         else:
             return None
@@ -45,38 +49,173 @@ class ParticleUpdater():
     '''
     Class for updating particles at each step of Sequential Monte Carlo sampling
     with methods for updating log weights and resampling if ess under threshold.
+
+    By default all particles live on rank 0 and the methods only run there.
+    In distributed mode every rank holds its own partition of the particles
+    in <step>; log weights are normalized globally and the ess is computed
+    from local sums combined with Allreduce, so particles stay resident on
+    their ranks. Resampling uses DistributedResampler, which moves only the
+    surplus particles of each rank.
     '''
 
-    def __init__(self, step, ess_threshold, mpi_comm=SingleRankComm()):
+    def __init__(self, step, ess_threshold, mpi_comm=SingleRankComm(),
+                 distributed=False):
+        '''
+        :param step: particle step (distributed mode: the local partition)
+        :type step: SMCStep class instance
+        :param ess_threshold: resample when ess < ess_threshold
+        :type ess_threshold: float or int
+        :param mpi_comm: mpi communicator (or SingleRankComm)
+        :type mpi_comm: object
+        :param distributed: whether each rank holds a partition of the
+            particles (True) or all particles are on rank 0 (False)
+        :type distributed: bool
+        '''
         self.step = step
         self.ess_threshold = ess_threshold
         self._comm = mpi_comm
         self._size = self._comm.Get_size()
         self._rank = self._comm.Get_rank()
+        self._distributed = distributed
 
     @_mpi_decorator
     def update_log_weights(self, temperature_step):
         '''
         Incrementally updates log weights depending on the likelihood and
-        temperature step for each particle in a step.
+        temperature step for each particle in a step. In distributed mode,
+        the log weights are also normalized across all ranks.
 
         :param temperature_step: change in temperature schedule between steps
         :type temperature_step: float
         '''
-        for p in self.step.get_particles():
-            temp_weight = p.log_weight
-            p.log_weight = temp_weight + p.log_like * temperature_step
+        particle_array = self.step.get_particle_array()
+        log_weights = particle_array.log_weights
+        log_likes = particle_array.log_likes
+        new_log_weights = log_weights + log_likes * temperature_step
+        particle_array.set_log_weights(new_log_weights)
+        if self._distributed:
+            self.normalize_log_weights()
+        return self.step
+
+    @_mpi_decorator
+    def normalize_log_weights(self):
+        '''
+        Normalizes the log weights so that the weights of all particles (on
+        all ranks, in distributed mode) sum to one.
+        '''
+        particle_array = self.step.get_particle_array()
+        log_weights = particle_array.log_weights
+        max_log_weight = self._global_max(log_weights)
+        log_sum = max_log_weight + \
+            np.log(self._global_sum(np.exp(log_weights - max_log_weight)))
+        particle_array.set_log_weights(log_weights - log_sum)
         return self.step
 
     @_mpi_decorator
-    def resample_if_needed(self):
+    def compute_ess(self):
+        '''
+        Computes the effective sample size of all particles (on all ranks, in
+        distributed mode).
+        '''
+        if not self._distributed:
+            return self.step.compute_ess()
+        self.normalize_log_weights()
+        weights = np.exp(self.step.get_particle_array().log_weights)
+        return 1 / self._global_sum(weights**2)
+
+    @_mpi_decorator
+    def compute_temperature_step(self, target_ess_fraction,
+                                 max_temperature_step, num_bisections=50):
+        '''
+        Chooses the next temperature step by bisection so that the
+        conditional effective sample size (the ess of the incremental weights
+        relative to the current weights) equals target_ess_fraction times the
+        number of particles. Returns max_temperature_step if the target is
+        met with the largest permitted step.
+
+        :param target_ess_fraction: target conditional ess as a fraction of
+            the number of particles; 0 < target_ess_fraction < 1
+        :type target_ess_fraction: float
+        :param max_temperature_step: largest permitted temperature step (e.g.,
+            the distance from the current temperature to 1)
+        :type max_temperature_step: float
+        :param num_bisections: number of bisection iterations
+        :type num_bisections: int
+        '''
+        particle_array = self.step.get_particle_array()
+        log_weights = particle_array.log_weights
+        log_likes = particle_array.log_likes
+        num_particles = self._global_sum(np.ones(len(particle_array)))
+        target_ess = target_ess_fraction * num_particles
+
+        def compute_ess(temperature_step):
+            return _compute_conditional_ess(log_weights, log_likes,
+                                            temperature_step, self._global_max,
+                                            self._global_sum)
+
+        if compute_ess(max_temperature_step) >= target_ess:
+            return max_temperature_step
+
+        lower = 0.
+        upper = max_temperature_step
+        for _ in range(num_bisections):
+            middle = 0.5 * (lower + upper)
+            if compute_ess(middle) >= target_ess:
+                lower = middle
+            else:
+                upper = middle
+        return lower if lower > 0. else upper
+
+    @_mpi_decorator
+    def resample_if_needed(self, resampling_scheme='multinomial'):
         '''
         Checks if ess below threshold; if yes, resample with replacement.
+
+        :param resampling_scheme: scheme used to resample; see
+            smcpy.smc.resampler.Resampler.available_schemes
+        :type resampling_scheme: string
         '''
-        self._ess = self.step.compute_ess()
+        self._ess = self.compute_ess()
         if self._ess < self.ess_threshold:
             self._resample_status = "Resampling..."
-            self.step.resample()
+            if self._distributed:
+                self._resample_distributed(resampling_scheme)
+            else:
+                self.step.resample(resampling_scheme)
         else:
             self._resample_status = "No resampling"
         return self.step
+
+    def _resample_distributed(self, resampling_scheme):
+        resampler = DistributedResampler(resampling_scheme, self._comm)
+        particle_array = self.step.get_particle_array()
+        self.step.set_particle_array(resampler.resample(particle_array))
+        return None
+
+    def _global_max(self, values):
+        local_max = np.max(values) if len(values) > 0 else -np.inf
+        if not self._distributed:
+            return local_max
+        return self._allreduce(local_max, mpi_ops.MAX)
+
+    def _global_sum(self, values):
+        local_sum = np.sum(values)
+        if not self._distributed:
+            return local_sum
+        return self._allreduce(local_sum, mpi_ops.SUM)
+
+    def _allreduce(self, value, op):
+        result = np.empty(1)
+        self._comm.Allreduce(np.array([value], dtype=float), result, op=op)
+        return result[0]
+
+
+def _compute_conditional_ess(log_weights, log_likes, temperature_step,
+                             global_max=np.max, global_sum=np.sum):
+    weights = np.exp(log_weights - global_max(log_weights))
+    weights /= global_sum(weights)
+    log_increments = log_likes * temperature_step
+    increments = np.exp(log_increments - global_max(log_increments))
+    numerator = global_sum(weights * increments)**2
+    denominator = global_sum(weights * increments**2)
+    return global_sum(np.ones(len(log_weights))) * numerator / denominator
@@ -0,0 +1,273 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import abc
+import numpy as np
+from scipy.special import ndtr
+from scipy.stats import truncnorm
+
+available_distributions = ['Uniform', 'Normal', 'TruncatedNormal',
+                           'DiscreteUniform']
+
+
+class Prior(object):
+    '''
+    Base class of the native prior distributions. A prior is a plain,
+    picklable object that draws samples and evaluates its log density for
+    whole arrays of values at once; all constants of the density are
+    computed when the prior is created.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    is_discrete = False
+
+    def __init__(self, lower=-np.inf, upper=np.inf):
+        '''
+        :param lower: lower bound of the support
+        :type lower: float
+        :param upper: upper bound of the support
+        :type upper: float
+        '''
+        self._lower = lower
+        self._upper = upper
+
+    @abc.abstractmethod
+    def sample(self, num_samples):
+        '''
+        :param num_samples: number of samples to draw
+        :type num_samples: int
+
+        :Returns: 1D array of samples
+        '''
+
+    @abc.abstractmethod
+    def logpdf(self, values):
+        '''
+        :param values: values at which to evaluate the log density
+        :type values: array_like
+
+        :Returns: array of log densities (-inf outside the support)
+        '''
+
+    @property
+    def bounds(self):
+        '''
+        Lower and upper bound of the support (may be -inf/inf).
+        '''
+        return self._lower, self._upper
+
+    def _in_support(self, values):
+        return (values >= self._lower) & (values <= self._upper)
+
+
+class UniformPrior(Prior):
+
+    def __init__(self, lower, upper):
+        if not upper > lower:
+            raise ValueError('Uniform prior requires lower < upper.')
+        super(UniformPrior, self).__init__(lower, upper)
+        self._log_density = -np.log(upper - lower)
+
+    def sample(self, num_samples):
+        return np.random.uniform(self._lower, self._upper, num_samples)
+
+    def logpdf(self, values):
+        values = np.asarray(values)
+        return np.where(self._in_support(values), self._log_density, -np.inf)
+
+
+class DiscreteUniformPrior(Prior):
+
+    is_discrete = True
+
+    def __init__(self, lower, upper):
+        if not upper >= lower:
+            raise ValueError('DiscreteUniform prior requires lower <= upper.')
+        super(DiscreteUniformPrior, self).__init__(lower, upper)
+        self._log_density = -np.log(upper - lower + 1)
+
+    def sample(self, num_samples):
+        return np.random.randint(self._lower, self._upper + 1, num_samples)
+
+    def logpdf(self, values):
+        values = np.asarray(values)
+        in_support = self._in_support(values) & (values == np.floor(values))
+        return np.where(in_support, self._log_density, -np.inf)
+
+
+class NormalPrior(Prior):
+    '''
+    Normal prior; note that the second argument is the VARIANCE, as in the
+    prior definitions used by MCMCSampler.
+    '''
+
+    def __init__(self, mu, variance):
+        if not variance > 0:
+            raise ValueError('Normal prior requires a positive variance.')
+        super(NormalPrior, self).__init__()
+        self._mu = mu
+        self._std_dev = np.sqrt(variance)
+        self._log_norm = -0.5 * np.log(2 * np.pi * variance)
+
+    def sample(self, num_samples):
+        return np.random.normal(self._mu, self._std_dev, num_samples)
+
+    def logpdf(self, values):
+        z = (np.asarray(values) - self._mu) / self._std_dev
+        return self._log_norm - 0.5 * z ** 2
+
+
+class TruncatedNormalPrior(NormalPrior):
+    '''
+    Normal prior (mean, VARIANCE) truncated to [lower, upper].
+    '''
+
+    def __init__(self, mu, variance, lower, upper):
+        super(TruncatedNormalPrior, self).__init__(mu, variance)
+        if not upper > lower:
+            raise ValueError('TruncatedNormal prior requires lower < upper.')
+        self._lower = lower
+        self._upper = upper
+        self._cdf_lower = ndtr((lower - mu) / self._std_dev)
+        self._cdf_upper = ndtr((upper - mu) / self._std_dev)
+        self._log_norm -= np.log(self._cdf_upper - self._cdf_lower)
+
+    def sample(self, num_samples):
+        a = (self._lower - self._mu) / self._std_dev
+        b = (self._upper - self._mu) / self._std_dev
+        return truncnorm.rvs(a, b, loc=self._mu, scale=self._std_dev,
+                             size=num_samples)
+
+    def logpdf(self, values):
+        values = np.asarray(values)
+        log_density = super(TruncatedNormalPrior, self).logpdf(values)
+        return np.where(self._in_support(values), log_density, -np.inf)
+
+
+_prior_classes = {'uniform': UniformPrior,
+                  'normal': NormalPrior,
+                  'truncatednormal': TruncatedNormalPrior,
+                  'discreteuniform': DiscreteUniformPrior}
+
+
+def create_prior(prior):
+    '''
+    Creates a native prior from a prior definition.
+
+    :param prior: list defining the prior distribution [dist name, dist. arg
+        #1, dist. arg #2, etc.], as used by MCMCSampler (e.g., ['Uniform',
+        0., 1.]); supported distributions are listed in
+        available_distributions. Prior instances are returned unchanged.
+    :type prior: list or Prior
+
+    :Returns: Prior class instance
+    '''
+    if isinstance(prior, Prior):
+        return prior
+    dist = str(prior[0]).lower()
+    if dist not in _prior_classes:
+        raise KeyError('The distribution "%s" is not supported.' % prior[0])
+    return _prior_classes[dist](*prior[1:])
+
+
+class JointPrior(object):
+    '''
+    Joint prior of independent parameters, with one column per parameter in
+    the order given by param_names.
+    '''
+
+    def __init__(self, param_priors, param_names):
+        '''
+        :param param_priors: map where keys are parameter names and values are
+            prior definitions (see create_prior())
+        :type param_priors: dict
+        :param param_names: parameter names, in column order; every name must
+            be a key of param_priors.
+        :type param_names: list
+        '''
+        self.param_names = list(param_names)
+        self.priors = [create_prior(param_priors[key]) for key in param_names]
+
+    @property
+    def bounds(self):
+        '''
+        Arrays of the lower and upper bounds of the parameters.
+        '''
+        bounds = np.array([prior.bounds for prior in self.priors], dtype=float)
+        return bounds[:, 0], bounds[:, 1]
+
+    @property
+    def is_discrete(self):
+        '''
+        Boolean array that is True for discrete parameters.
+        '''
+        return np.array([prior.is_discrete for prior in self.priors],
+                        dtype=bool)
+
+    def sample(self, num_samples):
+        '''
+        :param num_samples: number of samples to draw
+        :type num_samples: int
+
+        :Returns: 2D array of samples; shape = (num_samples, num_params)
+        '''
+        samples = np.empty((num_samples, len(self.priors)))
+        for i, prior in enumerate(self.priors):
+            samples[:, i] = prior.sample(num_samples)
+        return samples
+
+    def logpdf(self, params):
+        '''
+        :param params: parameter values; shape = (num_samples, num_params)
+        :type params: 2D array
+
+        :Returns: 1D array of joint log densities (-inf outside the support)
+        '''
+        params = np.atleast_2d(params)
+        log_density = np.zeros(params.shape[0])
+        for i, prior in enumerate(self.priors):
+            log_density += prior.logpdf(params[:, i])
+        return log_density
+
+
+def is_supported(param_priors):
+    '''
+    Returns True if every prior in param_priors can be sampled and evaluated
+    by this module (see available_distributions).
+
+    :param param_priors: map where keys are parameter names and values are
+        lists defining the prior distribution, as used by MCMCSampler
+    :type param_priors: dict
+    '''
+    return all(isinstance(prior, Prior) or
+               str(prior[0]).lower() in _prior_classes
+               for prior in param_priors.values())
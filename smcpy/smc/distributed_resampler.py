@@ -0,0 +1,236 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import numpy as np
+from .resampler import Resampler
+from ..particles.particle_array import ParticleArray
+from ..utils import mpi_ops
+
+
+class DistributedResampler(Resampler):
+    '''
+    Resamples particles that are partitioned across mpi processes without
+    gathering them to one process.
+
+    The local weight totals of all ranks (O(P) data) are shared, which
+    gives every rank its interval of the global weight CDF. Each rank then
+    draws only the resampling points inside its interval, so the work per
+    rank is O(N/P):
+        o stratified/systematic - the strata overlapping the interval; the
+              uniform of each stratum comes from a stream seeded by the
+              broadcast seed and the stratum block, so ranks sharing a
+              boundary stratum agree on its point
+        o multinomial (and the residual remainder) - the number of points
+              of each rank is one multinomial draw over the rank totals
+              (identical on every rank), and the local offspring counts are
+              a multinomial draw over the local weights
+
+    Offspring then stay on the rank of their parent, except for each rank's
+    surplus over its share of the population (same partitioning as
+    np.array_split), which is sent point-to-point to ranks with a deficit.
+    Only surplus particles migrate.
+    '''
+
+    _transfer_tag = 17
+    _stratum_block_size = 4096
+
+    def __init__(self, scheme, mpi_comm):
+        '''
+        :param scheme: resampling scheme; see self.available_schemes
+        :type scheme: string
+        :param mpi_comm: mpi communicator (or SingleRankComm)
+        :type mpi_comm: object
+        '''
+        super(DistributedResampler, self).__init__(scheme)
+        self._comm = mpi_comm
+        self._size = mpi_comm.Get_size()
+        self._rank = mpi_comm.Get_rank()
+
+    def resample(self, particle_array):
+        '''
+        Resamples the local particles of every rank (all ranks must call this
+        method together). Log weights must be normalized across ranks.
+
+        :param particle_array: local particles
+        :type particle_array: ParticleArray class instance
+
+        :returns: ParticleArray of local particles after resampling, with
+            uniform log weights; ranks hold np.array_split shares of the
+            population.
+        '''
+        counts = self.compute_offspring_counts(
+            np.exp(particle_array.log_weights))
+        offspring = particle_array.take(np.repeat(np.arange(len(counts)),
+                                                  counts))
+        num_offspring = self._comm.allgather(len(offspring))
+        offspring = self._rebalance(offspring, num_offspring)
+        num_particles = np.sum(num_offspring)
+        offspring.set_log_weights(np.tile(np.log(1. / num_particles),
+                                          len(offspring)))
+        return offspring
+
+    def compute_offspring_counts(self, weights):
+        '''
+        Returns the number of offspring of each local particle.
+
+        :param weights: local particle weights, normalized across all ranks
+        :type weights: 1D array
+        '''
+        weights = np.asarray(weights, dtype=float)
+        num_particles = int(self._allreduce(weights.shape[0]))
+        seed = self._broadcast_seed()
+        if self.scheme == 'residual':
+            return self._residual_counts(weights, num_particles, seed)
+        if self.scheme == 'multinomial':
+            return self._multinomial_counts(weights, num_particles, seed)
+        return self._stratified_counts(weights, num_particles, seed)
+
+    def _residual_counts(self, weights, num_particles, seed):
+        scaled_weights = num_particles * weights
+        counts = np.floor(scaled_weights).astype(int)
+        num_remaining = num_particles - int(self._allreduce(np.sum(counts)))
+        residuals = scaled_weights - counts
+        return counts + self._multinomial_counts(residuals, num_remaining,
+                                                 seed)
+
+    def _multinomial_counts(self, weights, num_points, seed):
+        '''
+        Multinomial counts of num_points draws from the (unnormalized)
+        weights of all ranks.
+        '''
+        rank_totals = np.array(self._comm.allgather(np.sum(weights)))
+        counts = np.zeros(weights.shape[0], dtype=int)
+        if num_points == 0 or rank_totals[self._rank] <= 0.:
+            return counts
+        rank_counts = np.random.RandomState(seed).multinomial(
+            num_points, rank_totals / np.sum(rank_totals))
+        local_random_state = np.random.RandomState([seed, self._rank])
+        return local_random_state.multinomial(
+            rank_counts[self._rank], weights / rank_totals[self._rank])
+
+    def _stratified_counts(self, weights, num_points, seed):
+        '''
+        Counts of the stratified or systematic points (i + u_i) / num_points
+        that fall into the CDF interval of each local particle; only the
+        strata overlapping the local interval are drawn.
+        '''
+        rank_totals = np.array(self._comm.allgather(np.sum(weights)))
+        if num_points == 0:
+            return np.zeros(weights.shape[0], dtype=int)
+        offsets = np.concatenate(([0.], np.cumsum(rank_totals)))
+        bounds = offsets.copy()
+        bounds[0] = -np.inf
+        nonempty = np.flatnonzero(rank_totals > 0.)
+        if nonempty.shape[0] > 0:
+            bounds[nonempty[-1] + 1:] = np.inf
+        lower, upper = bounds[self._rank], bounds[self._rank + 1]
+        first = int(np.clip(np.floor(lower * num_points), 0, num_points))
+        last = int(np.clip(np.ceil(upper * num_points), first, num_points))
+        strata = np.arange(first, last)
+        points = (strata + self._draw_uniforms(strata, seed)) / num_points
+
+        edges = np.minimum(offsets[self._rank] + np.cumsum(weights), upper)
+        edges = np.concatenate(([lower], edges[:-1], [upper]))
+        counts = np.diff(np.searchsorted(points, edges, side='left'))
+        return counts[:weights.shape[0]]
+
+    def _draw_uniforms(self, strata, seed):
+        if self.scheme == 'systematic':
+            return np.random.RandomState(seed).uniform(0, 1)
+        if strata.shape[0] == 0:
+            return np.empty(0)
+        block_size = self._stratum_block_size
+        blocks = range(strata[0] // block_size, strata[-1] // block_size + 1)
+        uniforms = np.concatenate(
+            [np.random.RandomState([seed, block]).uniform(0, 1, block_size)
+             for block in blocks])
+        return uniforms[strata - blocks[0] * block_size]
+
+    def _rebalance(self, offspring, num_offspring):
+        targets = np.tile(np.sum(num_offspring) // self._size, self._size)
+        targets[:np.sum(num_offspring) % self._size] += 1
+        transfers = self._plan_transfers(num_offspring, targets)
+
+        num_params = len(offspring.param_names)
+        num_keep = min(num_offspring[self._rank], targets[self._rank])
+        params = [offspring.params[:num_keep]]
+        log_likes = [offspring.log_likes[:num_keep]]
+        start = num_keep
+        for source, dest, num_moved in transfers:
+            if source == self._rank:
+                rows = slice(start, start + num_moved)
+                buffer = np.column_stack((offspring.params[rows],
+                                          offspring.log_likes[rows]))
+                self._comm.Send(np.ascontiguousarray(buffer), dest=dest,
+                                tag=self._transfer_tag)
+                start += num_moved
+            elif dest == self._rank:
+                buffer = np.empty((num_moved, num_params + 1))
+                self._comm.Recv(buffer, source=source, tag=self._transfer_tag)
+                params.append(buffer[:, :num_params])
+                log_likes.append(buffer[:, num_params])
+        params = np.concatenate(params).reshape(-1, num_params)
+        log_likes = np.concatenate(log_likes)
+        return ParticleArray(offspring.param_names, params,
+                             np.zeros(log_likes.shape[0]), log_likes)
+
+    @staticmethod
+    def _plan_transfers(num_offspring, targets):
+        '''
+        Matches ranks with a surplus to ranks with a deficit in rank order;
+        returns a list of (source, dest, num_particles) transfers.
+        '''
+        surplus = [[rank, count - target] for rank, (count, target)
+                   in enumerate(zip(num_offspring, targets)) if count > target]
+        deficit = [[rank, target - count] for rank, (count, target)
+                   in enumerate(zip(num_offspring, targets)) if count < target]
+        transfers = []
+        while surplus and deficit:
+            num_moved = min(surplus[0][1], deficit[0][1])
+            transfers.append((surplus[0][0], deficit[0][0], num_moved))
+            surplus[0][1] -= num_moved
+            deficit[0][1] -= num_moved
+            if surplus[0][1] == 0:
+                surplus.pop(0)
+            if deficit[0][1] == 0:
+                deficit.pop(0)
+        return transfers
+
+    def _broadcast_seed(self):
+        seed = np.random.randint(2**31 - 1) if self._rank == 0 else None
+        return self._comm.bcast(seed, root=0)
+
+    def _allreduce(self, value):
+        result = np.empty(1)
+        self._comm.Allreduce(np.array([value], dtype=float), result,
+                             op=mpi_ops.SUM)
+        return result[0]
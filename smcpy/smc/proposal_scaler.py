@@ -0,0 +1,106 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import numpy as np
+from scipy.stats import norm
+
+
+class ProposalScaler(object):
+    '''
+    Tunes a global scale of the mutation kernel proposal between SMC steps
+    so that the Metropolis acceptance rate approaches a target. The scale
+    multiplies the proposal standard deviations, i.e. the proposal
+    covariance is scale**2 times the weighted step covariance.
+
+    The acceptance rate of a step is the fraction of accepted proposals
+    counted by the kernel (ParticleMutator.acceptance_rate). If it is not
+    available, it is estimated from the fraction of particles that moved
+    during the num_mcmc_steps Metropolis steps
+    (ParticleMutator._mutation_ratio), as 1 - (1 - ratio)**(1 / num_steps).
+    The scale is then updated using the acceptance rate of a random walk
+    Metropolis proposal in the Gaussian limit, acceptance = 2 * Phi(-c *
+    scale) (Roberts, Gelman and Gilks, 1997), which gives the new scale
+    scale * Phi^-1(target / 2) / Phi^-1(acceptance / 2).
+    '''
+
+    _acceptance_bounds = (0.01, 0.99)
+    _max_factor = 10.
+
+    def __init__(self, target_acceptance=0.234, initial_scale=1.):
+        '''
+        :param target_acceptance: target Metropolis acceptance rate
+        :type target_acceptance: float
+        :param initial_scale: scale used for the first mutation
+        :type initial_scale: float
+        '''
+        if not 0. < target_acceptance < 1.:
+            raise ValueError('target_acceptance must be in (0, 1).')
+        if not initial_scale > 0:
+            raise ValueError('initial_scale must be positive.')
+        self.target_acceptance = target_acceptance
+        self.scale = float(initial_scale)
+
+    @staticmethod
+    def estimate_acceptance(mutation_ratio, num_mcmc_steps):
+        '''
+        :param mutation_ratio: fraction of particles that moved at least once
+        :type mutation_ratio: float
+        :param num_mcmc_steps: number of Metropolis steps per particle
+        :type num_mcmc_steps: int
+        '''
+        return 1. - (1. - mutation_ratio) ** (1. / num_mcmc_steps)
+
+    def update(self, mutation_ratio, num_mcmc_steps, acceptance_rate=None):
+        '''
+        Updates the scale given the outcome of a mutation performed with the
+        current scale.
+
+        :param mutation_ratio: fraction of particles that moved at least once
+        :type mutation_ratio: float
+        :param num_mcmc_steps: number of Metropolis steps per particle
+        :type num_mcmc_steps: int
+        :param acceptance_rate: fraction of accepted proposals, if counted
+            by the kernel; default is None, which estimates it from
+            mutation_ratio.
+        :type acceptance_rate: float or None
+
+        :Returns: the new scale
+        '''
+        acceptance = acceptance_rate
+        if acceptance is None:
+            acceptance = self.estimate_acceptance(mutation_ratio,
+                                                  num_mcmc_steps)
+        acceptance = np.clip(acceptance, *self._acceptance_bounds)
+        factor = norm.ppf(self.target_acceptance / 2.) / \
+            norm.ppf(acceptance / 2.)
+        self.scale *= np.clip(factor, 1. / self._max_factor, self._max_factor)
+        return self.scale
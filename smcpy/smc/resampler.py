@@ -0,0 +1,116 @@
+'''
+Notices:
+Copyright 2018 United States Government as represented by the Administrator of
+the National Aeronautics and Space Administration. No copyright is claimed in
+the United States under Title 17, U.S. Code. All Other Rights Reserved.
+
+Disclaimers
+No Warranty: THE SUBJECT SOFTWARE IS PROVIDED "AS IS" WITHOUT ANY WARRANTY OF
+ANY KIND, EITHER EXPRESSED, IMPLIED, OR STATUTORY, INCLUDING, BUT NOT LIMITED
+TO, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL CONFORM TO SPECIFICATIONS, ANY
+IMPLIED WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, OR
+FREEDOM FROM INFRINGEMENT, ANY WARRANTY THAT THE SUBJECT SOFTWARE WILL BE ERROR
+FREE, OR ANY WARRANTY THAT DOCUMENTATION, IF PROVIDED, WILL CONFORM TO THE
+SUBJECT SOFTWARE. THIS AGREEMENT DOES NOT, IN ANY MANNER, CONSTITUTE AN
+ENDORSEMENT BY GOVERNMENT AGENCY OR ANY PRIOR RECIPIENT OF ANY RESULTS,
+RESULTING DESIGNS, HARDWARE, SOFTWARE PRODUCTS OR ANY OTHER APPLICATIONS
+RESULTING FROM USE OF THE SUBJECT SOFTWARE.  FURTHER, GOVERNMENT AGENCY
+DISCLAIMS ALL WARRANTIES AND LIABILITIES REGARDING THIRD-PARTY SOFTWARE, IF
+PRESENT IN THE ORIGINAL SOFTWARE, AND DISTRIBUTES IT "AS IS."
+
+Waiver and Indemnity:  RECIPIENT AGREES TO WAIVE ANY AND ALL CLAIMS AGAINST THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT.  IF RECIPIENT'S USE OF THE SUBJECT SOFTWARE RESULTS IN ANY
+LIABILITIES, DEMANDS, DAMAGES, EXPENSES OR LOSSES ARISING FROM SUCH USE,
+INCLUDING ANY DAMAGES FROM PRODUCTS BASED ON, OR RESULTING FROM, RECIPIENT'S
+USE OF THE SUBJECT SOFTWARE, RECIPIENT SHALL INDEMNIFY AND HOLD HARMLESS THE
+UNITED STATES GOVERNMENT, ITS CONTRACTORS AND SUBCONTRACTORS, AS WELL AS ANY
+PRIOR RECIPIENT, TO THE EXTENT PERMITTED BY LAW.  RECIPIENT'S SOLE REMEDY FOR
+ANY SUCH MATTER SHALL BE THE IMMEDIATE, UNILATERAL TERMINATION OF THIS
+AGREEMENT.
+'''
+
+import numpy as np
+
+
+class Resampler(object):
+    '''
+    Draws resampling indices from a discrete distribution defined by a set of
+    normalized particle weights. All schemes operate on index arrays and run
+    in O(N log N) (multinomial, stratified, systematic) or O(N) (residual,
+    excluding its multinomial remainder) time.
+
+    Available schemes:
+        o multinomial - N independent draws
+        o stratified - one draw within each of N equal strata
+        o systematic - a single draw shifted across N equal strata
+        o residual - deterministic floor(N * w) copies, remainder multinomial
+    '''
+
+    available_schemes = ['multinomial', 'stratified', 'systematic',
+                         'residual']
+
+    def __init__(self, scheme='multinomial'):
+        '''
+        :param scheme: resampling scheme; see self.available_schemes
+        :type scheme: string
+        '''
+        self._check_scheme(scheme)
+        self.scheme = scheme.lower()
+
+    def resample_indices(self, weights, num_samples=None):
+        '''
+        Returns the indices of the particles selected by resampling.
+
+        :param weights: normalized particle weights (sum to 1)
+        :type weights: 1D array
+        :param num_samples: number of indices to draw; default is len(weights)
+        :type num_samples: int
+        '''
+        weights = np.asarray(weights, dtype=float)
+        if num_samples is None:
+            num_samples = weights.shape[0]
+        resample = getattr(self, '_' + self.scheme)
+        return resample(weights, num_samples)
+
+    def _multinomial(self, weights, num_samples):
+        uniforms = np.random.uniform(0, 1, num_samples)
+        return self._invert_cdf(weights, uniforms)
+
+    def _stratified(self, weights, num_samples):
+        uniforms = np.random.uniform(0, 1, num_samples)
+        uniforms = (np.arange(num_samples) + uniforms) / num_samples
+        return self._invert_cdf(weights, uniforms)
+
+    def _systematic(self, weights, num_samples):
+        uniforms = (np.arange(num_samples) + np.random.uniform(0, 1)) / \
+            num_samples
+        return self._invert_cdf(weights, uniforms)
+
+    def _residual(self, weights, num_samples):
+        scaled_weights = num_samples * weights
+        counts = np.floor(scaled_weights).astype(int)
+        indices = np.repeat(np.arange(weights.shape[0]), counts)
+        num_remaining = num_samples - indices.shape[0]
+        if num_remaining > 0:
+            residuals = scaled_weights - counts
+            residuals = residuals / np.sum(residuals)
+            extra = self._multinomial(residuals, num_remaining)
+            indices = np.concatenate((indices, extra))
+        return indices
+
+    @staticmethod
+    def _invert_cdf(weights, uniforms):
+        cdf = np.cumsum(weights)
+        cdf[-1] = 1.
+        indices = np.searchsorted(cdf, uniforms, side='right')
+        return np.minimum(indices, weights.shape[0] - 1)
+
+    @classmethod
+    def _check_scheme(cls, scheme):
+        if not isinstance(scheme, basestring):
+            raise TypeError('Resampling scheme must be a string.')
+        if scheme.lower() not in cls.available_schemes:
+            raise ValueError('Unknown resampling scheme "%s"; options are %s.'
+                             % (scheme, cls.available_schemes))
+        return None
@@ -1,12 +1,20 @@
 from .smc_step import SMCStep
+from ..model.base_model import evaluate_model_batch
+from ..model.threaded_model import ThreadedModel
+from ..particles.particle_array import ParticleArray
 
 class SMCPropagator():
 
-    def __init__(self, model, output_names=None):
+    def __init__(self, model, output_names=None, num_threads=None):
         '''
         :param model: predictive model to propagate particles through
         :type model: BaseModel object
+        :param num_threads: if given, particles are evaluated on this many
+            threads (see ThreadedModel); default is None (no threads).
+        :type num_threads: int or None
         '''
+        if num_threads is not None:
+            model = ThreadedModel(model, num_threads)
         self._model = model
         self._output_names = output_names
 
@@ -14,29 +22,30 @@ class SMCPropagator():
         '''
         Propagates particles in smc_step through self.model to obtain a new
         SMCStep object that stores the model outputs as params. This enables
-        calculation of means, etc.
+        calculation of means, etc. All particles are evaluated in one call to
+        the model's evaluate_batch() method, if available; smc_step is not
+        modified.
 
         :param smc_step: the smc step object to propagate (should contain
             particles with params == model parameters)
         :type smc_step: SMCStep object
         '''
-        particle_list = smc_step.get_particles()
-        for particle in particle_list:
-            outputs = self._model.evaluate(particle.params)
-            particle.params = self._create_output_dictionary(outputs)
-
+        particle_array = smc_step.get_particle_array()
+        outputs = evaluate_model_batch(self._model, particle_array.params,
+                                       particle_array.param_names)
+        output_names = self._get_output_names(outputs.shape[1])
+        output_array = ParticleArray(output_names, outputs,
+                                     particle_array.log_weights,
+                                     particle_array.log_likes)
         new_step = SMCStep()
-        new_step.set_particles(particle_list)
+        new_step.set_particle_array(output_array)
         return new_step
 
-    def _create_output_dictionary(self, outputs):
-        output_length = len(outputs)
+    def _get_output_names(self, output_length):
         if self._output_names is None:
-            output_names = ['output_{}'.format(i) for i in range(output_length)]
-        else:
-            self._check_len_of_output_names(output_length)
-            output_names = self._output_names
-        return {output_names[i]: out for i, out in enumerate(outputs)}
+            return ['output_{}'.format(i) for i in range(output_length)]
+        self._check_len_of_output_names(output_length)
+        return list(self._output_names[:output_length])
 
     def _check_len_of_output_names(self, output_length):
         if len(self._output_names) < output_length:
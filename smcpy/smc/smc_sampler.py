@@ -31,17 +31,41 @@ AGREEMENT.
 '''
 
 from ..mcmc.mcmc_sampler import MCMCSampler
+from ..smc.proposal_scaler import ProposalScaler
 from ..smc.smc_step import SMCStep
 from ..hdf5.hdf5_storage import HDF5Storage
+from ..model.threaded_model import ThreadedModel
 from ..utils.properties import Properties
 from ..utils.progress_bar import set_bar
+from ..utils.process_comm import ProcessPool
 from ..utils.single_rank_comm import SingleRankComm
+from ..particles.particle_distributor import ParticleDistributor
 from ..particles.particle_initializer import ParticleInitializer
 from ..particles.particle_updater import ParticleUpdater
 from ..particles.particle_mutator import ParticleMutator
 from tqdm import tqdm
 import numpy as np
 import imp
+import os
+
+
+def _process_pool_decorator(func):
+    def wrapper(self, *args, **kwargs):
+        if not isinstance(self._comm, ProcessPool):
+            return func(self, *args, **kwargs)
+        pool = self._comm
+
+        def run(comm):
+            self._comm = comm
+            self._size = comm.Get_size()
+            self._rank = comm.Get_rank()
+            return func(self, *args, **kwargs)
+
+        try:
+            return pool.run(run)
+        finally:
+            self._comm, self._size, self._rank = pool, pool.Get_size(), 0
+    return wrapper
 
 
 class SMCSampler(Properties):
@@ -49,18 +73,54 @@ class SMCSampler(Properties):
     Class for performing parallel Sequential Monte Carlo sampling.
     '''
 
-    def __init__(self, data, model, param_priors):
-        self._comm, self._size, self._rank = self.setup_communicator()
+    def __init__(self, data, model, param_priors, num_processes=None,
+                 num_threads=None, mpi_comm=None):
+        '''
+        :param data: data to compare model outputs to
+        :type data: array_like
+        :param model: predictive model
+        :type model: BaseModel object
+        :param param_priors: prior distribution of each parameter
+        :type param_priors: dict
+        :param num_processes: if given, sample() runs on this many local
+            processes (see ProcessPool) instead of using mpi4py; default is
+            None, which uses mpi4py if it is installed.
+        :type num_processes: int or None
+        :param num_threads: if given, each process evaluates batches of
+            particles on this many threads (see ThreadedModel), which is
+            useful for models that release the GIL; can be combined with
+            mpi4py or num_processes. Default is None (no threads).
+        :type num_threads: int or None
+        :param mpi_comm: communicator with the mpi4py interface to sample on
+            (e.g., a sub-communicator); default is None, which uses
+            setup_communicator(num_processes).
+        :type mpi_comm: object or None
+        '''
+        if mpi_comm is None:
+            self._comm, self._size, self._rank = \
+                self.setup_communicator(num_processes)
+        else:
+            self._comm = mpi_comm
+            self._size = mpi_comm.Get_size()
+            self._rank = mpi_comm.Get_rank()
+        if num_threads is not None:
+            model = ThreadedModel(model, num_threads)
         self._mcmc = self.setup_mcmc_sampler(data, model, param_priors)
         self._step_list = []
+        self._load_reports = []
         super(SMCSampler, self).__init__()
 
     @staticmethod
-    def setup_communicator():
+    def setup_communicator(num_processes=None):
         """
         Detects whether multiple processors are available and sets
-        self.number_CPUs and self.cpu_rank accordingly.
+        self.number_CPUs and self.cpu_rank accordingly. If num_processes is
+        given, a ProcessPool of that size is used instead of mpi4py.
         """
+        if num_processes is not None:
+            comm = ProcessPool(num_processes)
+            return comm, comm.Get_size(), comm.Get_rank()
+
         try:
             imp.find_module('mpi4py')
 
@@ -85,19 +145,28 @@ class SMCSampler(Properties):
                            storage_backend='ram')
         return mcmc
 
+    @_process_pool_decorator
     def sample(self, num_particles, num_time_steps, num_mcmc_steps,
                measurement_std_dev=None, ess_threshold=None,
                proposal_center=None, proposal_scales=None, restart_time_step=1,
-               hdf5_to_load=None, autosave_file=None):
+               hdf5_to_load=None, autosave_file=None,
+               resampling_scheme='multinomial', mutation_kernel='native',
+               target_ess_fraction=None, distributed=False,
+               load_balancing='static', kernel_scaling='fixed',
+               target_acceptance=0.234, mcmc_step_control='fixed',
+               target_moved_fraction=0.9, max_mcmc_steps=None):
         '''
         Driver method that performs Sequential Monte Carlo sampling.
 
         :param num_particles: number of particles to use during sampling
         :type num_particles: int
         :param num_time_steps: number of time steps in temperature schedule that
-            is used to transition between prior and posterior distributions.
+            is used to transition between prior and posterior distributions;
+            with adaptive tempering (see target_ess_fraction), the maximum
+            number of time steps.
         :type num_time_steps: int
-        :param num_mcmc_steps: number of mcmc steps to take during mutation
+        :param num_mcmc_steps: number of mcmc steps to take during mutation;
+            with adaptive mcmc step control, the minimum number of steps
         :param num_mcmc_steps: int
         :param measurement_std_dev: standard deviation of the measurement error;
             if unknown, set to None and it will be estimated along with other
@@ -126,60 +195,258 @@ class SMCSampler(Properties):
         :type restart_time_step: int
         :param hdf5_to_load: file path of a step list
         :type hdf5_to_load: string
-        :param autosave_file: file name of autosave file
+        :param autosave_file: file name of autosave file; steps are appended
+            on a background thread (see HDF5StreamWriter) and the file is
+            complete once sample() returns. When restarting from the
+            autosave file itself (hdf5_to_load), the steps it already holds
+            up to restart_time_step are kept rather than rewritten.
         :type autosave_file: string
+        :param resampling_scheme: scheme used when resampling is triggered;
+            options are 'multinomial' (default), 'stratified', 'systematic'
+            and 'residual'.
+        :type resampling_scheme: string
+        :param mutation_kernel: MCMC kernel used to mutate particles; 'native'
+            (default) advances all particles with vectorized array operations,
+            'pymc' builds a PyMC model and chain for each particle.
+        :type mutation_kernel: string
+        :param target_ess_fraction: if given, the temperature schedule is
+            chosen adaptively: each temperature step is found by bisection so
+            that the ess of the incremental weights equals
+            target_ess_fraction * num_particles. If the maximum number of time
+            steps is reached, the last step goes directly to the posterior.
+            The default (None) uses num_time_steps equally spaced
+            temperatures. The temperature of every step is recorded in the
+            step list (SMCStep.get_temperature()) and the autosave file.
+        :type target_ess_fraction: float or None
+        :param distributed: if True, each mpi process keeps its own partition
+            of the particles between steps; weight normalization and the ess
+            are computed with collective reductions rather than on rank 0,
+            and resampling moves only surplus particles between ranks.
+            Particles are gathered to rank 0 only to record the step list
+            and autosave file. Default is False.
+        :type distributed: bool
+        :param load_balancing: how particles are assigned to mpi processes
+            during mutation; 'static' (default) gives each process an equal
+            share, 'dynamic' hands out chunks of particles on demand from
+            rank 0 so that processes drawing cheap model evaluations mutate
+            more particles. 'dynamic' is not available in distributed mode.
+            Per-process busy and idle times of each mutation are available
+            from get_load_reports().
+        :type load_balancing: string
+        :param kernel_scaling: 'fixed' (default) uses the weighted covariance
+            of the particles as the mutation proposal covariance; 'adaptive'
+            multiplies it by a global scale**2 that is tuned after every
+            mutation so that the Metropolis acceptance rate of the model
+            parameter proposals, as counted by the kernel, approaches
+            target_acceptance (see ProposalScaler). The scale used for each
+            mutation is available from get_kernel_scales().
+        :type kernel_scaling: string
+        :param target_acceptance: target Metropolis acceptance rate of
+            adaptive kernel scaling
+        :type target_acceptance: float
+        :param mcmc_step_control: 'fixed' (default) takes num_mcmc_steps
+            mcmc steps in every mutation; 'adaptive' keeps taking steps
+            until the fraction of particles that moved at least once during
+            the mutation reaches target_moved_fraction, so that easy steps
+            stop early and hard steps mix longer. The number of steps of
+            each mutation is available from get_mcmc_step_counts().
+        :type mcmc_step_control: string
+        :param target_moved_fraction: fraction of particles that must move
+            before adaptive mcmc step control stops
+        :type target_moved_fraction: float
+        :param max_mcmc_steps: maximum number of mcmc steps (model
+            evaluations per particle) of adaptive mcmc step control; default
+            is None, which uses 10 * num_mcmc_steps.
+        :type max_mcmc_steps: int or None
 
         :Returns: A list of SMCStep class instances that contains all particles
             and their past generations at every time step.
         '''
 
-        self.autosaver = autosave_file
         self.num_time_steps = num_time_steps
         self.restart_time_step = restart_time_step
-        self.temp_schedule = np.linspace(0., 1., num_time_steps)
+        self.resampling_scheme = resampling_scheme
+        self.mutation_kernel = mutation_kernel
+        self.target_ess_fraction = target_ess_fraction
+        self.distributed = distributed
+        self.load_balancing = load_balancing
+        if self.distributed and self.load_balancing == 'dynamic':
+            raise ValueError('dynamic load balancing is not available in '
+                             'distributed mode.')
+        self.kernel_scaling = kernel_scaling
+        self._proposal_scaler = None
+        if self.kernel_scaling == 'adaptive':
+            self._proposal_scaler = ProposalScaler(target_acceptance)
+        self.mcmc_step_control = mcmc_step_control
+        if max_mcmc_steps is None:
+            max_mcmc_steps = 10 * num_mcmc_steps
+        self._mcmc_step_options = dict(
+            mcmc_step_control=mcmc_step_control,
+            target_moved_fraction=target_moved_fraction,
+            max_mcmc_steps=max_mcmc_steps)
+        ParticleMutator._check_mcmc_step_control(
+            num_mcmc_steps=num_mcmc_steps, **self._mcmc_step_options)
+        self._load_reports = []
+        self._kernel_scales = []
+        self._mcmc_step_counts = []
+        adaptive = self.target_ess_fraction is not None
+        if adaptive:
+            self.temp_schedule = [0., 0.]
+        else:
+            self.temp_schedule = np.linspace(0., 1., num_time_steps)
+        self._distributor = ParticleDistributor(None, self._comm)
+        self._autosave_mode = self._get_autosave_mode(autosave_file,
+                                                      hdf5_to_load)
+        self.autosaver = autosave_file
+        try:
+            start_time_step = self._initialize_sampling(
+                num_particles, measurement_std_dev, ess_threshold,
+                proposal_center, proposal_scales, hdf5_to_load, adaptive)
+            updater = self._create_updater(ess_threshold)
+
+            if adaptive:
+                self._sample_adaptive(updater, start_time_step, num_particles,
+                                      num_mcmc_steps, measurement_std_dev)
+            else:
+                self._sample_fixed(updater, start_time_step, num_particles,
+                                   num_mcmc_steps, measurement_std_dev)
+        except BaseException:
+            self._close_autosaver(raise_errors=False)
+            raise
+        self._close_autosaver()
+        return self._step_list
+
+    def _initialize_sampling(self, num_particles, measurement_std_dev,
+                             ess_threshold, proposal_center, proposal_scales,
+                             hdf5_to_load, adaptive):
+        '''
+        Creates the first step (or loads the step list to restart from) and
+        returns the time step at which sampling continues.
+        '''
         start_time_step = 1
         if self.restart_time_step == 1:
             initializer = ParticleInitializer(self._mcmc, self.temp_schedule,
                                               self._comm)
             initializer.set_proposal_distribution(proposal_center,
                                                   proposal_scales)
-            particles = initializer.initialize_particles(measurement_std_dev,
-                                                         num_particles)
-            self.step = self._initialize_step(particles)
-            self._add_step_to_step_list(self.step)
-            self._autosave_step(1)
+            particle_array = initializer.initialize_particle_array(
+                measurement_std_dev, num_particles)
+            self.step = self._initialize_step(particle_array)
+            if adaptive:
+                self.temp_schedule = [0.]
+                updater = self._create_updater(ess_threshold)
+                temperature = self._compute_next_temperature(updater, 0., 1)
+                self.step = updater.update_log_weights(temperature)
+                self.temp_schedule.append(temperature)
+            self._set_step_temperature(self.temp_schedule[1])
+            self._record_step(1)
 
         else:
-            start_time_step = restart_time_step
+            start_time_step = self.restart_time_step
             step_list = self.load_step_list(hdf5_to_load)
             self.step_list = self.trim_step_list(step_list,
                                                  self.restart_time_step,
                                                  self._comm)
             self.step = self.step_list[-1].copy()
             self._autosave_step_list()
-
-        updater = ParticleUpdater(self.step, ess_threshold, self._comm)
-
-        p_bar = tqdm(range(num_time_steps)[start_time_step + 1:])
+            if adaptive:
+                self.temp_schedule = self._get_restart_temp_schedule()
+                start_time_step = len(self.temp_schedule) - 1
+            if self.distributed:
+                self.step = self._scatter_step(self.step)
+        return start_time_step
+
+    def _sample_fixed(self, updater, start_time_step, num_particles,
+                      num_mcmc_steps, measurement_std_dev):
+        p_bar = tqdm(range(self.num_time_steps)[start_time_step + 1:])
         last_ess = num_particles
         for t in p_bar:
             temperature_step = self.temp_schedule[t] - self.temp_schedule[t - 1]
-            self.step = updater.update_log_weights(temperature_step)
-            self.step = updater.resample_if_needed()
-            mutator = ParticleMutator(self.step, self._mcmc, num_mcmc_steps,
-                                      self._comm)
-            self.step = mutator.mutate_particles(measurement_std_dev,
-                                                 self.temp_schedule[t])
-            self._autosave_step(t)
-            self._add_step_to_step_list(self.step)
-            
+            mutator = self._take_time_step(updater, t, temperature_step,
+                                           self.temp_schedule[t],
+                                           num_mcmc_steps, measurement_std_dev)
             if self._rank == 0:
                 set_bar(p_bar, t, last_ess, updater._ess,
                         mutator._mutation_ratio, updater._resample_status)
                 last_ess = updater._ess
+        return None
 
-        self._close_autosaver()
-        return self._step_list
+    def _sample_adaptive(self, updater, start_time_step, num_particles,
+                         num_mcmc_steps, measurement_std_dev):
+        p_bar = tqdm(total=self.num_time_steps - 1, initial=start_time_step)
+        last_ess = num_particles
+        temperature = self.temp_schedule[-1]
+        t = start_time_step
+        while temperature < 1.:
+            t += 1
+            temperature_step = self._compute_next_temperature(updater,
+                                                              temperature, t)
+            if temperature_step == 1. - temperature:
+                temperature = 1.
+            else:
+                temperature += temperature_step
+            self.temp_schedule.append(temperature)
+            mutator = self._take_time_step(updater, t, temperature_step,
+                                           temperature, num_mcmc_steps,
+                                           measurement_std_dev)
+            if self._rank == 0:
+                p_bar.update(1)
+                set_bar(p_bar, t, last_ess, updater._ess,
+                        mutator._mutation_ratio, updater._resample_status)
+                last_ess = updater._ess
+        p_bar.close()
+        return None
+
+    def _take_time_step(self, updater, t, temperature_step, temperature,
+                        num_mcmc_steps, measurement_std_dev):
+        self.step = updater.update_log_weights(temperature_step)
+        self.step = updater.resample_if_needed(self.resampling_scheme)
+        proposal_scale = self._get_proposal_scale()
+        mutator = ParticleMutator(self.step, self._mcmc, num_mcmc_steps,
+                                  self._comm, self.mutation_kernel,
+                                  self._distributor, self.distributed,
+                                  self.load_balancing, proposal_scale,
+                                  **self._mcmc_step_options)
+        self.step = mutator.mutate_particles(measurement_std_dev, temperature)
+        self._add_load_report(mutator.load_report)
+        self._kernel_scales.append(proposal_scale)
+        self._mcmc_step_counts.append(mutator.num_steps_taken)
+        if self._proposal_scaler is not None:
+            self._proposal_scaler.update(mutator._mutation_ratio,
+                                         mutator.num_steps_taken,
+                                         mutator.acceptance_rate)
+        self._set_step_temperature(temperature)
+        self._record_step(t)
+        return mutator
+
+    def _get_proposal_scale(self):
+        if self._proposal_scaler is None:
+            return 1.
+        return self._proposal_scaler.scale
+
+    def _create_updater(self, ess_threshold):
+        return ParticleUpdater(self.step, ess_threshold, self._comm,
+                               self.distributed)
+
+    def _compute_next_temperature(self, updater, temperature, t):
+        max_temperature_step = 1. - temperature
+        if t < self.num_time_steps - 1:
+            temperature_step = updater.compute_temperature_step(
+                self.target_ess_fraction, max_temperature_step)
+        else:
+            temperature_step = max_temperature_step
+        return self._comm.bcast(temperature_step, root=0)
+
+    def _get_restart_temp_schedule(self):
+        if self._rank == 0:
+            temps = [step.get_temperature() for step in self.step_list]
+            if None in temps:
+                raise ValueError('adaptive tempering restarts require a step '
+                                 'list with recorded temperatures.')
+            temp_schedule = [0.] + temps
+        else:
+            temp_schedule = None
+        return self._comm.bcast(temp_schedule, root=0)
 
     @staticmethod
     def load_step_list(h5_file, mpi_comm=SingleRankComm()):
@@ -227,29 +494,117 @@ class SMCSampler(Properties):
             hdf5.close()
         return None
 
-    def _initialize_step(self, particles):
-        particles = self._comm.gather(particles, root=0)
+    def _initialize_step(self, particle_array):
+        if self.distributed:
+            param_names = self._distributor.get_param_names(
+                particle_array.param_names)
+            step = SMCStep()
+            step.set_particle_array(particle_array.reorder_params(param_names))
+            ParticleUpdater(step, 0, self._comm, True).normalize_log_weights()
+            return step
+        particle_array = self._distributor.gather_particle_array(
+            particle_array)
         if self._rank == 0:
             step = SMCStep()
-            step.set_particles(np.concatenate(particles))
+            step.set_particle_array(particle_array)
             step.normalize_step_log_weights()
         else:
             step = None
         return step
 
+    def _scatter_step(self, step):
+        self._distributor.set_step(step)
+        local_step = SMCStep()
+        local_step.set_particle_array(
+            self._distributor.scatter_particle_array())
+        return local_step
+
+    def _gather_step(self):
+        if not self.distributed:
+            return self.step
+        particle_array = self._distributor.gather_particle_array(
+            self.step.get_particle_array())
+        if self._rank == 0:
+            step = SMCStep()
+            step.set_particle_array(particle_array)
+            step.set_temperature(self.step.get_temperature())
+            return step
+        return None
+
+    def _record_step(self, step_index):
+        step = self._gather_step()
+        self._autosave_step(step, step_index)
+        self._add_step_to_step_list(step)
+        return None
+
+    def _set_step_temperature(self, temperature):
+        if self._rank == 0 or self.distributed:
+            self.step.set_temperature(temperature)
+        return None
+
     def _add_step_to_step_list(self, step):
         if self._rank == 0:
             self._step_list.append(step.copy())
         return None
 
-    def _autosave_step(self, step_index):
+    def _add_load_report(self, load_report):
+        if self._rank == 0:
+            self._load_reports.append(load_report)
+        return None
+
+    def get_load_reports(self):
+        '''
+        Returns (on rank 0) the load report of each mutation of the last call
+        to sample(), in time step order. Each report is a list with one
+        dictionary per mpi process holding the time spent mutating
+        ('busy_time') and waiting for other processes ('idle_time') and the
+        number of chunks ('num_chunks') and particles ('num_items') mutated.
+        '''
+        return self._load_reports
+
+    def get_kernel_scales(self):
+        '''
+        Returns the scale of the mutation proposal (standard deviations
+        relative to the weighted particle covariance) used at each mutation
+        of the last call to sample(), in time step order; always 1 unless
+        kernel_scaling is 'adaptive'.
+        '''
+        return self._kernel_scales
+
+    def get_mcmc_step_counts(self):
+        '''
+        Returns the number of mcmc steps taken at each mutation of the last
+        call to sample(), in time step order; always num_mcmc_steps unless
+        mcmc_step_control is 'adaptive'. With dynamic load balancing, the
+        count is the mean over chunks weighted by their size.
+        '''
+        return self._mcmc_step_counts
+
+    def _get_autosave_mode(self, autosave_file, hdf5_to_load):
+        '''
+        Returns 'a' when restarting from the autosave file itself, so that
+        the loaded steps are appended to instead of truncated, else 'w'.
+        '''
+        if self.restart_time_step != 1 and autosave_file is not None and \
+                hdf5_to_load is not None and os.path.exists(autosave_file) \
+                and os.path.samefile(autosave_file, hdf5_to_load):
+            return 'a'
+        return 'w'
+
+    def _autosave_step(self, step, step_index):
         if self._rank == 0 and self._autosaver is not None:
-            self.autosaver.write_step(self.step, step_index)
+            self.autosaver.write_step(step, step_index)
         return None
 
-    def _close_autosaver(self):
+    def _close_autosaver(self, raise_errors=True):
+        '''
+        Writes the queued steps and closes the autosave file; called on every
+        exit from sample() so that the steps completed before an error are
+        kept. With raise_errors=False, write errors are suppressed (so they
+        do not mask the error that stopped sampling).
+        '''
         if self._rank == 0 and self._autosaver is not None:
-            self.autosaver.close()
+            self.autosaver.close(raise_errors)
         return None
 
     def _autosave_step_list(self):
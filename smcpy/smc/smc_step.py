@@ -32,10 +32,12 @@ AGREEMENT.
 
 import imp
 import numpy as np
-import copy
-import warnings
 from smcpy.particles.particle import Particle
+from smcpy.particles.particle_array import ParticleArray
+from smcpy.smc.resampler import Resampler
 from smcpy.utils.checks import Checks
+from smcpy.utils.factorized_covariance import factorize_step_covariance
+from smcpy.utils.weighted_moments import WeightedMoments
 
 
 def _mpi_decorator(func):
@@ -68,15 +70,30 @@ def _mpi_decorator(func):
 
 
 class SMCStep(Checks):
-    """ A single step of the sequential monte carlo (SMC) method that contains
-    a list of Particle instances
+    """ A single step of the sequential monte carlo (SMC) method. Particle
+    data is stored in columnar form (see ParticleArray); the Particle
+    instances returned by get_particles() are views onto that storage.
 
     :param particles: list of particle instances
     :type particles: list
     """
 
     def __init__(self):
-        self.particles = []
+        self._particle_array = ParticleArray.from_particles([])
+        self._particles = []
+        self._moments = None
+        self._moments_state = None
+        self._factorized_covariance = None
+        self._factorized_covariance_state = None
+        self._temperature = None
+
+    @property
+    def particles(self):
+        return self.get_particles()
+
+    @particles.setter
+    def particles(self, particles):
+        self.set_particles(particles)
 
     def add_particle(self, particle):
         '''
@@ -85,104 +102,191 @@ class SMCStep(Checks):
         :param particle: single instance of an SMC particle
         :type particle: Particle class object
         '''
-        self.particles.append(self._check_particle(particle))
+        self._check_particle(particle)
+        if self.get_num_particles() == 0:
+            return self.set_particles([particle])
+        particle_array = self._particle_array
+        particle_array.append(particle.params, particle.log_weight,
+                              particle.log_like)
+        particle = self._bind_particle(particle, particle_array,
+                                       len(particle_array) - 1)
+        if self._particles is not None:
+            self._particles.append(particle)
+        return None
 
     def set_particles(self, particles):
         '''
-        Fill a list of particles in the step with ID.
+        Fill a list of particles in the step with ID. Particles that own
+        their values become views onto the step's storage; particles that
+        are already views (e.g., belong to another step) are left untouched
+        and the step uses new views with the same values.
 
         :param particles: list of particle instances
         :type particles: list
         '''
-        self.particles = self._check_step(particles)
+        particles = list(self._check_step(particles))
+        particle_array = ParticleArray.from_particles(particles)
+        particles = [self._bind_particle(particle, particle_array, index)
+                     for index, particle in enumerate(particles)]
+        self._particle_array = particle_array
+        self._particles = particles
         return None
 
-    def copy(self):
+    @staticmethod
+    def _bind_particle(particle, particle_array, index):
+        if particle.is_view():
+            return particle_array.get_particle(index)
+        particle._bind(particle_array, index)
+        return particle
+
+    def set_particle_array(self, particle_array):
+        '''
+        Replaces the particle storage of the step.
+
+        :param particle_array: columnar particle storage
+        :type particle_array: ParticleArray class instance
+        '''
+        if not isinstance(particle_array, ParticleArray):
+            raise TypeError('Input must be of the ParticleArray class')
+        self._particle_array = particle_array
+        self._particles = None
+        return None
+
+    def get_particle_array(self):
+        '''
+        Returns the columnar particle storage of the step.
         '''
-        Returns a copy of the entire step class.
+        return self._particle_array
+
+    def get_num_particles(self):
+        '''
+        Returns the number of particles in the step.
+        '''
+        return len(self._particle_array)
+
+    def get_param_names(self):
+        '''
+        Returns the parameter names in the column order used by the step (and
+        by get_covariance()).
         '''
-        return copy.deepcopy(self)
+        return list(self._particle_array.param_names)
+
+    def set_temperature(self, temperature):
+        '''
+        Records the temperature (likelihood exponent) at which the particles
+        in the step target the tempered posterior.
+
+        :param temperature: temperature in [0, 1], or None if unknown
+        :type temperature: float or None
+        '''
+        if temperature is not None:
+            temperature = float(temperature)
+        self._temperature = temperature
+        return None
+
+    def get_temperature(self):
+        '''
+        Returns the temperature of the step (None if it was not recorded).
+        '''
+        return self._temperature
+
+    def copy(self):
+        '''
+        Returns a copy of the entire step class. The copy shares particle data
+        with self on a copy-on-write basis (see ParticleArray.snapshot), so
+        copying is cheap and data is duplicated only when one of the steps
+        is modified.
+        '''
+        step = SMCStep()
+        step.set_particle_array(self._particle_array.snapshot())
+        step.set_temperature(self._temperature)
+        return step
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_particles'] = None
+        state['_moments'] = None
+        state['_moments_state'] = None
+        state['_factorized_covariance'] = None
+        state['_factorized_covariance_state'] = None
+        return state
 
     def get_likes(self):
         '''
-        Returns a list of likelihoods for each particle in the step
+        Returns an array of likelihoods for each particle in the step
         '''
-        return [np.exp(p.log_like) for p in self.particles]
+        return np.exp(self._particle_array.log_likes)
 
     def get_log_likes(self):
         '''
-        Returns a list of log(likelihoods) for each particle in the step
+        Returns an array of log(likelihoods) for each particle in the step
         '''
-        return [p.log_like for p in self.particles]
+        return self._particle_array.log_likes.copy()
+
+    def get_moments(self):
+        '''
+        Returns the weighted moments (mean, variance, covariance and standard
+        deviation) of the step parameters, computed together from a single
+        weight normalization. The result is cached until the particle
+        weights or parameters change.
+
+        :Returns: WeightedMoments class instance; vector/matrix entries are
+            ordered according to get_param_names().
+        '''
+        particle_array = self._particle_array
+        state = (particle_array, particle_array.get_version())
+        if self._moments_state != state:
+            self._moments = WeightedMoments.from_log_weights(
+                particle_array.params, particle_array.log_weights)
+            self._moments_state = state
+        return self._moments
 
     def get_mean(self):
         '''
         Returns the estimated mean of each parameter in step.
         '''
-        normalized_weights = self.normalize_step_weights()
-        param_names = self.particles[0].params.keys()
-        mean = {}
-        for pn in param_names:
-            mean[pn] = []
-            for i, p in enumerate(self.particles):
-                mean[pn].append(normalized_weights[i] * p.params[pn])
-            mean[pn] = np.sum(mean[pn])
-        return mean
+        return self._to_param_dict(self.get_moments().mean)
 
     def get_variance(self):
         '''
         Returns the estimated variance of each parameter in step. Uses weighted
         sample formula https://en.wikipedia.org/wiki/Sample_mean_and_covariance 
         '''
-        normalized_weights = self.normalize_step_weights()
-        mean = self.get_mean()
-        param_names = self.particles[0].params.keys()
-        var = {}
-        for pn in param_names:
-            var[pn] = []
-            for i, p in enumerate(self.particles):
-                moment = (p.params[pn] - mean[pn])**2
-                var[pn].append(normalized_weights[i] * moment)
-            var[pn] = np.sum(var[pn])
-            var[pn] = 1 / (1 - np.sum(normalized_weights**2)) * var[pn]
-        return var
+        return self._to_param_dict(self.get_moments().variance)
 
     def get_std_dev(self):
         '''
-        Returns the estimated variance of each parameter in step. 
+        Returns the estimated standard deviation of each parameter in step. 
         '''
-        return {k: np.sqrt(v) for k, v in self.get_variance().iteritems()}
+        return self._to_param_dict(self.get_moments().std_dev)
 
     def get_log_weights(self):
         '''
-        Returns a list of the log weights of each particle in the step
+        Returns an array of the log weights of each particle in the step
         '''
-        return [p.log_weight for p in self.particles]
+        return self._particle_array.log_weights.copy()
 
     def get_covariance(self):
         '''
         Estimates the covariance matrix for the step. Uses weighted sample
-        formula https://en.wikipedia.org/wiki/Sample_mean_and_covariance
+        formula https://en.wikipedia.org/wiki/Sample_mean_and_covariance.
+        Rows/columns are ordered according to get_param_names().
         '''
-        particle_list = self.particles
-        normalized_weights = self.normalize_step_weights()
-        means = np.array(self.get_mean().values())
-
-        cov_list = []
-        for i, p in enumerate(particle_list):
-            param_vector = p.params.values()
-            diff = (param_vector - means).reshape(-1, 1)
-            R = np.dot(diff, diff.transpose())
-            cov_list.append(normalized_weights[i] * R)
-        cov_matrix = np.sum(cov_list, axis=0)
-        cov_matrix = cov_matrix * 1 / (1 - np.sum(normalized_weights**2))
-
-        if not self._is_positive_definite(cov_matrix):
-            msg = 'current step cov not pos def, setting to identity matrix'
-            warnings.warn(msg)
-            cov_matrix = np.eye(cov_matrix.shape[0])
+        return self.get_factorized_covariance().covariance.copy()
 
-        return cov_matrix
+    def get_factorized_covariance(self):
+        '''
+        Same as get_covariance(), but returns a FactorizedCovariance that
+        also holds the Cholesky factor (used by the mutation kernels to draw
+        proposals). Like the moments, it is cached until the particle
+        weights or parameters change.
+        '''
+        moments = self.get_moments()
+        if self._factorized_covariance_state != self._moments_state:
+            self._factorized_covariance = \
+                factorize_step_covariance(moments.covariance)
+            self._factorized_covariance_state = self._moments_state
+        return self._factorized_covariance
 
     def normalize_step_log_weights(self):
         '''
@@ -190,17 +294,16 @@ class SMCStep(Checks):
         all particles inside the step
         '''
         normalized_weights = self.normalize_step_weights()
-        for index, p in enumerate(self.particles):
-            p.log_weight = np.log(normalized_weights[index])
+        self._particle_array.set_log_weights(np.log(normalized_weights))
         return None
 
     def normalize_step_weights(self):
         '''
         Normalizes log weights of all particles inside the step
         '''
-        log_weights = np.array(self.get_log_weights())
-        shifted_weights = np.exp(log_weights - max(log_weights))
-        normalized_weights = shifted_weights / sum(shifted_weights)
+        log_weights = self._particle_array.log_weights
+        shifted_weights = np.exp(log_weights - np.max(log_weights))
+        normalized_weights = shifted_weights / np.sum(shifted_weights)
         return normalized_weights
 
     def compute_ess(self):
@@ -208,8 +311,8 @@ class SMCStep(Checks):
         Computes the effective sample size (ess) of the step based on log weight
         '''
         self.normalize_step_log_weights()
-        log_weights = self.get_log_weights()
-        return 1 / np.sum([np.exp(w)**2 for w in log_weights])
+        weights = np.exp(self._particle_array.log_weights)
+        return 1 / np.sum(weights**2)
 
     def get_params(self, key):
         '''
@@ -218,48 +321,44 @@ class SMCStep(Checks):
         :param key: parameter name
         :type key: str
         '''
-        particles = self.particles
-        return np.array([p.params[key] for p in particles])
+        index = self._particle_array.get_param_index(key)
+        return self._particle_array.params[:, index].copy()
 
     def get_param_dicts(self):
         '''
         Retrieves the entire parameter dictionary for every particle
         '''
-        particles = self.particles
-        return [p.params for p in particles]
+        particle_array = self._particle_array
+        return [particle_array.get_param_dict(i)
+                for i in range(len(particle_array))]
 
     def get_particles(self):
         '''
-        Retrieves the list of particles within the step object
+        Retrieves the list of particles within the step object; each particle
+        is a view onto the step's particle storage.
         '''
-        return self.particles
+        if self._particles is None:
+            self._particles = self._particle_array.get_particles()
+        return self._particles
 
-    def resample(self):  # issue here
+    def resample(self, scheme='multinomial'):
         '''
-        Resamples the step based on normalized weights. Assigns discrete
-        probabilities to each particle (sum to 1), resample from this discrete
-        distribution using the particle's copy() method.
+        Resamples the step based on normalized weights using the given
+        resampling scheme (see Resampler.available_schemes). Particles are
+        selected by index and all resampled particles are assigned uniform
+        weight.
+
+        :param scheme: resampling scheme
+        :type scheme: string
         '''
-        particles = self.particles
-        num_particles = len(particles)
-        weights = np.exp(self.get_log_weights())
-        weights_cs = np.cumsum(weights)
-        # intervals based on weights to use for discrete probability draw
-        intervals = zip(np.insert(weights_cs, 0, 0)[:-1], weights_cs)
-        # generate random numbers, iterate to find intervals for resample
-        R = np.random.uniform(0, 1, [num_particles, ])
-        new_particles = []
-        uniform_weight = 1. / num_particles
-        for r in R:
-            for i, (a, b) in enumerate(intervals):
-
-                if a <= r < b:
-                    # resample
-                    new_particles.append(particles[i].copy())
-                    # assign uniform weight
-                    new_particles[-1].log_weight = uniform_weight
-                    break
-        self.particles = new_particles
+        num_particles = self.get_num_particles()
+        resampler = Resampler(scheme)
+        indices = resampler.resample_indices(self.normalize_step_weights())
+        new_particle_array = self._particle_array.take(indices)
+        uniform_log_weight = np.log(1. / num_particles)
+        new_particle_array.set_log_weights(np.tile(uniform_log_weight,
+                                                   num_particles))
+        self.set_particle_array(new_particle_array)
         return None
 
     def print_particle_info(self, particle_num):
@@ -286,9 +385,11 @@ class SMCStep(Checks):
             import matplotlib.pyplot as plt
         fig = plt.figure()
         ax = fig.add_subplot(111)
-        for p in self.particles:
-            ax.plot([p.params[key], p.params[key]], [0.0, np.exp(p.log_weight)])
-            ax.plot(p.params[key], np.exp(p.log_weight), 'o')
+        params = self.get_params(key)
+        weights = np.exp(self.get_log_weights())
+        for param, weight in zip(params, weights):
+            ax.plot([param, param], [0.0, weight])
+            ax.plot(param, weight, 'o')
         if save:
             plt.savefig(prefix + key + '.png')
         if show:
@@ -308,12 +409,9 @@ class SMCStep(Checks):
             plt
         except:
             import matplotlib.pyplot as plt
-        # get particles
-        particles = self.particles
-
         # set up label dictionary
         if param_names is None:
-            param_names = particles[0].params.keys()
+            param_names = self.get_param_names()
         if labels is None:
             labels = param_names
         label_dict = {key: lab for key, lab in zip(param_names, labels)}
@@ -344,11 +442,8 @@ class SMCStep(Checks):
             key2 = param_names[ikey2]
             ax = {key1 + '+' + key2: fig.add_subplot(L - 1, L - 1, iplt)}
             # get list of all particle params for key1, key2 combinations
-            pkey1 = []
-            pkey2 = []
-            for p in particles:
-                pkey1.append(p.params[key1])
-                pkey2.append(p.params[key2])
+            pkey1 = self.get_params(key1)
+            pkey2 = self.get_params(key2)
             # plot parameter combos with weight as color
 
             def rnd_to_sig(x):
@@ -404,6 +499,9 @@ class SMCStep(Checks):
         plt.close(fig)
         return None
 
+    def _to_param_dict(self, values):
+        return dict(zip(self._particle_array.param_names, values))
+
     def _check_step(self, particle_list):
         if not isinstance(particle_list, (list, np.ndarray)):
             raise TypeError('Input must be a list or numpy array')
@@ -19,9 +19,13 @@ class Checks(object):
     def _is_float(input_):
         return isinstance(input_, float)
 
+    @staticmethod
+    def _is_boolean(input_):
+        return isinstance(input_, bool)
+
     @staticmethod
     def _is_string(input_):
-        return isinstance(input_, str)
+        return isinstance(input_, basestring)
 
     @staticmethod
     def _is_none(input_):
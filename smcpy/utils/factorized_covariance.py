@@ -0,0 +1,88 @@
+import numpy as np
+import warnings
+
+
+class FactorizedCovariance(object):
+    '''
+    Covariance matrix together with its lower Cholesky factor and log
+    determinant, computed once when the object is created. Passing this
+    object (instead of the bare matrix) to every chain and rank of a
+    mutation step avoids factorizing the same matrix again for each of them.
+    '''
+
+    def __init__(self, covariance):
+        '''
+        :param covariance: symmetric positive definite matrix
+        :type covariance: 2D array
+
+        :raises numpy.linalg.LinAlgError: if covariance is not positive
+            definite
+        '''
+        self._covariance = np.array(covariance, dtype=float)
+        self._cholesky = np.linalg.cholesky(self._covariance)
+        self._log_det = 2 * np.sum(np.log(np.diag(self._cholesky)))
+
+    @property
+    def covariance(self):
+        return self._covariance
+
+    @property
+    def cholesky(self):
+        '''
+        Lower triangular L with L L^T = covariance.
+        '''
+        return self._cholesky
+
+    @property
+    def log_det(self):
+        return self._log_det
+
+    @property
+    def dim(self):
+        return self._covariance.shape[0]
+
+    def scaled(self, scale):
+        '''
+        Returns the factorized covariance of scale**2 * covariance (i.e.,
+        proposals with standard deviations multiplied by scale) without
+        factorizing it again.
+
+        :param scale: positive scale factor
+        :type scale: float
+        '''
+        if not scale > 0:
+            raise ValueError('scale must be positive.')
+        scaled = FactorizedCovariance.__new__(FactorizedCovariance)
+        scaled._covariance = self._covariance * scale ** 2
+        scaled._cholesky = self._cholesky * scale
+        scaled._log_det = self._log_det + 2 * self.dim * np.log(scale)
+        return scaled
+
+
+def factorize(covariance):
+    '''
+    Returns covariance as a FactorizedCovariance; FactorizedCovariance
+    instances are returned unchanged.
+
+    :param covariance: positive definite matrix or FactorizedCovariance
+    :type covariance: 2D array or FactorizedCovariance
+    '''
+    if isinstance(covariance, FactorizedCovariance):
+        return covariance
+    return FactorizedCovariance(covariance)
+
+
+def factorize_step_covariance(covariance):
+    '''
+    Factorizes an estimated step covariance, falling back (with a warning)
+    to the identity matrix if the estimate is not positive definite.
+
+    :param covariance: estimated covariance matrix
+    :type covariance: 2D array
+    '''
+    try:
+        return FactorizedCovariance(covariance)
+    except np.linalg.LinAlgError:
+        msg = 'current step cov not pos def, setting to identity matrix'
+        warnings.warn(msg)
+        return FactorizedCovariance(np.eye(np.shape(covariance)[0]))
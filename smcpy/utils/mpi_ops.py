@@ -0,0 +1,19 @@
+'''
+Reduction operations passed to the buffer-based collectives (Allreduce,
+Exscan, ...) and the wildcard source rank used by point-to-point receives.
+These are the mpi4py constants when mpi4py is installed and plain
+placeholders otherwise, so that communicators without MPI (e.g.,
+SingleRankComm) can be called with the same arguments.
+'''
+
+try:
+    from mpi4py import MPI
+    SUM = MPI.SUM
+    MAX = MPI.MAX
+    MIN = MPI.MIN
+    ANY_SOURCE = MPI.ANY_SOURCE
+except ImportError:
+    SUM = 'sum'
+    MAX = 'max'
+    MIN = 'min'
+    ANY_SOURCE = -1
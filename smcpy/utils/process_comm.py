@@ -0,0 +1,233 @@
+import Queue
+import multiprocessing
+import numpy as np
+import traceback
+from . import mpi_ops
+
+
+class ProcessPool(object):
+    '''
+    Runs a function on a group of local processes, each of which receives a
+    ProcessComm communicator, so that code written for mpi4py (SMCSampler,
+    ParticleMutator, ...) uses every core of a workstation without an MPI
+    launcher. Rank 0 runs in the calling process; ranks 1 to size - 1 are
+    forked from it (POSIX only) and inherit its state.
+
+    Outside of run(), a ProcessPool reports the size of the group and rank 0
+    but cannot be used for communication.
+    '''
+
+    def __init__(self, num_processes=None):
+        '''
+        :param num_processes: number of processes (ranks); default is None,
+            which uses the number of cpus.
+        :type num_processes: int or None
+        '''
+        if num_processes is None:
+            num_processes = multiprocessing.cpu_count()
+        if num_processes < 1:
+            raise ValueError('num_processes must be a positive integer.')
+        self._size = num_processes
+
+    def Get_rank(self):
+        return 0
+
+    def Get_size(self):
+        return self._size
+
+    def run(self, function, *args, **kwargs):
+        '''
+        Calls function(comm, *args, **kwargs) on every rank and returns the
+        result of rank 0. The random number generator of each forked rank is
+        seeded from the generator of the calling process, so results are
+        reproducible with numpy.random.seed(). An exception on any rank is
+        raised on rank 0.
+
+        :param function: function to run; its first argument is the
+            communicator of the rank (ProcessComm)
+        :type function: callable
+        '''
+        queues = [multiprocessing.Queue() for _ in range(self._size)]
+        seeds = np.random.randint(0, 2 ** 31 - 1, self._size)
+        workers = [multiprocessing.Process(target=_run_worker,
+                                           args=(queues, rank, seeds[rank],
+                                                 function, args, kwargs))
+                   for rank in range(1, self._size)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            result = function(ProcessComm(queues, 0), *args, **kwargs)
+        except BaseException:
+            for worker in workers:
+                worker.terminate()
+            raise
+        for worker in workers:
+            worker.join()
+        return result
+
+
+def _run_worker(queues, rank, seed, function, args, kwargs):
+    np.random.seed(seed)
+    comm = ProcessComm(queues, rank)
+    try:
+        function(comm, *args, **kwargs)
+    except BaseException:
+        comm._abort(traceback.format_exc())
+        raise
+
+
+class ProcessComm(object):
+    '''
+    Communicator for one rank of a ProcessPool. Provides the subset of the
+    mpi4py communicator interface used by SMCPy: point-to-point messages
+    (send/recv/iprobe and the buffer-based Send/Recv) and the collectives
+    bcast, scatter, gather, allgather, Allreduce, Exscan, Scatterv and
+    Gatherv. Each rank has an inbox queue; collectives are built from
+    messages to and from the root, tagged with a per-communicator sequence
+    number so that consecutive collectives never mix.
+    '''
+
+    _abort_tag = 'abort'
+
+    def __init__(self, queues, rank):
+        '''
+        :param queues: one multiprocessing.Queue (inbox) per rank
+        :type queues: list
+        :param rank: rank of this process
+        :type rank: int
+        '''
+        self._queues = queues
+        self._rank = rank
+        self._size = len(queues)
+        self._pending = []
+        self._num_collectives = 0
+
+    def Get_rank(self):
+        return self._rank
+
+    def Get_size(self):
+        return self._size
+
+    def send(self, obj, dest, tag=0):
+        self._queues[dest].put((self._rank, tag, obj))
+        return None
+
+    def recv(self, source=mpi_ops.ANY_SOURCE, tag=0):
+        return self._receive(source, tag)
+
+    def iprobe(self, source=mpi_ops.ANY_SOURCE, tag=0):
+        while True:
+            try:
+                message = self._queues[self._rank].get_nowait()
+            except Queue.Empty:
+                break
+            self._store(message)
+        return self._find_pending(source, tag) is not None
+
+    def Send(self, buf, dest, tag=0):
+        return self.send(np.array(buf), dest, tag)
+
+    def Recv(self, buf, source, tag=0):
+        buf[...] = self._receive(source, tag)
+        return None
+
+    def bcast(self, obj, root=0):
+        tag = self._next_collective_tag()
+        if self._rank != root:
+            return self._receive(root, tag)
+        for dest in self._other_ranks(root):
+            self.send(obj, dest, tag)
+        return obj
+
+    def scatter(self, scatter_list, root=0):
+        tag = self._next_collective_tag()
+        if self._rank != root:
+            return self._receive(root, tag)
+        for dest in self._other_ranks(root):
+            self.send(scatter_list[dest], dest, tag)
+        return scatter_list[root]
+
+    def gather(self, obj, root=0):
+        tag = self._next_collective_tag()
+        if self._rank != root:
+            self.send(obj, root, tag)
+            return None
+        values = [obj if source == root else self._receive(source, tag)
+                  for source in range(self._size)]
+        return values
+
+    def allgather(self, obj):
+        return self.bcast(self.gather(obj, root=0), root=0)
+
+    def Allreduce(self, sendbuf, recvbuf, op=mpi_ops.SUM):
+        values = self.allgather(np.array(sendbuf))
+        recvbuf[...] = _reduce(values, op)
+        return None
+
+    def Exscan(self, sendbuf, recvbuf, op=mpi_ops.SUM):
+        values = self.allgather(np.array(sendbuf))
+        if self._rank > 0:
+            recvbuf[...] = _reduce(values[:self._rank], op)
+        return None
+
+    def Scatterv(self, sendbuf, recvbuf, root=0):
+        pieces = None
+        if self._rank == root:
+            array, (counts, displacements) = sendbuf
+            flat = np.ravel(array)
+            pieces = [flat[start:start + count]
+                      for count, start in zip(counts, displacements)]
+        recvbuf.reshape(-1)[:] = self.scatter(pieces, root=root)
+        return None
+
+    def Gatherv(self, sendbuf, recvbuf, root=0):
+        values = self.gather(np.array(sendbuf), root=root)
+        if self._rank == root:
+            array, (counts, displacements) = recvbuf
+            flat = array.reshape(-1)
+            for value, count, start in zip(values, counts, displacements):
+                flat[start:start + count] = np.ravel(value)
+        return None
+
+    def _receive(self, source, tag):
+        while True:
+            index = self._find_pending(source, tag)
+            if index is not None:
+                return self._pending.pop(index)[2]
+            self._store(self._queues[self._rank].get())
+
+    def _store(self, message):
+        source, tag, obj = message
+        if tag == self._abort_tag:
+            raise RuntimeError('rank %d failed:\n%s' % (source, obj))
+        self._pending.append(message)
+        return None
+
+    def _find_pending(self, source, tag):
+        for index, (message_source, message_tag, _) in \
+                enumerate(self._pending):
+            if message_tag == tag and \
+                    source in (mpi_ops.ANY_SOURCE, message_source):
+                return index
+        return None
+
+    def _next_collective_tag(self):
+        self._num_collectives += 1
+        return ('collective', self._num_collectives)
+
+    def _other_ranks(self, root):
+        return [rank for rank in range(self._size) if rank != root]
+
+    def _abort(self, message):
+        for dest in self._other_ranks(self._rank):
+            self._queues[dest].put((self._rank, self._abort_tag, message))
+        return None
+
+
+def _reduce(values, op):
+    for reduce_op, function in [(mpi_ops.SUM, np.sum), (mpi_ops.MAX, np.max),
+                                (mpi_ops.MIN, np.min)]:
+        if op == reduce_op:
+            return function(values, axis=0)
+    raise ValueError('unsupported reduction %s' % op)
@@ -1,10 +1,14 @@
 from checks import Checks
-from ..hdf5.hdf5_storage import HDF5Storage
+from ..hdf5.hdf5_stream_writer import HDF5StreamWriter
 from ..smc.smc_step import SMCStep
+from ..smc.resampler import Resampler
+from ..particles.particle_mutator import ParticleMutator
 
 
 class Properties(Checks):
 
+    available_kernel_scaling = ['fixed', 'adaptive']
+
     def __init__(self):
         super(Properties, self).__init__()
         self._num_particles = 1
@@ -13,8 +17,16 @@ class Properties(Checks):
         self._num_mcmc_steps = 1
         self._ess_threshold = 0
         self._autosaver = None
+        self._autosave_mode = 'w'
         self._restart_time_step = 0
         self._particle_chain = SMCStep()
+        self._resampling_scheme = 'multinomial'
+        self._mutation_kernel = 'native'
+        self._target_ess_fraction = None
+        self._distributed = False
+        self._load_balancing = 'static'
+        self._kernel_scaling = 'fixed'
+        self._mcmc_step_control = 'fixed'
 
     @property
     def num_particles(self):
@@ -97,7 +109,8 @@ class Properties(Checks):
         if not self._is_string_or_none(autosave_file):
             self._raise_type_error('autosave_file', 'string or None')
         if self._rank == 0 and autosave_file is not None:
-            self._autosaver = HDF5Storage(autosave_file, mode='w')
+            self._autosaver = HDF5StreamWriter(autosave_file,
+                                               mode=self._autosave_mode)
         else:
             self._autosaver = None
         return None
@@ -130,3 +143,100 @@ class Properties(Checks):
             self._raise_type_error(input_, 'SMCStep instance or None')
         self._particle_chain = particle_chain
         return None
+
+    @property
+    def resampling_scheme(self):
+        return self._resampling_scheme
+
+    @resampling_scheme.setter
+    def resampling_scheme(self, resampling_scheme):
+        input_ = 'resampling_scheme'
+        if not self._is_string(resampling_scheme):
+            self._raise_type_error(input_, 'string')
+        if resampling_scheme.lower() not in Resampler.available_schemes:
+            raise ValueError('%s must be one of %s.' %
+                             (input_, Resampler.available_schemes))
+        self._resampling_scheme = resampling_scheme.lower()
+        return None
+
+    @property
+    def mutation_kernel(self):
+        return self._mutation_kernel
+
+    @mutation_kernel.setter
+    def mutation_kernel(self, mutation_kernel):
+        input_ = 'mutation_kernel'
+        if mutation_kernel not in ParticleMutator.available_kernels:
+            raise ValueError('%s must be one of %s.' %
+                             (input_, ParticleMutator.available_kernels))
+        self._mutation_kernel = mutation_kernel
+        return None
+
+    @property
+    def target_ess_fraction(self):
+        return self._target_ess_fraction
+
+    @target_ess_fraction.setter
+    def target_ess_fraction(self, target_ess_fraction):
+        input_ = 'target_ess_fraction'
+        if self._is_none(target_ess_fraction):
+            self._target_ess_fraction = None
+            return None
+        if not self._is_integer_or_float(target_ess_fraction):
+            self._raise_type_error(input_, 'float or None')
+        if not 0 < target_ess_fraction < 1:
+            raise ValueError('%s must be between 0 and 1.' % input_)
+        self._target_ess_fraction = float(target_ess_fraction)
+        return None
+
+    @property
+    def distributed(self):
+        return self._distributed
+
+    @distributed.setter
+    def distributed(self, distributed):
+        if not self._is_boolean(distributed):
+            self._raise_type_error('distributed', 'boolean')
+        self._distributed = distributed
+        return None
+
+    @property
+    def load_balancing(self):
+        return self._load_balancing
+
+    @load_balancing.setter
+    def load_balancing(self, load_balancing):
+        input_ = 'load_balancing'
+        if load_balancing not in ParticleMutator.available_load_balancing:
+            options = ParticleMutator.available_load_balancing
+            raise ValueError('%s must be one of %s.' % (input_, options))
+        self._load_balancing = load_balancing
+        return None
+
+    @property
+    def kernel_scaling(self):
+        return self._kernel_scaling
+
+    @kernel_scaling.setter
+    def kernel_scaling(self, kernel_scaling):
+        input_ = 'kernel_scaling'
+        if kernel_scaling not in self.available_kernel_scaling:
+            options = self.available_kernel_scaling
+            raise ValueError('%s must be one of %s.' % (input_, options))
+        self._kernel_scaling = kernel_scaling
+        return None
+
+    @property
+    def mcmc_step_control(self):
+        return self._mcmc_step_control
+
+    @mcmc_step_control.setter
+    def mcmc_step_control(self, mcmc_step_control):
+        input_ = 'mcmc_step_control'
+        if mcmc_step_control not in \
+                ParticleMutator.available_mcmc_step_control:
+            raise ValueError('%s must be one of %s.' %
+                             (input_,
+                              ParticleMutator.available_mcmc_step_control))
+        self._mcmc_step_control = mcmc_step_control
+        return None
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class SingleRankComm():
 
     def __init__(self):
@@ -22,3 +25,45 @@ class SingleRankComm():
     @staticmethod
     def gather(scatter_list, *args, **kwargs):
         return [scatter_list]
+
+    @staticmethod
+    def bcast(obj, *args, **kwargs):
+        return obj
+
+    @staticmethod
+    def allgather(obj, *args, **kwargs):
+        return [obj]
+
+    @classmethod
+    def Allreduce(class_, sendbuf, recvbuf, *args, **kwargs):
+        class_._copy_buffer(sendbuf, recvbuf)
+        return None
+
+    @staticmethod
+    def Exscan(sendbuf, recvbuf, *args, **kwargs):
+        recvbuf[...] = 0
+        return None
+
+    @classmethod
+    def Scatterv(class_, sendbuf, recvbuf, *args, **kwargs):
+        class_._copy_buffer(sendbuf, recvbuf)
+        return None
+
+    @classmethod
+    def Gatherv(class_, sendbuf, recvbuf, *args, **kwargs):
+        class_._copy_buffer(sendbuf, recvbuf)
+        return None
+
+    @staticmethod
+    def _copy_buffer(sendbuf, recvbuf):
+        '''
+        Copies between buffer specifications in the mpi4py format, i.e. an
+        array or a list [array, (counts, displacements)].
+        '''
+        if isinstance(sendbuf, (list, tuple)):
+            sendbuf = sendbuf[0]
+        if isinstance(recvbuf, (list, tuple)):
+            recvbuf = recvbuf[0]
+        recvbuf = np.asarray(recvbuf)
+        recvbuf.reshape(-1)[:] = np.ravel(sendbuf)
+        return None
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+class WeightedMoments(object):
+    '''
+    Accumulates the weighted mean and covariance of a set of parameter
+    vectors. Each batch passed to update() is reduced with a corrected
+    two-pass algorithm and folded into the running totals with the pairwise
+    (weighted Welford) update of Chan et al., so results stay accurate for
+    large particle counts and batches computed separately (e.g., on
+    different processes) can be combined with merge().
+
+    Covariance uses the unbiased weighted estimator
+    https://en.wikipedia.org/wiki/Sample_mean_and_covariance
+    '''
+
+    def __init__(self, num_params):
+        '''
+        :param num_params: dimension of the parameter vectors
+        :type num_params: int
+        '''
+        self._sum_weights = 0.
+        self._sum_sq_weights = 0.
+        self._mean = np.zeros(num_params)
+        self._comoment = np.zeros((num_params, num_params))
+
+    @classmethod
+    def from_log_weights(cls, params, log_weights):
+        '''
+        Computes moments of params given unnormalized log weights.
+
+        :param params: shape = (num_particles, num_params)
+        :type params: 2D array
+        :param log_weights: log weight of each row of params
+        :type log_weights: 1D array
+        '''
+        params = np.asarray(params)
+        log_weights = np.asarray(log_weights)
+        weights = np.exp(log_weights - np.max(log_weights))
+        weights = weights / np.sum(weights)
+        moments = cls(params.shape[1])
+        moments.update(params, weights)
+        return moments
+
+    def update(self, params, weights):
+        '''
+        Adds a batch of weighted parameter vectors.
+
+        :param params: shape = (num_particles, num_params)
+        :type params: 2D array
+        :param weights: nonnegative weight of each row of params
+        :type weights: 1D array
+        '''
+        params = np.asarray(params, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        sum_weights = np.sum(weights)
+        if sum_weights == 0:
+            return None
+        mean = np.dot(weights, params) / sum_weights
+        diff = params - mean
+        correction = np.dot(weights, diff) / sum_weights
+        mean = mean + correction
+        diff = diff - correction
+        comoment = np.dot(diff.T * weights, diff)
+        self._combine(sum_weights, np.sum(weights**2), mean, comoment)
+        return None
+
+    def merge(self, other):
+        '''
+        Folds the totals accumulated by another WeightedMoments instance into
+        this one.
+
+        :param other: moments of a disjoint set of parameter vectors
+        :type other: WeightedMoments class instance
+        '''
+        self._combine(other._sum_weights, other._sum_sq_weights, other._mean,
+                      other._comoment)
+        return None
+
+    @property
+    def sum_weights(self):
+        return self._sum_weights
+
+    @property
+    def mean(self):
+        return self._mean.copy()
+
+    @property
+    def covariance(self):
+        sum_weights = self._sum_weights
+        denominator = sum_weights - self._sum_sq_weights / sum_weights
+        return 1 / denominator * self._comoment
+
+    @property
+    def variance(self):
+        return np.diag(self.covariance).copy()
+
+    @property
+    def std_dev(self):
+        return np.sqrt(self.variance)
+
+    def _combine(self, sum_weights, sum_sq_weights, mean, comoment):
+        if sum_weights == 0:
+            return None
+        total_weights = self._sum_weights + sum_weights
+        delta = mean - self._mean
+        outer_scale = self._sum_weights * sum_weights / total_weights
+        self._mean = self._mean + delta * (sum_weights / total_weights)
+        self._comoment = self._comoment + comoment + \
+            np.outer(delta, delta) * outer_scale
+        self._sum_weights = total_weights
+        self._sum_sq_weights += sum_sq_weights
+        return None
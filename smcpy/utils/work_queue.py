@@ -0,0 +1,207 @@
+import numpy as np
+import time
+from . import mpi_ops
+from .single_rank_comm import SingleRankComm
+
+
+class WorkQueue(object):
+    '''
+    Master/worker scheduler that hands out contiguous chunks of work items
+    on demand. Rank 0 holds the queue; every other rank requests its next
+    chunk as soon as it starts processing the current one (one chunk of
+    prefetch), so ranks that draw cheap items simply process more chunks
+    and workers do not wait for rank 0 to answer. Rank 0 answers all
+    pending requests before each chunk it processes itself and only takes
+    small chunks (1 / size of a worker chunk), so requests are answered
+    quickly.
+
+    By default chunks are sized with guided self-scheduling, i.e. each
+    worker chunk holds ceil(remaining / (2 * size)) items: large chunks keep
+    messaging overhead low early on and small chunks even out the finish
+    times.
+
+    If map() is given a load_chunk function, rank 0 sends the input of each
+    chunk along with its assignment, so workers receive only the data of
+    the chunks they process.
+
+    After each call to map(), load_report holds (on rank 0) one dictionary
+    per rank with the time spent processing chunks ('busy_time'), the time
+    spent waiting for work or for results ('idle_time') and the number of
+    chunks and items processed.
+    '''
+
+    _request_tag = 21
+    _assign_tag = 22
+
+    def __init__(self, mpi_comm=SingleRankComm(), chunk_size=None):
+        '''
+        :param mpi_comm: mpi communicator (or SingleRankComm)
+        :type mpi_comm: object
+        :param chunk_size: fixed number of items per chunk; default is None,
+            which uses guided self-scheduling.
+        :type chunk_size: int or None
+        '''
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer.')
+        self._comm = mpi_comm
+        self._size = self._comm.Get_size()
+        self._rank = self._comm.Get_rank()
+        self._chunk_size = chunk_size
+        self.load_report = None
+
+    def map(self, function, num_items, load_chunk=None):
+        '''
+        Calls function(start, stop) for consecutive chunks [start, stop) of
+        range(num_items), distributing the chunks across ranks on demand.
+        Must be called on all ranks; num_items is only used on rank 0, and
+        load_chunk is only called on rank 0 but must be given (or omitted)
+        on every rank.
+
+        :param function: callable processing one chunk of items; called as
+            function(start, stop, chunk_input) if load_chunk is given
+        :type function: callable
+        :param num_items: total number of work items
+        :type num_items: int
+        :param load_chunk: optional callable returning the input of chunk
+            [start, stop) on rank 0, which is sent to the rank processing it
+        :type load_chunk: callable or None
+
+        :Returns: on rank 0, the list of results of function ordered by
+            start index; None on all other ranks.
+        '''
+        self._reset_counters()
+        self._load_chunk = load_chunk
+        if self._rank == 0:
+            results = self._run_master(function, num_items)
+        else:
+            self._run_worker(function)
+            results = None
+        self.load_report = self._gather_load_report()
+        return results
+
+    def _run_master(self, function, num_items):
+        self._num_items = num_items
+        self._next_start = 0
+        results = {}
+        self._num_outstanding = 0
+        active_workers = self._size - 1
+        while True:
+            while active_workers > 0 and \
+                    self._comm.iprobe(source=mpi_ops.ANY_SOURCE,
+                                      tag=self._request_tag):
+                active_workers -= self._serve_request(results)
+            chunk = self._next_chunk(master=True)
+            if chunk is not None:
+                start, stop = chunk
+                results[start] = self._run_chunk(function, start, stop,
+                                                 self._get_chunk_input(chunk))
+            elif active_workers > 0 or self._num_outstanding > 0:
+                active_workers -= self._serve_request(results)
+            else:
+                break
+        return [results[start] for start in sorted(results)]
+
+    def _serve_request(self, results):
+        '''
+        Receives one message from a worker. Messages either carry the result
+        of a chunk or request the next chunk, which is sent with its input
+        (None once the queue is empty); returns 1 if the worker was told to
+        stop, else 0.
+        '''
+        start_time = time.time()
+        rank, start, result = self._comm.recv(source=mpi_ops.ANY_SOURCE,
+                                              tag=self._request_tag)
+        self._idle_time += time.time() - start_time
+        if start is not None:
+            results[start] = result
+            self._num_outstanding -= 1
+            return 0
+        chunk = self._next_chunk()
+        if chunk is None:
+            self._comm.send(None, dest=rank, tag=self._assign_tag)
+            return 1
+        self._num_outstanding += 1
+        self._comm.send((chunk, self._get_chunk_input(chunk)), dest=rank,
+                        tag=self._assign_tag)
+        return 0
+
+    def _run_worker(self, function):
+        request = (self._rank, None, None)
+        self._comm.send(request, dest=0, tag=self._request_tag)
+        assignment = self._receive_assignment()
+        while assignment is not None:
+            self._comm.send(request, dest=0, tag=self._request_tag)
+            (start, stop), chunk_input = assignment
+            result = self._run_chunk(function, start, stop, chunk_input)
+            self._comm.send((self._rank, start, result), dest=0,
+                            tag=self._request_tag)
+            assignment = self._receive_assignment()
+        return None
+
+    def _receive_assignment(self):
+        start_time = time.time()
+        assignment = self._comm.recv(source=0, tag=self._assign_tag)
+        self._idle_time += time.time() - start_time
+        return assignment
+
+    def _next_chunk(self, master=False):
+        remaining = self._num_items - self._next_start
+        if remaining <= 0:
+            return None
+        if self._chunk_size is None:
+            chunk_size = int(np.ceil(remaining / (2. * self._size)))
+            if master:
+                chunk_size = int(np.ceil(chunk_size / float(self._size)))
+        else:
+            chunk_size = min(self._chunk_size, remaining)
+        start = self._next_start
+        self._next_start += chunk_size
+        return start, self._next_start
+
+    def _get_chunk_input(self, chunk):
+        if self._load_chunk is None:
+            return None
+        return self._load_chunk(*chunk)
+
+    def _run_chunk(self, function, start, stop, chunk_input):
+        start_time = time.time()
+        if self._load_chunk is None:
+            result = function(start, stop)
+        else:
+            result = function(start, stop, chunk_input)
+        self._busy_time += time.time() - start_time
+        self._num_chunks += 1
+        self._num_processed += stop - start
+        return result
+
+    def _reset_counters(self):
+        self._num_items = 0
+        self._next_start = 0
+        self._busy_time = 0.
+        self._idle_time = 0.
+        self._num_chunks = 0
+        self._num_processed = 0
+        return None
+
+    def _gather_load_report(self):
+        local_report = {'busy_time': self._busy_time,
+                        'idle_time': self._idle_time,
+                        'num_chunks': self._num_chunks,
+                        'num_items': self._num_processed}
+        return self._comm.gather(local_report, root=0)
+
+
+def compute_idle_fraction(load_report):
+    '''
+    Returns the fraction of the total (busy + idle) time that ranks spent
+    idle; 0 means perfectly balanced work.
+
+    :param load_report: one dictionary per rank with keys 'busy_time' and
+        'idle_time' (see WorkQueue.load_report)
+    :type load_report: list
+    '''
+    busy = sum(rank_report['busy_time'] for rank_report in load_report)
+    idle = sum(rank_report['idle_time'] for rank_report in load_report)
+    if busy + idle == 0:
+        return 0.
+    return idle / (busy + idle)
@@ -131,12 +131,23 @@ def part_updater_high_ess_threshold(filled_step):
 
 
 @pytest.fixture
-def sampler():
-    model = DummyModel()
+def make_sampler(model):
+    '''
+    Returns a function that creates an SMCSampler of the dummy model (uniform
+    priors on a and b) on the given communicator.
+    '''
     param_priors = {'a': ['Uniform', 0., 1.], 'b': ['Uniform', 0., 1.]}
     data = model.evaluate({'a': 0., 'b': 0.})
-    sampler = SMCSampler(data, model, param_priors)
-    return sampler
+
+    def make(mpi_comm=None, **kwargs):
+        return SMCSampler(data, model, param_priors, mpi_comm=mpi_comm,
+                          **kwargs)
+    return make
+
+
+@pytest.fixture
+def sampler(make_sampler):
+    return make_sampler()
 
 
 @pytest.fixture
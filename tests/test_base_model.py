@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
 
-from smcpy.model.base_model import BaseModel
+from smcpy.model.base_model import BaseModel, evaluate_model_batch
 
 class ImplementedModel(BaseModel):
 
@@ -45,3 +45,47 @@ def test_generate_noisy_data_with_one_stdv(implemented_model):
     noise = np.random.normal(0, stdv, (1,))
     noisy_data = implemented_model.generate_noisy_data_with_model(stdv, params)
     assert noisy_data[0] != 1 + noise
+
+
+class BatchOnlyCountingModel(ImplementedModel):
+
+    def __init__(self):
+        self.num_batch_calls = 0
+
+    def evaluate_batch(self, param_matrix, param_names):
+        self.num_batch_calls += 1
+        return 2 * param_matrix
+
+
+class NonBaseModel():
+
+    def evaluate(self, params):
+        return [params['a'], params['b'], params['a'] + params['b']]
+
+
+def test_default_evaluate_batch_loops_over_evaluate(implemented_model):
+    param_matrix = np.array([[1., 2.], [3., 4.], [5., 6.]])
+    outputs = implemented_model.evaluate_batch(param_matrix, ['a', 'b'])
+    expected = [implemented_model.evaluate(a=row[0], b=row[1])
+                for row in param_matrix]
+    np.testing.assert_array_equal(outputs, expected)
+
+
+def test_evaluate_model_batch_uses_evaluate_batch():
+    model = BatchOnlyCountingModel()
+    param_matrix = np.array([[1., 2.], [3., 4.]])
+    outputs = evaluate_model_batch(model, param_matrix, ['a', 'b'])
+    np.testing.assert_array_equal(outputs, 2 * param_matrix)
+    assert model.num_batch_calls == 1
+
+
+def test_evaluate_model_batch_without_evaluate_batch():
+    param_matrix = np.array([[1., 2.], [3., 4.]])
+    outputs = evaluate_model_batch(NonBaseModel(), param_matrix, ['a', 'b'])
+    np.testing.assert_array_equal(outputs, [[1., 2., 3.], [3., 4., 7.]])
+
+
+def test_evaluate_model_batch_empty(implemented_model):
+    outputs = evaluate_model_batch(implemented_model, np.empty((0, 2)),
+                                   ['a', 'b'])
+    assert outputs.shape[0] == 0
@@ -0,0 +1,125 @@
+import numpy as np
+import os
+import pytest
+from smcpy.model.base_model import BaseModel, evaluate_model_batch
+from smcpy.model.cached_model import CachedModel
+from smcpy.model.threaded_model import ThreadedModel
+from smcpy.smc.smc_propagator import SMCPropagator
+
+
+class CountingModel(BaseModel):
+
+    def __init__(self):
+        self.num_evaluations = 0
+
+    def evaluate(self, *args, **kwargs):
+        params = self.process_args(args, kwargs)
+        self.num_evaluations += 1
+        a, b = params['a'], params['b']
+        return np.array([[a, b, a - b]])
+
+
+@pytest.fixture
+def model():
+    return CountingModel()
+
+
+@pytest.fixture
+def param_matrix():
+    return np.array([[1., 2.], [3., 4.], [1., 2.]])
+
+
+def test_batch_evaluates_repeated_rows_once(model, param_matrix):
+    cached = CachedModel(model)
+    outputs = cached.evaluate_batch(param_matrix, ['a', 'b'])
+    np.testing.assert_array_equal(outputs,
+                                  evaluate_model_batch(CountingModel(),
+                                                       param_matrix,
+                                                       ['a', 'b']))
+    assert model.num_evaluations == 2
+    cached.evaluate_batch(param_matrix, ['a', 'b'])
+    assert model.num_evaluations == 2
+    assert cached.num_hits == 4 and cached.num_misses == 2
+
+
+def test_key_independent_of_name_order(model, param_matrix):
+    cached = CachedModel(model)
+    cached.evaluate_batch(param_matrix, ['a', 'b'])
+    outputs = cached.evaluate_batch(param_matrix[:, ::-1], ['b', 'a'])
+    assert model.num_evaluations == 2
+    np.testing.assert_array_equal(outputs[0], [1., 2., -1.])
+
+
+def test_evaluate_shares_cache_with_batch(model, param_matrix):
+    cached = CachedModel(model)
+    output = cached.evaluate({'a': 1., 'b': 2.})
+    assert output.shape == (1, 3)
+    cached.evaluate_batch(param_matrix, ['a', 'b'])
+    assert model.num_evaluations == 2
+    assert cached.evaluate(a=3., b=4.).shape == (1, 3)
+    assert model.num_evaluations == 2
+    assert cached.hit_rate == pytest.approx(3. / 5)
+
+
+def test_modifying_outputs_does_not_change_cache(model, param_matrix):
+    cached = CachedModel(model)
+    cached.evaluate(a=1., b=2.)[0, 0] = 100.
+    hit = cached.evaluate(a=1., b=2.)
+    np.testing.assert_array_equal(hit, [[1., 2., -1.]])
+    hit[0, 1] = 100.
+    cached.evaluate_batch(param_matrix, ['a', 'b'])[0, 2] = 100.
+    outputs = cached.evaluate_batch(param_matrix, ['a', 'b'])
+    np.testing.assert_array_equal(outputs[0], [1., 2., -1.])
+    np.testing.assert_array_equal(cached.evaluate(a=1., b=2.),
+                                  [[1., 2., -1.]])
+    assert model.num_evaluations == 2
+
+
+def test_memory_cap_evicts_least_recently_used(model):
+    entry_bytes = 2 * 8 + 3 * 8
+    cached = CachedModel(model, max_bytes=2 * entry_bytes)
+    for a in [1., 2., 1., 3.]:
+        cached.evaluate_batch([[a, 0.]], ['a', 'b'])
+    assert cached.num_entries == 2
+    assert cached.num_bytes == 2 * entry_bytes
+    cached.evaluate_batch([[1., 0.]], ['a', 'b'])
+    assert model.num_evaluations == 3
+
+
+def test_clear(model, param_matrix):
+    cached = CachedModel(model)
+    cached.evaluate_batch(param_matrix, ['a', 'b'])
+    cached.clear()
+    assert cached.num_entries == 0 and cached.num_bytes == 0
+    assert cached.hit_rate == 0.
+
+
+def test_save_and_load(model, param_matrix):
+    cached = CachedModel(model, cache_file='model_cache.hdf5')
+    cached.evaluate({'a': 1., 'b': 2.})
+    cached.evaluate_batch(param_matrix, ['a', 'b'])
+    cached.save()
+    restored_model = CountingModel()
+    restored = CachedModel(restored_model, cache_file='model_cache.hdf5')
+    os.remove('model_cache.hdf5')
+    assert restored.num_entries == 2
+    np.testing.assert_array_equal(
+        restored.evaluate_batch(param_matrix, ['a', 'b']),
+        cached.evaluate_batch(param_matrix, ['a', 'b']))
+    assert restored.evaluate(a=1., b=2.).shape == (1, 3)
+    assert restored_model.num_evaluations == 0
+
+
+def test_save_without_file(model):
+    with pytest.raises(ValueError):
+        CachedModel(model).save()
+
+
+def test_shared_with_threads_and_propagator(model, filled_step):
+    cached = CachedModel(model)
+    particle_array = filled_step.get_particle_array()
+    ThreadedModel(cached, num_threads=2).evaluate_batch(
+        particle_array.params, particle_array.param_names)
+    num_evaluations = model.num_evaluations
+    SMCPropagator(cached).propagate(filled_step)
+    assert model.num_evaluations == num_evaluations
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from smcpy.particles.particle_array import ParticleArray
+from smcpy.smc.distributed_resampler import DistributedResampler
+from smcpy.utils.single_rank_comm import SingleRankComm
+from thread_comm import run_on_ranks
+
+
+def make_local_array(comm, weights):
+    indices = np.array_split(np.arange(len(weights)), comm.Get_size())
+    local = indices[comm.Get_rank()]
+    params = np.column_stack((local, -local)).astype(float)
+    with np.errstate(divide='ignore'):
+        log_weights = np.log(weights[local])
+    return ParticleArray(['id', 'neg_id'], params, log_weights, local * 10.)
+
+
+@pytest.mark.parametrize('scheme', DistributedResampler.available_schemes)
+def test_resample_multi_rank(scheme):
+    np.random.seed(0)
+    weights = np.random.uniform(0, 1, 23)
+    weights /= np.sum(weights)
+
+    def resample(comm):
+        resampler = DistributedResampler(scheme, comm)
+        return resampler.resample(make_local_array(comm, weights))
+
+    results = run_on_ranks(3, resample)
+    assert [len(result) for result in results] == [8, 8, 7]
+    for result in results:
+        ids = result.params[:, 0]
+        np.testing.assert_array_equal(result.params[:, 1], -ids)
+        np.testing.assert_array_equal(result.log_likes, ids * 10.)
+        np.testing.assert_array_almost_equal(result.log_weights,
+                                             np.log(1 / 23.))
+
+
+def test_single_heavy_particle_migrates():
+    weights = np.array([0.] * 8 + [1.])
+
+    def resample(comm):
+        resampler = DistributedResampler('systematic', comm)
+        return resampler.resample(make_local_array(comm, weights))
+
+    results = run_on_ranks(3, resample)
+    for result in results:
+        np.testing.assert_array_equal(result.params[:, 0], 8.)
+
+
+def compute_counts(scheme, weights, num_ranks):
+
+    def count(comm):
+        resampler = DistributedResampler(scheme, comm)
+        local = np.array_split(weights, comm.Get_size())[comm.Get_rank()]
+        return resampler.compute_offspring_counts(local)
+
+    return np.concatenate(run_on_ranks(num_ranks, count))
+
+
+def test_systematic_counts_within_one_of_expected():
+    weights = np.random.uniform(0, 1, 50)
+    weights /= np.sum(weights)
+    counts = compute_counts('systematic', weights, 4)
+    assert np.sum(counts) == 50
+    assert np.all(np.abs(counts - 50 * weights) < 1)
+
+
+def test_residual_counts_include_deterministic_copies():
+    weights = np.random.uniform(0, 1, 50)
+    weights /= np.sum(weights)
+    counts = compute_counts('residual', weights, 4)
+    assert np.sum(counts) == 50
+    assert np.all(counts >= np.floor(50 * weights))
+
+
+def test_single_rank_matches_population_size():
+    weights = np.tile(0.1, 10)
+    comm = SingleRankComm()
+    resampler = DistributedResampler('stratified', comm)
+    result = resampler.resample(make_local_array(comm, weights))
+    assert len(result) == 10
+
+
+def test_plan_transfers_moves_only_surplus():
+    transfers = DistributedResampler._plan_transfers([10, 0, 2], [4, 4, 4])
+    assert transfers == [(0, 1, 4), (0, 2, 2)]
+
+
+@pytest.mark.parametrize('scheme', DistributedResampler.available_schemes)
+def test_counts_cover_population_with_empty_ranks(scheme):
+    weights = np.array([0., 0.3, 0.7])
+    counts = compute_counts(scheme, weights, 5)
+    assert counts.shape == (3,)
+    assert np.sum(counts) == 3 and counts[0] == 0
+
+
+@pytest.mark.parametrize('scheme', ['multinomial', 'stratified'])
+def test_expected_counts_match_weights(scheme):
+    np.random.seed(1)
+    weights = np.random.uniform(0, 1, 12)
+    weights /= np.sum(weights)
+    counts = [compute_counts(scheme, weights, 3) for _ in range(300)]
+    np.testing.assert_allclose(np.mean(counts, axis=0), 12 * weights,
+                               atol=0.3)
+
+
+def test_ranks_draw_only_their_strata():
+    num_strata = []
+
+    class RecordingResampler(DistributedResampler):
+
+        def _draw_uniforms(self, strata, seed):
+            num_strata.append(strata.shape[0])
+            return super(RecordingResampler, self)._draw_uniforms(strata,
+                                                                  seed)
+
+    def count(comm):
+        resampler = RecordingResampler('stratified', comm)
+        return resampler.compute_offspring_counts(np.tile(1. / 400, 100))
+
+    counts = np.concatenate(run_on_ranks(4, count))
+    assert np.sum(counts) == 400
+    assert max(num_strata) <= 101
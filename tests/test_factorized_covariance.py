@@ -0,0 +1,64 @@
+import numpy as np
+import pickle
+import pytest
+import warnings
+from smcpy.utils.factorized_covariance import FactorizedCovariance
+from smcpy.utils.factorized_covariance import factorize
+from smcpy.utils.factorized_covariance import factorize_step_covariance
+
+
+@pytest.fixture
+def covariance():
+    return np.array([[2., 0.5, 0.], [0.5, 1., 0.2], [0., 0.2, 0.5]])
+
+
+def test_factorized_covariance(covariance):
+    factorized = FactorizedCovariance(covariance)
+    np.testing.assert_array_equal(factorized.covariance, covariance)
+    np.testing.assert_array_almost_equal(
+        np.dot(factorized.cholesky, factorized.cholesky.T), covariance)
+    assert np.allclose(np.triu(factorized.cholesky, 1), 0.)
+    assert factorized.log_det == pytest.approx(
+        np.log(np.linalg.det(covariance)))
+    assert factorized.dim == 3
+
+
+def test_factorized_covariance_is_picklable(covariance):
+    factorized = pickle.loads(pickle.dumps(FactorizedCovariance(covariance)))
+    np.testing.assert_array_almost_equal(
+        np.dot(factorized.cholesky, factorized.cholesky.T), covariance)
+
+
+def test_not_positive_definite():
+    with pytest.raises(np.linalg.LinAlgError):
+        FactorizedCovariance(np.ones((2, 2)))
+
+
+def test_factorize(covariance):
+    factorized = FactorizedCovariance(covariance)
+    assert factorize(factorized) is factorized
+    np.testing.assert_array_equal(factorize(covariance).cholesky,
+                                  factorized.cholesky)
+
+
+def test_factorize_step_covariance_falls_back_to_identity():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        factorized = factorize_step_covariance(np.ones((2, 2)))
+    assert len(caught) == 1
+    np.testing.assert_array_equal(factorized.covariance, np.eye(2))
+    np.testing.assert_array_equal(factorized.cholesky, np.eye(2))
+    assert factorized.log_det == 0.
+
+
+def test_scaled(covariance):
+    factorized = FactorizedCovariance(covariance)
+    scaled = factorized.scaled(2.)
+    expected = FactorizedCovariance(covariance * 4.)
+    np.testing.assert_array_almost_equal(scaled.covariance,
+                                         expected.covariance)
+    np.testing.assert_array_almost_equal(scaled.cholesky, expected.cholesky)
+    assert scaled.log_det == pytest.approx(expected.log_det)
+    np.testing.assert_array_equal(factorized.covariance, covariance)
+    with pytest.raises(ValueError):
+        factorized.scaled(0.)
@@ -0,0 +1,66 @@
+import numpy as np
+import pymc
+import pytest
+from smcpy.mcmc.gaussian_likelihood import GaussianLikelihood
+
+
+@pytest.fixture
+def data():
+    return np.array([1., 2., 3.])
+
+
+def test_log_likelihood_exact_fit(data):
+    likelihood = GaussianLikelihood(data)
+    log_like = likelihood.compute_log_likelihood(np.tile(data, (2, 1)), 1.)
+    np.testing.assert_array_equal(log_like, [-1.5 * np.log(2 * np.pi)] * 2)
+
+
+def test_log_likelihood_per_sample_std_dev(data):
+    likelihood = GaussianLikelihood(data)
+    outputs = np.array([[1., 2., 4.], [0., 2., 3.]])
+    std_devs = np.array([0.5, 2.])
+    expected = [-1.5 * np.log(2 * np.pi * s**2) - 0.5 / s**2
+                for s in std_devs]
+    log_like = likelihood.compute_log_likelihood(outputs, std_devs)
+    np.testing.assert_array_almost_equal(log_like, expected)
+
+
+def test_max_log_likelihood_is_exact_fit(data):
+    likelihood = GaussianLikelihood(data)
+    std_devs = np.array([0.5, 2.])
+    outputs = np.tile(data + 0.1, (2, 1))
+    max_log_likes = likelihood.compute_max_log_likelihood(std_devs)
+    np.testing.assert_array_almost_equal(
+        max_log_likes, likelihood.compute_log_likelihood(np.tile(data, (2, 1)),
+                                                         std_devs))
+    assert np.all(likelihood.compute_log_likelihood(outputs, std_devs) <
+                  max_log_likes)
+
+
+def test_log_likelihood_matches_pymc(data):
+    outputs = np.array([[1.5, 2., 2.], [0., 1., 3.]])
+    std_devs = np.array([0.5, 2.])
+    log_like = GaussianLikelihood(data).compute_log_likelihood(outputs,
+                                                               std_devs)
+    for output, std_dev, value in zip(outputs, std_devs, log_like):
+        results = pymc.Normal('results', mu=output, tau=1. / std_dev**2,
+                              value=data, observed=True)
+        assert value == pytest.approx(results.logp)
+
+
+def test_sum_of_squares_is_exact_near_fit():
+    data = np.tile(1e4, 10)
+    likelihood = GaussianLikelihood(data)
+    ssq = likelihood.compute_sum_of_squares(data + 1e-4)
+    assert likelihood.num_data == 10
+    assert ssq[0] == pytest.approx(1e-7)
+
+
+def test_mcmc_sampler_reuses_likelihood(mcmc_obj):
+    likelihood = mcmc_obj.get_likelihood()
+    assert mcmc_obj.get_likelihood() is likelihood
+    mcmc_obj.data = np.array([1., 2., 3.])
+    new_likelihood = mcmc_obj.get_likelihood()
+    assert new_likelihood is not likelihood
+    assert new_likelihood.compute_log_likelihood([[1., 2., 3.]], 1.)[0] == \
+        pytest.approx(-1.5 * np.log(2 * np.pi))
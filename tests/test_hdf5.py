@@ -10,21 +10,22 @@ from smcpy.particles.particle import Particle
 def test_write_particle(h5file, particle):
     h5file.write_particle(particle, step_index=1, particle_index=1)
     f = h5py.File('temp.hdf5', 'r')
-    assert np.array(f.get('steps/step_001/particle_1/log_weight')) == 0.2
+    assert np.array(f.get('steps/step_001/log_weights'))[1] == 0.2
     os.remove('temp.hdf5')
 
 
 def test_write_step(h5file, filled_step):
     h5file.write_step(filled_step, 1)
     f = h5py.File('temp.hdf5', 'r')
-    assert np.array(f.get('steps/step_001/particle_1/log_weight')) == 0.2
+    assert np.array(f.get('steps/step_001/log_weights'))[1] == 0.2
+    assert f.get('steps/step_001/params').shape == (5, 2)
     os.remove('temp.hdf5')
 
 
 def test_write_step_list(h5file, step_list):
     h5file.write_step_list(step_list)
     f = h5py.File('temp.hdf5', 'r')
-    assert np.array(f.get('steps/step_001/particle_0/log_weight')) == 0.2
+    assert np.array(f.get('steps/step_001/log_weights'))[0] == 0.2
     os.remove('temp.hdf5')
 
 
@@ -69,3 +70,90 @@ def test_create_step_group(h5file):
     h5file._create_step_group(1)
     assert h5file._h5.keys() == ['steps']
     os.remove('temp.hdf5')
+
+
+def test_step_temperature_round_trip(h5file, filled_step):
+    filled_step.set_temperature(0.25)
+    h5file.write_step(filled_step, 1)
+    step = h5file.read_step(step_index=1)
+    assert step.get_temperature() == 0.25
+    os.remove('temp.hdf5')
+
+
+@pytest.fixture
+def legacy_h5file():
+    return HDF5Storage('legacy.hdf5', 'w', format_version=1)
+
+
+def test_format_version(h5file, legacy_h5file):
+    assert h5file.get_format_version() == 2
+    assert legacy_h5file.get_format_version() == 1
+    os.remove('temp.hdf5')
+    os.remove('legacy.hdf5')
+
+
+def test_invalid_format_version():
+    with pytest.raises(ValueError):
+        HDF5Storage('invalid.hdf5', 'w', format_version=3)
+    assert not os.path.exists('invalid.hdf5')
+
+
+def test_invalid_format_version_keeps_existing_file(filled_step):
+    h5file = HDF5Storage('existing.hdf5', 'w')
+    h5file.write_step(filled_step, 1)
+    h5file.close()
+    with pytest.raises(ValueError):
+        HDF5Storage('existing.hdf5', 'w', format_version=3)
+    h5file = HDF5Storage('existing.hdf5', 'r')
+    assert h5file.get_num_steps() == 1
+    h5file.close()
+    os.remove('existing.hdf5')
+
+
+def test_write_legacy_step(legacy_h5file, filled_step):
+    legacy_h5file.write_step(filled_step, 1)
+    legacy_h5file.close()
+    f = h5py.File('legacy.hdf5', 'r')
+    assert np.array(f.get('steps/step_001/particle_1/log_weight')) == 0.2
+    assert 'format_version' not in f.attrs
+    os.remove('legacy.hdf5')
+
+
+def test_read_legacy_step_list(legacy_h5file, step_list):
+    legacy_h5file.write_step_list(step_list)
+    legacy_h5file.close()
+    h5file = HDF5Storage('legacy.hdf5', 'r')
+    read_steps = h5file.read_step_list()
+    assert h5file.get_format_version() == 1
+    assert h5file.get_num_particles_in_step(1) == 5
+    for step, read_step in zip(step_list, read_steps):
+        assert read_step.get_mean() == step.get_mean()
+        np.testing.assert_array_equal(read_step.get_log_likes(),
+                                      step.get_log_likes())
+    os.remove('legacy.hdf5')
+
+
+def test_step_round_trip_with_compression(linear_step):
+    h5file = HDF5Storage('compressed.hdf5', 'w', compression='gzip')
+    h5file.write_step(linear_step, 1)
+    h5file.close()
+    h5file = HDF5Storage('compressed.hdf5', 'r')
+    step = h5file.read_step(1)
+    expected = linear_step.get_particle_array()
+    assert step.get_param_names() == list(expected.param_names)
+    np.testing.assert_array_equal(step.get_particle_array().params,
+                                  expected.params)
+    np.testing.assert_array_equal(step.get_log_weights(),
+                                  expected.log_weights)
+    h5file.close()
+    os.remove('compressed.hdf5')
+
+
+def test_write_particles_individually(h5file, particle_list):
+    for particle_index, particle in enumerate(particle_list):
+        h5file.write_particle(particle, 2, particle_index)
+    assert h5file.get_num_particles_in_step(2) == len(particle_list)
+    particle = h5file.read_particle(2, 3)
+    assert particle.params == particle_list[3].params
+    assert particle.log_like == particle_list[3].log_like
+    os.remove('temp.hdf5')
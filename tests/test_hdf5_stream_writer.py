@@ -0,0 +1,73 @@
+import numpy as np
+import os
+import pytest
+from smcpy.hdf5.hdf5_storage import HDF5Storage
+from smcpy.hdf5.hdf5_stream_writer import HDF5StreamWriter
+
+
+@pytest.fixture
+def stream_writer():
+    return HDF5StreamWriter('stream.hdf5', mode='w')
+
+
+def test_write_step_list(stream_writer, step_list):
+    stream_writer.write_step_list(step_list)
+    stream_writer.close()
+    h5file = HDF5Storage('stream.hdf5', 'r')
+    assert h5file.get_num_steps() == len(step_list)
+    np.testing.assert_array_equal(h5file.read_step(2).get_log_weights(),
+                                  step_list[1].get_log_weights())
+    h5file.close()
+    os.remove('stream.hdf5')
+
+
+def test_write_step_list_skips_stored_steps(stream_writer, step_list):
+    stream_writer.write_step_list(step_list)
+    stream_writer.close()
+    stored_log_likes = step_list[0].get_log_likes()
+    step_list[0].get_particle_array().set_log_likes(np.zeros(5))
+    stream_writer = HDF5StreamWriter('stream.hdf5', mode='a')
+    stream_writer.write_step_list(step_list[:2])
+    stream_writer.close()
+    h5file = HDF5Storage('stream.hdf5', 'r')
+    assert h5file.get_step_indices() == [1, 2]
+    np.testing.assert_array_equal(h5file.read_step(1).get_log_likes(),
+                                  stored_log_likes)
+    h5file.close()
+    os.remove('stream.hdf5')
+
+
+def test_written_step_isolated_from_live_step(stream_writer, filled_step):
+    expected_log_likes = filled_step.get_log_likes()
+    stream_writer.write_step(filled_step, 1)
+    filled_step.get_particle_array().set_log_likes(np.zeros(5))
+    stream_writer.close()
+    h5file = HDF5Storage('stream.hdf5', 'r')
+    np.testing.assert_array_equal(h5file.read_step(1).get_log_likes(),
+                                  expected_log_likes)
+    h5file.close()
+    os.remove('stream.hdf5')
+
+
+def test_flush_writes_queued_steps(stream_writer, filled_step):
+    stream_writer.write_step(filled_step, 1)
+    stream_writer.flush()
+    assert stream_writer._storage.get_num_steps() == 1
+    stream_writer.close()
+    os.remove('stream.hdf5')
+
+
+def test_write_error_raised_on_flush(stream_writer, filled_step):
+    stream_writer.write_step(filled_step, 1)
+    stream_writer.write_step(filled_step, 1)
+    with pytest.raises(ValueError):
+        stream_writer.flush()
+    stream_writer.close()
+    os.remove('stream.hdf5')
+
+
+def test_write_after_close(stream_writer, filled_step):
+    stream_writer.close()
+    with pytest.raises(ValueError):
+        stream_writer.write_step(filled_step, 1)
+    os.remove('stream.hdf5')
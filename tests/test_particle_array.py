@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+from smcpy.particles.particle import Particle
+from smcpy.particles.particle_array import ParticleArray
+
+arr_alm_eq = np.testing.assert_array_almost_equal
+
+
+@pytest.fixture
+def particle_array(mixed_particle_list):
+    return ParticleArray.from_particles(mixed_particle_list)
+
+
+def test_from_particles_shapes(particle_array):
+    assert len(particle_array) == 5
+    assert particle_array.params.shape == (5, 2)
+    assert particle_array.params.dtype == np.float64
+    assert sorted(particle_array.param_names) == ['a', 'b']
+
+
+def test_from_particles_values(particle_array):
+    a = particle_array.params[:, particle_array.get_param_index('a')]
+    arr_alm_eq(a, [1, 1, 1, 2, 2])
+    arr_alm_eq(particle_array.log_weights, [-0.2] * 5)
+    arr_alm_eq(particle_array.log_likes, [-0.2] * 5)
+
+
+def test_from_particles_mismatched_keys():
+    particles = [Particle({'a': 1}, 0., 0.), Particle({'b': 1}, 0., 0.)]
+    with pytest.raises(ValueError):
+        ParticleArray.from_particles(particles)
+
+
+def test_bad_column_length():
+    with pytest.raises(ValueError):
+        ParticleArray(['a'], np.ones((3, 1)), [0., 0.], [0., 0., 0.])
+
+
+def test_take(particle_array):
+    taken = particle_array.take([3, 3, 0])
+    assert len(taken) == 3
+    assert taken.get_param_dict(0) == {'a': 2., 'b': 4.}
+    assert taken.get_param_dict(2) == {'a': 1., 'b': 2.}
+
+
+def test_copy_is_independent(particle_array):
+    copied = particle_array.copy()
+    copied.set_log_weight(0, 5.)
+    assert particle_array.log_weights[0] == -0.2
+
+
+def test_particle_view_reads_row(particle_array):
+    particle = particle_array.get_particle(3)
+    assert particle.is_view()
+    assert particle.params == {'a': 2., 'b': 4.}
+    assert particle.log_weight == -0.2
+
+
+def test_particle_view_writes_through(particle_array):
+    particle = particle_array.get_particle(1)
+    particle.log_weight = 1.5
+    particle.log_like = -3.
+    particle.params = {'a': 7., 'b': 8.}
+    assert particle_array.log_weights[1] == 1.5
+    assert particle_array.log_likes[1] == -3.
+    assert particle_array.get_param_dict(1) == {'a': 7., 'b': 8.}
+
+
+def test_particle_view_detaches_on_new_keys(particle_array):
+    particle = particle_array.get_particle(0)
+    particle.params = {'c': 1.}
+    assert not particle.is_view()
+    assert particle.params == {'c': 1.}
+    assert particle.log_like == -0.2
+    assert particle_array.get_param_dict(0) == {'a': 1., 'b': 2.}
+
+
+def test_particle_view_copy_owns_values(particle_array):
+    particle = particle_array.get_particle(0).copy()
+    assert not particle.is_view()
+    particle.log_weight = 3.
+    assert particle_array.log_weights[0] == -0.2
+
+
+def test_exposed_arrays_are_read_only(particle_array):
+    with pytest.raises(ValueError):
+        particle_array.log_weights[0] = 1.
+
+
+def test_setters_increment_version(particle_array):
+    version = particle_array.get_version()
+    particle_array.set_log_like(0, -1.)
+    assert particle_array.get_version() == version + 1
+
+
+def test_snapshot_shares_arrays(particle_array):
+    snapshot = particle_array.snapshot()
+    assert all(particle_array.shares_memory_with(snapshot).values())
+
+
+def test_snapshot_copy_on_write(particle_array):
+    snapshot = particle_array.snapshot()
+    particle_array.set_log_weight(0, 1.)
+    shared = particle_array.shares_memory_with(snapshot)
+    assert shared == {'params': True, 'log_weights': False, 'log_likes': True}
+    assert snapshot.log_weights[0] == -0.2
+    assert particle_array.log_weights[0] == 1.
+
+
+def test_snapshot_write_does_not_affect_original(particle_array):
+    snapshot = particle_array.snapshot()
+    snapshot.set_param_dict(0, {'a': 9., 'b': 9.})
+    assert particle_array.get_param_dict(0) == {'a': 1., 'b': 2.}
+
+
+def test_reorder_params(particle_array):
+    names = list(reversed(particle_array.param_names))
+    reordered = particle_array.reorder_params(names)
+    assert reordered.param_names == tuple(names)
+    np.testing.assert_array_equal(reordered.params,
+                                  particle_array.params[:, ::-1])
+    assert particle_array.reorder_params(particle_array.param_names) is \
+        particle_array
+
+
+def test_reorder_params_mismatch(particle_array):
+    with pytest.raises(ValueError):
+        particle_array.reorder_params(['a', 'c'])
+
+
+def test_concatenate(particle_array):
+    names = list(reversed(particle_array.param_names))
+    parts = [particle_array.take([0, 1]),
+             particle_array.take([2, 3, 4]).reorder_params(names)]
+    stacked = ParticleArray.concatenate(parts)
+    assert stacked.param_names == particle_array.param_names
+    np.testing.assert_array_equal(stacked.params, particle_array.params)
+    np.testing.assert_array_equal(stacked.log_likes, particle_array.log_likes)
+
+
+def test_append(particle_array):
+    params = particle_array.params
+    for i in range(20):
+        particle_array.append({'a': i, 'b': -i}, -0.1, -0.3)
+    assert len(particle_array) == 25
+    assert particle_array.get_param_dict(24) == {'a': 19., 'b': -19.}
+    arr_alm_eq(particle_array.log_weights[5:], [-0.1] * 20)
+    arr_alm_eq(particle_array.log_likes[5:], [-0.3] * 20)
+    arr_alm_eq(particle_array.params[:5], params)
+    with pytest.raises(ValueError):
+        particle_array.append({'a': 1.}, 0., 0.)
+
+
+def test_append_does_not_affect_snapshot(particle_array):
+    particle_array.append({'a': 3., 'b': 6.}, -0.2, -0.2)
+    snapshot = particle_array.snapshot()
+    particle_array.append({'a': 4., 'b': 8.}, -0.2, -0.2)
+    snapshot.append({'a': 5., 'b': 10.}, -0.2, -0.2)
+    assert particle_array.get_param_dict(6) == {'a': 4., 'b': 8.}
+    assert snapshot.get_param_dict(6) == {'a': 5., 'b': 10.}
+
+
+def test_particle_view_params_are_read_only(particle_array):
+    particle = particle_array.get_particle(1)
+    with pytest.raises(TypeError):
+        particle.params['a'] = 10.
+    params = dict(particle.params, a=10.)
+    particle.params = params
+    assert particle_array.get_param_dict(1)['a'] == 10.
+    assert type(particle.copy().params) is dict
@@ -1,5 +1,9 @@
+import numpy as np
 import pytest
+from smcpy.particles.particle_array import ParticleArray
 from smcpy.particles.particle_distributor import ParticleDistributor
+from smcpy.utils.single_rank_comm import SingleRankComm
+from thread_comm import run_on_ranks
 
 @pytest.fixture(scope='module')
 def comm():
@@ -35,3 +39,53 @@ def test_partition_particles(particle_distributor, size):
 def test_partition_and_scatter_particles(particle_distributor):
     particles = particle_distributor.partition_and_scatter_particles()
     assert len(particles)
+
+
+def test_scatter_and_gather_particle_array_single_rank(linear_step):
+    distributor = ParticleDistributor(linear_step, SingleRankComm())
+    local = distributor.scatter_particle_array()
+    gathered = distributor.gather_particle_array(local)
+    expected = linear_step.get_particle_array()
+    np.testing.assert_array_equal(gathered.params, expected.params)
+    np.testing.assert_array_equal(gathered.log_weights, expected.log_weights)
+
+
+@pytest.mark.parametrize('num_ranks', [2, 3])
+def test_scatter_and_gather_particle_array_multi_rank(linear_step,
+                                                      num_ranks):
+    expected = linear_step.get_particle_array()
+
+    def distribute(comm):
+        step = linear_step if comm.Get_rank() == 0 else None
+        distributor = ParticleDistributor(step, comm)
+        local = distributor.scatter_particle_array()
+        local_size = len(local)
+        local.set_log_likes(local.log_likes + 1.)
+        return local_size, distributor.gather_particle_array(local)
+
+    results = run_on_ranks(num_ranks, distribute)
+    local_sizes = [local_size for local_size, _ in results]
+    assert list(local_sizes) == \
+        [len(part) for part in np.array_split(range(20), num_ranks)]
+    gathered = results[0][1]
+    assert all(result[1] is None for result in results[1:])
+    np.testing.assert_array_equal(gathered.params, expected.params)
+    np.testing.assert_array_equal(gathered.log_likes, expected.log_likes + 1.)
+
+
+def test_gather_reorders_local_columns():
+
+    def gather(comm):
+        names = ['a', 'b'] if comm.Get_rank() == 0 else ['b', 'a']
+        local = ParticleArray(names, [[comm.Get_rank(), 10.]], [0.], [0.])
+        distributor = ParticleDistributor(None, comm)
+        return distributor.gather_particle_array(local)
+
+    gathered = run_on_ranks(2, gather)[0]
+    assert gathered.param_names == ('a', 'b')
+    np.testing.assert_array_equal(gathered.params, [[0., 10.], [10., 1.]])
+
+
+def test_get_partition_counts(particle_distributor, size):
+    counts = particle_distributor.get_partition_counts(7)
+    assert sum(counts) == 7 and len(counts) == size
@@ -1,5 +1,6 @@
 import numpy as np
 import pytest
+from scipy.stats import norm
 
 
 def test_initialize_particles_from_prior_fixed_std(part_initer):
@@ -49,3 +50,33 @@ def test_initialize_particles_with_proposals(part_initer):
     with pytest.raises(Exception):
         particles = part_initer.initialize_particles(num_particles=5,
                                                      measurement_std_dev=1.0)
+
+
+@pytest.mark.parametrize('m_std,expected_names',
+                         [(1.0, ['a', 'b']), (None, ['a', 'b', 'std_dev'])])
+def test_initialize_particle_array(part_initer, m_std, expected_names):
+    particle_array = part_initer.initialize_particle_array(
+        measurement_std_dev=m_std, num_particles=50)
+    assert len(particle_array) == 50
+    assert list(particle_array.param_names) == expected_names
+    assert np.all((particle_array.params[:, :2] >= 0.) &
+                  (particle_array.params[:, :2] <= 1.))
+    if m_std is not None:
+        np.testing.assert_array_almost_equal(
+            particle_array.log_likes, [-3. / 2 * np.log(2 * np.pi)] * 50)
+    np.testing.assert_array_equal(particle_array.log_weights,
+                                  particle_array.log_likes)
+
+
+def test_initialize_particle_array_with_proposals(part_initer):
+    proposal_center = {'a': 0.5, 'b': 0.5}
+    proposal_scales = {'a': 0.01, 'b': 0.02}
+    part_initer.set_proposal_distribution(proposal_center, proposal_scales)
+    particle_array = part_initer.initialize_particle_array(
+        measurement_std_dev=1.0, num_particles=20)
+    params = particle_array.params
+    prop_logp = norm.logpdf(params[:, 0], 0.5, 0.01) + \
+        norm.logpdf(params[:, 1], 0.5, 0.02)
+    expected_weights = particle_array.log_likes - prop_logp
+    np.testing.assert_array_almost_equal(particle_array.log_weights,
+                                         expected_weights)
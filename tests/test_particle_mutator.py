@@ -1,2 +1,321 @@
-def test_mutate_new_particles():
-    pass
+import numpy as np
+import pytest
+from scipy.stats import norm
+from smcpy.mcmc.gaussian_likelihood import GaussianLikelihood
+from smcpy.mcmc.mcmc_sampler import MCMCSampler
+from smcpy.mcmc.smc_kernel import SMCMetropolisKernel
+from smcpy.model.base_model import BaseModel
+from smcpy.particles.particle import Particle
+from smcpy.particles.particle_mutator import ParticleMutator
+from smcpy.smc.smc_step import SMCStep
+from smcpy.utils.single_rank_comm import SingleRankComm
+from thread_comm import run_on_ranks
+
+
+@pytest.fixture
+def in_support_step():
+    np.random.seed(0)
+    log_like = -1.5 * np.log(2 * np.pi)
+    particles = [Particle({'a': a, 'b': b}, 0., log_like)
+                 for a, b in np.random.uniform(0, 1, (5, 2))]
+    step = SMCStep()
+    step.set_particles(particles)
+    return step
+
+
+class CountingModel(BaseModel):
+
+    def __init__(self):
+        self.num_evaluations = 0
+
+    def evaluate(self, *args, **kwargs):
+        params = self.process_args(args, kwargs)
+        self.num_evaluations += 1
+        return np.array([params['a'], params['b'], params['a'] * params['b']])
+
+
+def make_counting_step(measurement_std_dev, log_likes=None):
+    np.random.seed(0)
+    model = CountingModel()
+    data = np.array([0.5, 0.5, 0.25])
+    param_priors = {'a': ['Normal', 0.5, 1.], 'b': ['Uniform', 0., 1.]}
+    mcmc = MCMCSampler(data, model, param_priors, storage_backend='ram')
+    likelihood = GaussianLikelihood(data)
+    params = np.random.uniform(0.2, 0.8, (4, 3))
+    params[:, 2] = 0.5
+    param_names = ['a', 'b', 'std_dev']
+    if measurement_std_dev is not None:
+        params, param_names = params[:, :2], param_names[:2]
+    outputs = np.column_stack((params[:, 0], params[:, 1],
+                               params[:, 0] * params[:, 1]))
+    if log_likes is None:
+        log_likes = likelihood.compute_log_likelihood(outputs, 0.5)
+    step = SMCStep()
+    step.set_particles([Particle(dict(zip(param_names, row)), -np.log(4),
+                                 log_like)
+                        for row, log_like in zip(params, log_likes)])
+    return step, mcmc
+
+
+@pytest.mark.parametrize('measurement_std_dev,max_evaluations',
+                         [(0.5, 5), (None, 9)])
+def test_pymc_chains_start_from_stored_log_like(measurement_std_dev,
+                                                max_evaluations):
+    step, mcmc = make_counting_step(measurement_std_dev)
+    likelihood = mcmc.get_likelihood()
+    mutator = ParticleMutator(step, mcmc, num_mcmc_steps=1,
+                              mutation_kernel='pymc')
+    step = mutator.mutate_particles(measurement_std_dev, temperature=0.5)
+
+    # building the chain evaluates the first particle; all others are only
+    # evaluated at proposals (and after std_dev moves)
+    assert mcmc.model.num_evaluations <= max_evaluations
+    particle_array = step.get_particle_array()
+    a = particle_array.params[:, particle_array.get_param_index('a')]
+    b = particle_array.params[:, particle_array.get_param_index('b')]
+    if measurement_std_dev is None:
+        std_devs = particle_array.params[
+            :, particle_array.get_param_index('std_dev')]
+    else:
+        std_devs = measurement_std_dev
+    expected = likelihood.compute_log_likelihood(
+        np.column_stack((a, b, a * b)), std_devs)
+    np.testing.assert_array_almost_equal(particle_array.log_likes, expected)
+
+
+def test_pymc_kernel_stores_log_like_without_prior():
+    step, mcmc = make_counting_step(0.5)
+    mutator = ParticleMutator(step, mcmc, num_mcmc_steps=3,
+                              mutation_kernel='pymc')
+    particle_array = mutator.mutate_particles(
+        0.5, temperature=1.).get_particle_array()
+    params = particle_array.params
+    a = params[:, particle_array.get_param_index('a')]
+    b = params[:, particle_array.get_param_index('b')]
+    log_likes = mcmc.get_likelihood().compute_log_likelihood(
+        np.column_stack((a, b, a * b)), 0.5)
+    log_priors = norm.logpdf(a, 0.5, 1.)
+    np.testing.assert_array_almost_equal(particle_array.log_likes, log_likes)
+    assert not np.allclose(particle_array.log_likes, log_likes + log_priors)
+
+
+@pytest.mark.parametrize('kernel', ParticleMutator.available_kernels)
+def test_kernel_rejects_log_like_above_maximum(kernel):
+    max_log_like = GaussianLikelihood([0.5, 0.5, 0.25]).\
+        compute_max_log_likelihood(0.5)
+    step, mcmc = make_counting_step(0.5, log_likes=[max_log_like + 0.1] * 4)
+    mutator = ParticleMutator(step, mcmc, num_mcmc_steps=1,
+                              mutation_kernel=kernel)
+    with pytest.raises(ValueError):
+        mutator.mutate_particles(0.5, temperature=0.5)
+
+
+@pytest.mark.parametrize('kernel', ParticleMutator.available_kernels)
+def test_mutate_particles(in_support_step, mcmc_obj, kernel):
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=2,
+                              mpi_comm=SingleRankComm(),
+                              mutation_kernel=kernel)
+    step = mutator.mutate_particles(measurement_std_dev=1.,
+                                    temperature=0.5)
+    assert step.get_num_particles() == 5
+    assert 0 <= mutator._mutation_ratio <= 1
+
+
+@pytest.mark.parametrize('kernel', ParticleMutator.available_kernels)
+@pytest.mark.parametrize('load_balancing', ['static', 'dynamic'])
+def test_acceptance_rate_counts_parameter_proposals(monkeypatch, kernel,
+                                                    load_balancing):
+    step, mcmc = make_counting_step(None)
+    mutator = ParticleMutator(step, mcmc, num_mcmc_steps=3,
+                              mutation_kernel=kernel,
+                              load_balancing=load_balancing)
+    counts = []
+    mutate = SMCMetropolisKernel.mutate
+
+    def counting_mutate(kernel, *args, **kwargs):
+        particle_array = mutate(kernel, *args, **kwargs)
+        counts.append((kernel.num_accepted, kernel.num_proposed))
+        return particle_array
+
+    monkeypatch.setattr(SMCMetropolisKernel, 'mutate', counting_mutate)
+    mutator.mutate_particles(measurement_std_dev=None, temperature=0.5)
+    if kernel == 'native':
+        num_accepted, num_proposed = np.sum(counts, axis=0)
+    else:
+        # std_dev moves of the separate pymc.Metropolis step method are not
+        # counted
+        chain = mutator._pymc_chain
+        num_accepted, num_proposed = chain.num_accepted, chain.num_proposed
+    assert num_proposed == 4 * 3
+    assert mutator.acceptance_rate == float(num_accepted) / num_proposed
+
+
+def test_native_mutation_moves_particles_into_support(part_mutator):
+    log_likes = np.full(5, -1.5 * np.log(2 * np.pi))
+    part_mutator.step.get_particle_array().set_log_likes(log_likes)
+    step = part_mutator.mutate_particles(measurement_std_dev=1.,
+                                         temperature=1.)
+    b = step.get_params('b')
+    assert all((b[b != 2.] >= 0.) & (b[b != 2.] <= 1.))
+
+
+def test_unknown_mutation_kernel(filled_step, mcmc_obj):
+    with pytest.raises(ValueError):
+        ParticleMutator(filled_step, mcmc_obj, 1, mutation_kernel='bad')
+
+
+def test_native_kernel_falls_back_to_pymc_for_unsupported_priors(
+        filled_step, mcmc_obj):
+    mutator = ParticleMutator(filled_step, mcmc_obj, 1)
+    assert mutator._get_mutate_function() == \
+        mutator._mutate_with_native_kernel
+    mcmc_obj.params['b'] = ['KDE', np.ones(10), ['b']]
+    assert mutator._get_mutate_function() == mutator._mutate_with_pymc
+
+
+def test_mutate_particles_multi_rank(in_support_step, mcmc_obj):
+    expected_log_weights = in_support_step.get_log_weights()
+
+    def mutate(comm):
+        step = in_support_step if comm.Get_rank() == 0 else None
+        mutator = ParticleMutator(step, mcmc_obj, num_mcmc_steps=2,
+                                  mpi_comm=comm)
+        return mutator.mutate_particles(measurement_std_dev=1.,
+                                        temperature=0.5)
+
+    steps = run_on_ranks(2, mutate)
+    assert steps[1] is None
+    assert steps[0].get_num_particles() == 5
+    np.testing.assert_array_equal(steps[0].get_log_weights(),
+                                  expected_log_weights)
+
+
+def test_static_load_report(in_support_step, mcmc_obj):
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=1)
+    mutator.mutate_particles(measurement_std_dev=1., temperature=0.5)
+    assert len(mutator.load_report) == 1
+    assert mutator.load_report[0]['num_items'] == 5
+    assert mutator.load_report[0]['idle_time'] == 0.
+
+
+def test_dynamic_load_balancing_multi_rank(in_support_step, mcmc_obj):
+    expected_log_weights = in_support_step.get_log_weights()
+
+    def mutate(comm):
+        step = in_support_step if comm.Get_rank() == 0 else None
+        mutator = ParticleMutator(step, mcmc_obj, num_mcmc_steps=2,
+                                  mpi_comm=comm, load_balancing='dynamic')
+        step = mutator.mutate_particles(measurement_std_dev=1.,
+                                        temperature=0.5)
+        return (step, mutator.load_report, mutator._mutation_ratio,
+                mutator.acceptance_rate)
+
+    results = run_on_ranks(3, mutate)
+    step, load_report, ratio, acceptance_rate = results[0]
+    assert results[1][:2] == (None, None)
+    assert step.get_num_particles() == 5
+    np.testing.assert_array_equal(step.get_log_weights(),
+                                  expected_log_weights)
+    assert sum(report['num_items'] for report in load_report) == 5
+    assert 0 <= ratio <= 1
+    assert results[2][2] == ratio
+    assert 0 <= acceptance_rate <= 1
+    assert all(result[3] == acceptance_rate for result in results)
+
+
+def test_unknown_load_balancing(filled_step, mcmc_obj):
+    with pytest.raises(ValueError):
+        ParticleMutator(filled_step, mcmc_obj, 1, load_balancing='bad')
+
+
+def test_dynamic_load_balancing_not_distributed(filled_step, mcmc_obj):
+    with pytest.raises(ValueError):
+        ParticleMutator(filled_step, mcmc_obj, 1, distributed=True,
+                        load_balancing='dynamic')
+
+
+@pytest.mark.parametrize('kernel', ParticleMutator.available_kernels)
+def test_step_covariance_is_factorized_once(in_support_step, mcmc_obj,
+                                            monkeypatch, kernel):
+    num_factorizations = []
+    cholesky = np.linalg.cholesky
+
+    def counting_cholesky(matrix):
+        num_factorizations.append(1)
+        return cholesky(matrix)
+
+    monkeypatch.setattr(np.linalg, 'cholesky', counting_cholesky)
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=2,
+                              mutation_kernel=kernel)
+    mutator.mutate_particles(measurement_std_dev=1., temperature=0.5)
+    assert len(num_factorizations) == 1
+
+
+def test_proposal_scale(in_support_step, mcmc_obj, monkeypatch):
+    covariances = []
+    mutate = SMCMetropolisKernel.mutate
+
+    def recording_mutate(self, particle_array, covariance, *args):
+        covariances.append(covariance.covariance)
+        return mutate(self, particle_array, covariance, *args)
+
+    monkeypatch.setattr(SMCMetropolisKernel, 'mutate', recording_mutate)
+    expected = in_support_step.get_covariance() * 9.
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=2,
+                              proposal_scale=3.)
+    mutator.mutate_particles(measurement_std_dev=1., temperature=0.5)
+    np.testing.assert_array_almost_equal(covariances[0], expected)
+
+
+@pytest.mark.parametrize('kernel', ParticleMutator.available_kernels)
+def test_adaptive_mcmc_steps(in_support_step, mcmc_obj, kernel):
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=1,
+                              mutation_kernel=kernel,
+                              mcmc_step_control='adaptive',
+                              target_moved_fraction=1., max_mcmc_steps=6)
+    mutator.mutate_particles(measurement_std_dev=1., temperature=0.5)
+    assert 1 <= mutator.num_steps_taken <= 6
+    if mutator.num_steps_taken < 6:
+        assert mutator._mutation_ratio == 1.
+
+
+def test_adaptive_mcmc_steps_stop_at_cap(in_support_step, mcmc_obj):
+    covariance = in_support_step.get_factorized_covariance().scaled(1e6)
+    in_support_step.get_factorized_covariance = lambda: covariance
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=2,
+                              mcmc_step_control='adaptive', max_mcmc_steps=5)
+    mutator.mutate_particles(measurement_std_dev=1., temperature=0.5)
+    assert mutator.num_steps_taken == 5
+    assert mutator._mutation_ratio == 0.
+
+
+def test_adaptive_mcmc_steps_multi_rank(in_support_step, mcmc_obj):
+
+    def mutate(comm):
+        step = in_support_step if comm.Get_rank() == 0 else None
+        mutator = ParticleMutator(step, mcmc_obj, num_mcmc_steps=1,
+                                  mpi_comm=comm, mcmc_step_control='adaptive',
+                                  target_moved_fraction=1., max_mcmc_steps=8)
+        mutator.mutate_particles(measurement_std_dev=1.,
+                                 temperature=0.5)
+        return mutator.num_steps_taken, mutator._mutation_ratio
+
+    results = run_on_ranks(3, mutate)
+    assert results[1] == results[0] and results[2] == results[0]
+    num_steps_taken, ratio = results[0]
+    assert num_steps_taken == 8 or ratio == 1.
+
+
+def test_fixed_mcmc_steps(in_support_step, mcmc_obj):
+    mutator = ParticleMutator(in_support_step, mcmc_obj, num_mcmc_steps=3)
+    mutator.mutate_particles(measurement_std_dev=1., temperature=0.5)
+    assert mutator.num_steps_taken == 3
+
+
+@pytest.mark.parametrize('kwargs', [{'mcmc_step_control': 'bad'},
+                                    {'target_moved_fraction': 0.},
+                                    {'target_moved_fraction': 1.5},
+                                    {'max_mcmc_steps': 1}])
+def test_invalid_mcmc_step_control(filled_step, mcmc_obj, kwargs):
+    with pytest.raises(ValueError):
+        ParticleMutator(filled_step, mcmc_obj, 2, **kwargs)
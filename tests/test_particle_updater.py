@@ -1,3 +1,11 @@
+import numpy as np
+import pytest
+from smcpy.particles.particle_updater import ParticleUpdater
+from smcpy.smc.smc_step import SMCStep
+from smcpy.utils.single_rank_comm import SingleRankComm
+from thread_comm import run_on_ranks
+
+
 def test_update_log_weights(part_updater):
     temperature_step = 0.1
     exp_w = 0.2 - 0.2 * temperature_step
@@ -14,3 +22,73 @@ def test_resample_if_needed_no(part_updater):
 def test_resample_if_needed_yes(part_updater_high_ess_threshold):
     part_updater_high_ess_threshold.resample_if_needed()
     assert part_updater_high_ess_threshold._resample_status == "Resampling..."
+
+
+def test_resample_if_needed_with_scheme(part_updater_high_ess_threshold):
+    step = part_updater_high_ess_threshold.resample_if_needed('systematic')
+    assert part_updater_high_ess_threshold._resample_status == "Resampling..."
+    assert step.get_num_particles() == 5
+
+
+def test_compute_temperature_step_hits_target_ess(linear_step):
+    from smcpy.particles.particle_updater import _compute_conditional_ess
+    array = linear_step.get_particle_array()
+    array.set_log_likes(-np.arange(len(array), dtype=float) * 10.)
+    updater = ParticleUpdater(linear_step, 0, mpi_comm=SingleRankComm())
+    temperature_step = updater.compute_temperature_step(0.5, 1.)
+    ess = _compute_conditional_ess(array.log_weights, array.log_likes,
+                                   temperature_step)
+    assert 0 < temperature_step < 1
+    assert ess == pytest.approx(0.5 * len(array))
+
+
+def test_compute_temperature_step_returns_max_step(part_updater):
+    assert part_updater.compute_temperature_step(0.5, 0.3) == 0.3
+
+
+def _split_step(step, comm):
+    local_step = SMCStep()
+    particle_array = step.get_particle_array()
+    indices = np.array_split(range(len(particle_array)), comm.Get_size())
+    local_indices = indices[comm.Get_rank()]
+    local_step.set_particle_array(particle_array.take(local_indices))
+    return local_step
+
+
+def test_distributed_ess_and_temperature_step(linear_step):
+    array = linear_step.get_particle_array()
+    array.set_log_weights(np.linspace(-1., 1., len(array)))
+    array.set_log_likes(-np.arange(len(array), dtype=float))
+    serial = ParticleUpdater(linear_step.copy(), 0, SingleRankComm())
+    expected_ess = serial.compute_ess()
+    expected_step = serial.compute_temperature_step(0.5, 1.)
+
+    def compute(comm):
+        updater = ParticleUpdater(_split_step(linear_step, comm), 0, comm,
+                                  distributed=True)
+        ess = updater.compute_ess()
+        temperature_step = updater.compute_temperature_step(0.5, 1.)
+        weight_sum = np.sum(np.exp(updater.step.get_log_weights()))
+        return ess, temperature_step, weight_sum
+
+    results = run_on_ranks(3, compute)
+    for ess, temperature_step, _ in results:
+        assert ess == pytest.approx(expected_ess)
+        assert temperature_step == pytest.approx(expected_step)
+    assert sum(result[2] for result in results) == pytest.approx(1.)
+
+
+def test_distributed_resampling_keeps_particles_local(linear_step):
+
+    def resample(comm):
+        updater = ParticleUpdater(_split_step(linear_step, comm), 100, comm,
+                                  distributed=True)
+        step = updater.resample_if_needed('systematic')
+        return updater._resample_status, step.get_num_particles(), \
+            step.get_log_weights()
+
+    results = run_on_ranks(3, resample)
+    assert all(status == "Resampling..." for status, _, _ in results)
+    assert [num for _, num, _ in results] == [7, 7, 6]
+    for _, _, log_weights in results:
+        np.testing.assert_array_almost_equal(log_weights, np.log(1 / 20.))
@@ -0,0 +1,147 @@
+import numpy as np
+import pickle
+import pymc
+import pytest
+from smcpy.priors.prior_distributions import JointPrior, Prior
+from smcpy.priors.prior_distributions import create_prior, is_supported
+from smcpy.priors.prior_distributions import UniformPrior, NormalPrior
+
+
+@pytest.mark.parametrize('prior,pymc_rv,value', [
+    (['Uniform', 0., 2.], pymc.Uniform('u', 0., 2.), 0.5),
+    (['Normal', 1., 4.], pymc.Normal('n', mu=1., tau=1 / 4.), 2.),
+    (['TruncatedNormal', 1., 4., 0., 3.],
+     pymc.TruncatedNormal('t', mu=1., tau=1 / 4., a=0., b=3.), 2.),
+    (['DiscreteUniform', 1, 5], pymc.DiscreteUniform('d', 1, 5), 3)])
+def test_log_density_matches_pymc(prior, pymc_rv, value):
+    pymc_rv.value = value
+    log_density = JointPrior({'x': prior}, ['x']).logpdf([[value]])
+    assert log_density[0] == pytest.approx(pymc_rv.logp)
+
+
+@pytest.mark.parametrize('prior,value', [
+    (['Uniform', 0., 2.], 2.5),
+    (['TruncatedNormal', 1., 4., 0., 3.], -1.),
+    (['DiscreteUniform', 1, 5], 2.5)])
+def test_log_density_outside_support(prior, value):
+    log_density = JointPrior({'x': prior}, ['x']).logpdf([[value]])
+    assert log_density[0] == -np.inf
+
+
+def test_joint_log_density_is_vectorized():
+    priors = {'a': ['Uniform', 0., 2.], 'b': ['Normal', 0., 1.]}
+    params = np.array([[1., 0.], [1., 1.], [3., 0.]])
+    log_density = JointPrior(priors, ['a', 'b']).logpdf(params)
+    expected = -np.log(2.) - 0.5 * np.log(2 * np.pi) - \
+        0.5 * params[:, 1]**2
+    np.testing.assert_array_almost_equal(log_density[:2], expected[:2])
+    assert log_density[2] == -np.inf
+
+
+def test_unsupported_distribution():
+    with pytest.raises(KeyError):
+        JointPrior({'x': ['Bad', 0.]}, ['x'])
+
+
+@pytest.mark.parametrize('prior,mean,lower,upper', [
+    (['Uniform', 0., 2.], 1., 0., 2.),
+    (['Normal', 1., 4.], 1., -np.inf, np.inf),
+    (['TruncatedNormal', 1., 4., 1., 3.], 1.92, 1., 3.),
+    (['DiscreteUniform', 1, 5], 3., 1, 5)])
+def test_sample_prior(prior, mean, lower, upper):
+    np.random.seed(0)
+    joint_prior = JointPrior({'x': prior, 'y': ['Uniform', 5., 6.]},
+                             ['x', 'y'])
+    samples = joint_prior.sample(20000)
+    assert samples.shape == (20000, 2)
+    assert np.all((samples[:, 0] >= lower) & (samples[:, 0] <= upper))
+    assert np.all((samples[:, 1] >= 5.) & (samples[:, 1] <= 6.))
+    assert np.mean(samples[:, 0]) == pytest.approx(mean, abs=0.05)
+
+
+def test_sample_prior_discrete_uniform_includes_upper_bound():
+    np.random.seed(0)
+    samples = JointPrior({'x': ['DiscreteUniform', 1, 3]}, ['x']).sample(1000)
+    assert sorted(np.unique(samples)) == [1., 2., 3.]
+
+
+def test_is_supported():
+    assert is_supported({'x': ['Uniform', 0., 1.], 'y': ['Normal', 0., 1.]})
+    assert not is_supported({'x': ['KDE', np.ones(10)]})
+
+
+@pytest.mark.parametrize('prior,bounds', [
+    (['Uniform', 0., 2.], (0., 2.)),
+    (['Normal', 1., 4.], (-np.inf, np.inf)),
+    (['TruncatedNormal', 1., 4., 0., 3.], (0., 3.)),
+    (['DiscreteUniform', 1, 5], (1, 5))])
+def test_create_prior(prior, bounds):
+    native_prior = create_prior(prior)
+    values = np.linspace(-1., 6., 15)
+    np.testing.assert_array_almost_equal(
+        native_prior.logpdf(values),
+        JointPrior({'x': prior}, ['x']).logpdf(values[:, None]))
+    assert native_prior.bounds == bounds
+    assert native_prior.is_discrete == (prior[0] == 'DiscreteUniform')
+
+
+def test_prior_is_abstract():
+
+    class IncompletePrior(Prior):
+
+        def sample(self, num_samples):
+            return np.zeros(num_samples)
+
+    class ZeroPrior(IncompletePrior):
+
+        def logpdf(self, values):
+            return np.where(np.asarray(values) == 0., 0., -np.inf)
+
+    with pytest.raises(TypeError):
+        Prior()
+    with pytest.raises(TypeError):
+        IncompletePrior()
+    assert ZeroPrior().bounds == (-np.inf, np.inf)
+
+
+def test_create_prior_returns_prior_instances_unchanged():
+    prior = UniformPrior(0., 1.)
+    assert create_prior(prior) is prior
+
+
+@pytest.mark.parametrize('prior', [['Uniform', 1., 0.], ['Normal', 0., 0.],
+                                   ['TruncatedNormal', 0., 1., 2., 1.]])
+def test_create_prior_invalid_arguments(prior):
+    with pytest.raises(ValueError):
+        create_prior(prior)
+
+
+def test_create_prior_unsupported_distribution():
+    with pytest.raises(KeyError):
+        create_prior(['KDE', np.ones(10)])
+
+
+def test_joint_prior():
+    param_priors = {'a': ['Uniform', 0., 2.], 'b': NormalPrior(0., 1.),
+                    'c': ['DiscreteUniform', 1, 3]}
+    joint_prior = JointPrior(param_priors, ['b', 'c', 'a'])
+    lower, upper = joint_prior.bounds
+    np.testing.assert_array_equal(lower, [-np.inf, 1., 0.])
+    np.testing.assert_array_equal(upper, [np.inf, 3., 2.])
+    np.testing.assert_array_equal(joint_prior.is_discrete,
+                                  [False, True, False])
+    samples = joint_prior.sample(100)
+    assert samples.shape == (100, 3)
+    assert np.all(np.isfinite(joint_prior.logpdf(samples)))
+    assert joint_prior.logpdf([0., 2., 3.])[0] == -np.inf
+
+
+def test_joint_prior_is_picklable():
+    joint_prior = JointPrior({'a': ['Uniform', 0., 2.],
+                              'b': ['TruncatedNormal', 1., 4., 0., 3.]},
+                             ['a', 'b'])
+    params = np.array([[1., 1.], [0.5, 2.5]])
+    unpickled = pickle.loads(pickle.dumps(joint_prior))
+    assert unpickled.param_names == ['a', 'b']
+    np.testing.assert_array_equal(unpickled.logpdf(params),
+                                  joint_prior.logpdf(params))
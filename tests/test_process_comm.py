@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from smcpy.utils import mpi_ops
+from smcpy.utils.process_comm import ProcessPool
+
+
+def test_pool_size():
+    pool = ProcessPool(3)
+    assert pool.Get_size() == 3
+    assert pool.Get_rank() == 0
+
+
+def test_invalid_num_processes():
+    with pytest.raises(ValueError):
+        ProcessPool(0)
+
+
+def test_object_collectives():
+
+    def run(comm):
+        rank = comm.Get_rank()
+        values = comm.allgather(rank)
+        root_value = comm.bcast('root' if rank == 0 else None, root=0)
+        scattered = comm.scatter([10, 11, 12] if rank == 0 else None, root=0)
+        return comm.gather((values, root_value, scattered), root=0)
+
+    results = ProcessPool(3).run(run)
+    assert results == [([0, 1, 2], 'root', 10 + rank) for rank in range(3)]
+
+
+def test_buffer_collectives():
+
+    def run(comm):
+        rank = comm.Get_rank()
+        total = np.zeros(2)
+        comm.Allreduce(np.array([rank, 1.]), total, op=mpi_ops.SUM)
+        offset = np.zeros(1)
+        comm.Exscan(np.array([rank + 1.]), offset, op=mpi_ops.SUM)
+        counts, displacements = (1, 2), (0, 1)
+        local = np.empty(counts[rank])
+        sendbuf = [np.arange(3.), (counts, displacements)] if rank == 0 \
+            else None
+        comm.Scatterv(sendbuf, local, root=0)
+        gathered = np.zeros(3)
+        comm.Gatherv(local * 2, [gathered, (counts, displacements)], root=0)
+        return comm.gather((total, offset, local, gathered), root=0)
+
+    results = ProcessPool(2).run(run)
+    np.testing.assert_array_equal(results[0][0], [1., 2.])
+    np.testing.assert_array_equal(results[1][1], [1.])
+    np.testing.assert_array_equal(results[1][2], [1., 2.])
+    np.testing.assert_array_equal(results[0][3], [0., 2., 4.])
+
+
+def test_point_to_point():
+
+    def run(comm):
+        if comm.Get_rank() == 1:
+            comm.send('second', dest=0, tag=2)
+            comm.Send(np.arange(3.), dest=0, tag=1)
+            return None
+        buf = np.empty(3)
+        comm.Recv(buf, source=1, tag=1)
+        return buf, comm.recv(source=mpi_ops.ANY_SOURCE, tag=2)
+
+    buf, message = ProcessPool(2).run(run)
+    np.testing.assert_array_equal(buf, np.arange(3.))
+    assert message == 'second'
+
+
+def test_forked_ranks_draw_different_random_numbers():
+    np.random.seed(0)
+    draws = ProcessPool(2).run(lambda comm: comm.gather(np.random.rand()))
+    assert draws[0] != draws[1]
+
+
+def test_worker_error_raised_on_rank_0():
+
+    def run(comm):
+        if comm.Get_rank() == 1:
+            raise ValueError('bad rank')
+        return comm.bcast(None, root=1)
+
+    with pytest.raises(RuntimeError):
+        ProcessPool(2).run(run)
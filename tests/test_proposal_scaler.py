@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from smcpy.smc.proposal_scaler import ProposalScaler
+
+
+def mutation_ratio(acceptance, num_mcmc_steps):
+    return 1. - (1. - acceptance) ** num_mcmc_steps
+
+
+@pytest.mark.parametrize('num_mcmc_steps', [1, 5])
+def test_estimate_acceptance(num_mcmc_steps):
+    ratio = mutation_ratio(0.3, num_mcmc_steps)
+    assert ProposalScaler.estimate_acceptance(ratio, num_mcmc_steps) == \
+        pytest.approx(0.3)
+
+
+@pytest.mark.parametrize('acceptance,direction', [(0.234, 0), (0.6, 1),
+                                                  (0.05, -1)])
+def test_update(acceptance, direction):
+    scaler = ProposalScaler(target_acceptance=0.234, initial_scale=2.)
+    scale = scaler.update(mutation_ratio(acceptance, 3), 3)
+    assert scale == scaler.scale
+    assert np.sign(np.round(scale - 2., 10)) == direction
+
+
+def test_update_matches_gaussian_acceptance():
+    scaler = ProposalScaler(target_acceptance=0.3)
+    scaler.update(mutation_ratio(0.5, 1), 1)
+    # acceptance = 2 * Phi(-c * scale), so scale is proportional to
+    # Phi^-1(acceptance / 2)
+    assert scaler.scale == pytest.approx(-1.0364334 / -0.6744898, rel=1e-6)
+
+
+def test_update_uses_counted_acceptance_rate():
+    scaler = ProposalScaler(target_acceptance=0.3)
+    scaler.update(mutation_ratio(0.9, 1), 1, acceptance_rate=0.5)
+    assert scaler.scale == pytest.approx(-1.0364334 / -0.6744898, rel=1e-6)
+
+
+@pytest.mark.parametrize('ratio', [0., 1.])
+def test_update_is_bounded(ratio):
+    scaler = ProposalScaler()
+    scale = scaler.update(ratio, 2)
+    assert 0.1 <= scale <= 10.
+
+
+@pytest.mark.parametrize('target_acceptance,initial_scale', [(0., 1.),
+                                                             (1., 1.),
+                                                             (0.2, 0.)])
+def test_invalid_inputs(target_acceptance, initial_scale):
+    with pytest.raises(ValueError):
+        ProposalScaler(target_acceptance, initial_scale)
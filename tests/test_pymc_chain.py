@@ -0,0 +1,83 @@
+import numpy as np
+import pymc
+import pytest
+from smcpy.mcmc.gaussian_likelihood import GaussianLikelihood
+from smcpy.mcmc.mcmc_sampler import MCMCSampler
+from smcpy.mcmc.pymc_chain import PyMCChain
+from smcpy.model.base_model import BaseModel
+
+
+class LinearModel(BaseModel):
+
+    def __init__(self):
+        self.num_evaluations = 0
+
+    def evaluate(self, *args, **kwargs):
+        params = self.process_args(args, kwargs)
+        self.num_evaluations += 1
+        return np.array([params['a'], params['b'], params['a'] + params['b']])
+
+
+@pytest.fixture
+def mcmc():
+    data = np.array([0.5, 0.5, 1.])
+    param_priors = {'a': ['Normal', 0.5, 1.], 'b': ['Uniform', 0., 1.]}
+    return MCMCSampler(data, LinearModel(), param_priors,
+                       storage_backend='ram')
+
+
+def compute_log_like(mcmc, params, std_dev):
+    outputs = mcmc.model.evaluate(params)
+    return GaussianLikelihood(mcmc.data).compute_log_likelihood(outputs,
+                                                                std_dev)[0]
+
+
+@pytest.mark.parametrize('measurement_std_dev', [0.5, None])
+def test_chain_builds_one_model(mcmc, monkeypatch, measurement_std_dev):
+    np.random.seed(0)
+    num_builds = []
+    generate_pymc_model = MCMCSampler.generate_pymc_model
+
+    def counting_generate_pymc_model(self, *args, **kwargs):
+        num_builds.append(1)
+        return generate_pymc_model(self, *args, **kwargs)
+
+    monkeypatch.setattr(MCMCSampler, 'generate_pymc_model',
+                        counting_generate_pymc_model)
+    chain = PyMCChain(mcmc, np.eye(2) * 0.01, 0.5, measurement_std_dev)
+    for a, b in np.random.uniform(0.2, 0.8, (5, 2)):
+        params = {'a': a, 'b': b}
+        if measurement_std_dev is None:
+            params['std_dev'] = 0.5
+        new_params, log_like = chain.run(params, num_steps=3)
+        assert sorted(new_params.keys()) == sorted(params.keys())
+        std_dev = new_params.get('std_dev', measurement_std_dev)
+        assert log_like == pytest.approx(compute_log_like(mcmc, new_params,
+                                                          std_dev))
+    assert len(num_builds) == 1
+    assert mcmc.pymc_mod is None
+
+
+def test_chain_uses_known_log_like_at_starting_point(mcmc):
+    chain = PyMCChain(mcmc, np.eye(2) * 1e-12, 0.5, 0.5)
+    chain.run({'a': 0.2, 'b': 0.5}, num_steps=0)
+    for a in [0.3, 0.6]:
+        params = {'a': a, 'b': 0.5}
+        mcmc.model.num_evaluations = 0
+        new_params, log_like = chain.run(params, num_steps=0, log_like0=-7.)
+        assert mcmc.model.num_evaluations == 0
+        assert log_like == -7.
+        new_params, log_like = chain.run(params, num_steps=1, log_like0=-7.)
+        assert mcmc.model.num_evaluations == 1
+        if new_params == params:
+            assert log_like == -7.
+
+
+def test_std_dev_proposal_width_is_reset(mcmc):
+    chain = PyMCChain(mcmc, np.eye(2) * 0.01, 0.5)
+    chain.run({'a': 0.5, 'b': 0.5, 'std_dev': 0.1}, num_steps=1)
+    chain.run({'a': 0.5, 'b': 0.5, 'std_dev': 2.}, num_steps=0)
+    std_dev_steps = [step_method for step_method in chain._step_methods
+                     if isinstance(step_method, pymc.Metropolis)]
+    assert len(std_dev_steps) == 1
+    np.testing.assert_array_equal(std_dev_steps[0].proposal_sd, 2.)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from smcpy.smc.resampler import Resampler
+
+
+@pytest.fixture
+def weights():
+    return np.array([0.5, 0.25, 0.125, 0.125, 0.])
+
+
+@pytest.mark.parametrize('scheme', Resampler.available_schemes)
+def test_resample_indices_shape_and_range(scheme, weights):
+    np.random.seed(1)
+    indices = Resampler(scheme).resample_indices(weights)
+    assert indices.shape == (5,)
+    assert np.all((indices >= 0) & (indices < 4))
+
+
+@pytest.mark.parametrize('scheme', Resampler.available_schemes)
+def test_resample_indices_num_samples(scheme, weights):
+    indices = Resampler(scheme).resample_indices(weights, num_samples=16)
+    assert indices.shape == (16,)
+
+
+@pytest.mark.parametrize('scheme', ['systematic', 'residual'])
+def test_low_variance_schemes_exact_counts(scheme, weights):
+    indices = Resampler(scheme).resample_indices(weights, num_samples=8)
+    np.testing.assert_array_equal(np.bincount(indices, minlength=5),
+                                  [4, 2, 1, 1, 0])
+
+
+@pytest.mark.parametrize('scheme', Resampler.available_schemes)
+def test_resample_means_match_weights(scheme):
+    np.random.seed(2)
+    weights = np.random.uniform(0, 1, 10)
+    weights /= np.sum(weights)
+    indices = Resampler(scheme).resample_indices(weights, num_samples=100000)
+    frequencies = np.bincount(indices, minlength=10) / 100000.
+    np.testing.assert_array_almost_equal(frequencies, weights, decimal=2)
+
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError):
+        Resampler('bad')
+
+
+def test_unicode_scheme():
+    assert Resampler(u'Systematic').scheme == 'systematic'
+
+
+def test_non_string_scheme():
+    with pytest.raises(TypeError):
+        Resampler(1)
@@ -32,3 +32,28 @@ def test_raise_error_when_length_scatter_list_not_one(single_rank_comm):
 def test_gather(single_rank_comm):
     scatter_list = np.array([0, 1, 2, 3])
     array_equal(single_rank_comm.gather(scatter_list), [scatter_list])
+
+
+def test_bcast(single_rank_comm):
+    obj = {'a': 1.}
+    assert single_rank_comm.bcast(obj, root=0) is obj
+
+
+def test_scatterv_and_gatherv(single_rank_comm):
+    send = np.arange(6.).reshape(3, 2)
+    recv = np.empty((3, 2))
+    single_rank_comm.Scatterv([send, ([6], [0])], recv, root=0)
+    array_equal(recv, send)
+    gathered = np.empty(6)
+    single_rank_comm.Gatherv(recv, [gathered, ([6], [0])], root=0)
+    array_equal(gathered, send.ravel())
+
+
+def test_allgather(single_rank_comm):
+    assert single_rank_comm.allgather(1.) == [1.]
+
+
+def test_allreduce(single_rank_comm):
+    recv = np.empty(2)
+    single_rank_comm.Allreduce(np.array([1., 2.]), recv)
+    array_equal(recv, [1., 2.])
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+from smcpy.mcmc.mcmc_sampler import MCMCSampler
+from smcpy.mcmc.smc_kernel import SMCMetropolisKernel
+from smcpy.mcmc.step_methods import get_gamma_smc
+from smcpy.particles.particle_array import ParticleArray
+
+
+class LinearModel():
+
+    def __init__(self):
+        self.x = np.arange(5.)
+
+    def evaluate(self, params):
+        return params['a'] * self.x + params['b']
+
+
+def gaussian_log_like(model, params, data, std_dev):
+    residuals = data - model.evaluate(params)
+    return -0.5 * len(data) * np.log(2 * np.pi * std_dev**2) - \
+        0.5 * np.sum(residuals**2) / std_dev**2
+
+
+@pytest.fixture
+def model():
+    return LinearModel()
+
+
+@pytest.fixture
+def data(model):
+    return model.evaluate({'a': 0.5, 'b': 0.5})
+
+
+@pytest.fixture
+def priors():
+    return {'a': ['Uniform', 0., 1.], 'b': ['Uniform', 0., 1.]}
+
+
+@pytest.fixture
+def kernel(model, data, priors):
+    return SMCMetropolisKernel(model, data, priors, ['Uniform', 0., 1000.])
+
+
+def make_particle_array(model, data, names, params, std_devs):
+    log_likes = []
+    for row, std_dev in zip(params, std_devs):
+        param_dict = dict(zip(names, row))
+        log_likes.append(gaussian_log_like(model, param_dict, data, std_dev))
+    return ParticleArray(names, params, np.zeros(len(params)), log_likes)
+
+
+def test_mutate_keeps_log_likes_consistent(kernel, model, data):
+    np.random.seed(0)
+    params = np.random.uniform(0, 1, (20, 2))
+    particle_array = make_particle_array(model, data, ['a', 'b'], params,
+                                         [0.5] * 20)
+    mutated = kernel.mutate(particle_array, np.eye(2) * 0.01, 0.5, 3, 0.5)
+    for i in range(len(mutated)):
+        expected = gaussian_log_like(model, mutated.get_param_dict(i), data,
+                                     0.5)
+        assert mutated.log_likes[i] == pytest.approx(expected)
+    np.testing.assert_array_equal(mutated.log_weights,
+                                  particle_array.log_weights)
+    assert 0 < kernel.num_moved <= 20
+    assert kernel.num_moved == np.sum(kernel.moved)
+    np.testing.assert_array_equal(
+        kernel.moved, np.any(mutated.params != params, axis=1))
+    assert kernel.num_proposed == 60
+
+
+def test_mutate_rejects_outside_support(kernel, model, data):
+    params = np.tile([0.5, 0.5], (10, 1))
+    particle_array = make_particle_array(model, data, ['a', 'b'], params,
+                                         [0.5] * 10)
+    mutated = kernel.mutate(particle_array, np.eye(2) * 1e6, 1., 1, 0.5)
+    np.testing.assert_array_equal(mutated.params, params)
+    assert kernel.num_moved == 0
+
+
+def test_mutate_prior_when_phi_zero(kernel, model, data):
+    np.random.seed(1)
+    params = np.tile([0.5, 0.5], (2000, 1))
+    particle_array = make_particle_array(model, data, ['a', 'b'], params,
+                                         [0.5] * 2000)
+    mutated = kernel.mutate(particle_array, np.eye(2) * 0.1, 0., 20, 0.5)
+    np.testing.assert_array_almost_equal(np.var(mutated.params, axis=0),
+                                         [1 / 12.] * 2, decimal=2)
+
+
+def test_mutate_with_sampled_std_dev(kernel, model, data):
+    np.random.seed(2)
+    names = ['std_dev', 'b', 'a']
+    params = np.column_stack((np.tile(0.5, 10), np.random.uniform(0, 1, 10),
+                              np.random.uniform(0, 1, 10)))
+    particle_array = make_particle_array(model, data, names, params,
+                                         params[:, 0])
+    mutated = kernel.mutate(particle_array, np.eye(3) * 0.01, 1., 2)
+    for i in range(len(mutated)):
+        param_dict = mutated.get_param_dict(i)
+        expected = gaussian_log_like(model, param_dict, data,
+                                     param_dict['std_dev'])
+        assert mutated.log_likes[i] == pytest.approx(expected)
+
+
+class BatchLinearModel(LinearModel):
+
+    def __init__(self):
+        LinearModel.__init__(self)
+        self.num_batch_calls = 0
+
+    def evaluate_batch(self, param_matrix, param_names):
+        self.num_batch_calls += 1
+        a = param_matrix[:, param_names.index('a')]
+        b = param_matrix[:, param_names.index('b')]
+        return np.outer(a, self.x) + b[:, np.newaxis]
+
+
+def test_mutate_uses_evaluate_batch(data, priors):
+    np.random.seed(3)
+    model = BatchLinearModel()
+    kernel = SMCMetropolisKernel(model, data, priors, ['Uniform', 0., 1000.])
+    params = np.random.uniform(0.4, 0.6, (20, 2))
+    particle_array = make_particle_array(model, data, ['a', 'b'], params,
+                                         [0.5] * 20)
+    mutated = kernel.mutate(particle_array, np.eye(2) * 1e-4, 1., 3, 0.5)
+    assert model.num_batch_calls == 3
+    for i in range(len(mutated)):
+        expected = gaussian_log_like(model, mutated.get_param_dict(i), data,
+                                     0.5)
+        assert mutated.log_likes[i] == pytest.approx(expected)
+
+
+class KwargsLinearModel(LinearModel):
+
+    def evaluate(self, *args, **kwargs):
+        params = args[0] if args else kwargs
+        return LinearModel.evaluate(self, params)
+
+
+def test_target_matches_smc_metropolis(data):
+    np.random.seed(4)
+    model = KwargsLinearModel()
+    priors = {'a': ['Normal', 0.5, 1.],
+              'b': ['TruncatedNormal', 0.5, 1., 0., 1.]}
+    kernel = SMCMetropolisKernel(model, data, priors, ['Uniform', 0., 1000.])
+    mcmc = MCMCSampler(data, model, priors, storage_backend='ram')
+    names = ['a', 'b', 'std_dev']
+    params = np.random.uniform(0.1, 0.9, (5, 3))
+    phi = 0.3
+
+    kernel._setup_columns(names, None)
+    targets = kernel._compute_log_prior(params) + \
+        phi * kernel._compute_log_likelihood(params)
+    for row, target in zip(params, targets):
+        param_dict = dict(zip(names, row))
+        mcmc.generate_pymc_model(q0=param_dict, std_dev0=row[2])
+        nodes = dict(zip(mcmc.pymc_mod_order, mcmc.pymc_mod))
+        stochastics = [nodes[key] for key in names]
+        assert target == pytest.approx(
+            get_gamma_smc(stochastics, [nodes['results']], phi))
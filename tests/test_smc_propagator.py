@@ -1,3 +1,4 @@
+import numpy as np
 from numpy.testing import assert_array_almost_equal
 import pytest
 from smcpy.smc.smc_propagator import SMCPropagator
@@ -44,3 +45,40 @@ def test_smc_propagator_output_names_too_short(stub_model, filled_step):
     smc_propagator = SMCPropagator(stub_model, output_names)
     with pytest.raises(ValueError):
         smc_propagator.propagate(filled_step)
+
+
+class BatchStubModel(StubModel):
+
+    def __init__(self, expected_mean):
+        StubModel.__init__(self, expected_mean)
+        self.num_batch_calls = 0
+
+    def evaluate_batch(self, param_matrix, param_names):
+        self.num_batch_calls += 1
+        return [self.evaluate(None) for _ in param_matrix]
+
+
+def test_smc_propagator_uses_evaluate_batch(expected_mean, filled_step):
+    model = BatchStubModel(expected_mean)
+    smc_propagator = SMCPropagator(model)
+    prop_smc_step = smc_propagator.propagate(filled_step)
+    assert model.num_batch_calls == 1
+    assert prop_smc_step.get_num_particles() == filled_step.get_num_particles()
+
+
+def test_smc_propagator_does_not_modify_input_step(stub_model, filled_step):
+    expected_params = filled_step.get_particle_array().params.copy()
+    expected_log_weights = filled_step.get_log_weights()
+    prop_smc_step = SMCPropagator(stub_model).propagate(filled_step)
+    np.testing.assert_array_equal(filled_step.get_particle_array().params,
+                                  expected_params)
+    np.testing.assert_array_equal(prop_smc_step.get_log_weights(),
+                                  expected_log_weights)
+
+
+def test_smc_propagator_with_threads(stub_model, filled_step, expected_mean):
+    smc_propagator = SMCPropagator(stub_model, num_threads=2)
+    prop_smc_step = smc_propagator.propagate(filled_step)
+    expected = SMCPropagator(stub_model).propagate(filled_step)
+    np.testing.assert_array_equal(prop_smc_step.get_particle_array().params,
+                                  expected.get_particle_array().params)
@@ -1,7 +1,11 @@
 from smcpy.smc.smc_sampler import SMCSampler
 from smcpy.mcmc.mcmc_sampler import MCMCSampler
+from smcpy.model.threaded_model import ThreadedModel
 import h5py
+import numpy as np
 import os
+import pytest
+from thread_comm import run_on_ranks
 
 
 def test_setup_communicator():
@@ -9,6 +13,11 @@ def test_setup_communicator():
     assert size == 1 and my_rank == 0
 
 
+def test_setup_process_pool_communicator():
+    comm, size, my_rank = SMCSampler.setup_communicator(num_processes=3)
+    assert size == 3 and my_rank == 0
+
+
 def test_setup_mcmc_sampler(model):
     data = model.evaluate({'a': 0., 'b': 0.})
     param_priors = {'a': ['Uniform', 0., 1.], 'b': ['Uniform', 0., 1.]}
@@ -16,6 +25,11 @@ def test_setup_mcmc_sampler(model):
     assert isinstance(mcmc, MCMCSampler)
 
 
+def test_invalid_resampling_scheme(sampler):
+    with pytest.raises(ValueError):
+        sampler.resampling_scheme = 'bad'
+
+
 def test_autosaver(sampler):
     num_particles = 5
     num_time_steps = 3
@@ -30,6 +44,77 @@ def test_autosaver(sampler):
         assert len(group1_items) == num_time_steps - 1
 
 
+class FailingModel(object):
+
+    def __init__(self, max_evaluations):
+        self.max_evaluations = max_evaluations
+        self.num_evaluations = 0
+
+    def evaluate(self, *args, **kwargs):
+        self.num_evaluations += 1
+        if self.num_evaluations > self.max_evaluations:
+            raise RuntimeError('model failed')
+        return np.array([0., 0., 0.])
+
+
+def test_autosaver_keeps_steps_when_sampling_fails(tmpdir):
+    np.random.seed(0)
+    model = FailingModel(max_evaluations=25)
+    param_priors = {'a': ['Uniform', 0., 1.], 'b': ['Uniform', 0., 1.]}
+    sampler = SMCSampler(np.zeros(3), model, param_priors)
+    autosave_file = str(tmpdir.join('failed.hdf5'))
+    with pytest.raises(RuntimeError):
+        sampler.sample(10, 10, 1, 0.5, ess_threshold=5,
+                       autosave_file=autosave_file)
+    num_completed_steps = len(sampler._step_list)
+    assert num_completed_steps >= 2
+    with h5py.File(autosave_file, 'r') as hdf:
+        assert len(hdf['steps']) == num_completed_steps
+    with pytest.raises(ValueError):
+        sampler.autosaver.flush()
+
+
+def test_step_list_isolated_from_live_step(sampler):
+    step_list = sampler.sample(5, 3, 1, 0.5, ess_threshold=0)
+    assert len(step_list) == 2
+    sampler.step.get_particle_array().set_log_like(0, -1.)
+    assert step_list[-1].get_log_likes()[0] != -1.
+
+
+def test_adaptive_tempering_schedule(sampler):
+    np.random.seed(0)
+    step_list = sampler.sample(50, 20, 1, None, target_ess_fraction=0.5,
+                               autosave_file='adaptive.hdf5')
+    temperatures = [step.get_temperature() for step in step_list]
+    assert 1 < len(step_list) <= 19
+    assert temperatures[-1] == 1.
+    assert np.all(np.diff(temperatures) > 0)
+    assert sampler.temp_schedule == [0.] + temperatures
+    with h5py.File('adaptive.hdf5', 'r') as hdf:
+        saved = [hdf['steps'][name].attrs['temperature']
+                 for name in sorted(hdf['steps'].keys())]
+    np.testing.assert_array_equal(saved, temperatures)
+    os.remove('adaptive.hdf5')
+
+
+def test_adaptive_tempering_respects_max_time_steps(sampler):
+    np.random.seed(0)
+    step_list = sampler.sample(50, 3, 1, None, target_ess_fraction=0.99)
+    assert len(step_list) == 2
+    assert step_list[-1].get_temperature() == 1.
+
+
+def test_fixed_schedule_temperatures_recorded(sampler):
+    step_list = sampler.sample(5, 3, 1, 0.5)
+    assert [step.get_temperature() for step in step_list] == [0.5, 1.]
+
+
+@pytest.mark.parametrize('fraction', [0, 1, 'a'])
+def test_invalid_target_ess_fraction(sampler, fraction):
+    with pytest.raises((ValueError, TypeError)):
+        sampler.target_ess_fraction = fraction
+
+
 def test_load_step_list(sampler):
     num_time_steps = 3
     step_list = sampler.load_step_list('autosaver.hdf5')
@@ -59,3 +144,128 @@ def test_restart_sampling(sampler):
         assert len(group1_items) == restart_time_step - 1
     os.remove('autosaver.hdf5')
     os.remove('restart.hdf5')
+
+
+def test_restart_from_autosave_file(sampler, tmpdir):
+    autosave_file = str(tmpdir.join('autosave.hdf5'))
+    sampler.sample(5, 4, 1, 0.5, ess_threshold=0,
+                   autosave_file=autosave_file)
+    with h5py.File(autosave_file, 'r') as hdf:
+        first_step_log_likes = hdf['steps/step_001/log_likes'][...]
+    sampler.sample(5, 4, 1, 0.5, ess_threshold=0, restart_time_step=3,
+                   hdf5_to_load=autosave_file, autosave_file=autosave_file)
+    with h5py.File(autosave_file, 'r') as hdf:
+        assert sorted(hdf['steps'].keys()) == ['step_001', 'step_002']
+        np.testing.assert_array_equal(hdf['steps/step_001/log_likes'][...],
+                                      first_step_log_likes)
+
+
+def test_distributed_sampling(make_sampler):
+    def sample(comm):
+        sampler = make_sampler(comm)
+        step_list = sampler.sample(10, 4, 1, None, ess_threshold=10,
+                                   distributed=True)
+        return step_list, sampler.step.get_num_particles()
+
+    results = run_on_ranks(2, sample)
+    step_list = results[0][0]
+    assert len(step_list) == 3
+    assert results[1][0] == []
+    assert [local_size for _, local_size in results] == [5, 5]
+    for step in step_list:
+        assert step.get_num_particles() == 10
+        assert np.sum(np.exp(step.get_log_weights())) == pytest.approx(1.)
+
+
+def test_dynamic_load_balancing(make_sampler):
+    def sample(comm):
+        sampler = make_sampler(comm)
+        step_list = sampler.sample(10, 4, 1, None, ess_threshold=10,
+                                   load_balancing='dynamic')
+        return step_list, sampler.get_load_reports()
+
+    results = run_on_ranks(2, sample)
+    step_list, load_reports = results[0]
+    assert len(step_list) == 3
+    assert len(load_reports) == 2
+    for load_report in load_reports:
+        assert sum(report['num_items'] for report in load_report) == 10
+
+
+def test_invalid_load_balancing(sampler):
+    with pytest.raises(ValueError):
+        sampler.load_balancing = 'bad'
+    with pytest.raises(ValueError):
+        sampler.sample(5, 3, 1, 0.5, distributed=True,
+                       load_balancing='dynamic')
+
+
+@pytest.mark.parametrize('kernel_scaling', ['fixed', 'adaptive'])
+def test_kernel_scaling(sampler, kernel_scaling):
+    np.random.seed(0)
+    step_list = sampler.sample(20, 4, 2, None, ess_threshold=10,
+                               kernel_scaling=kernel_scaling)
+    scales = sampler.get_kernel_scales()
+    assert len(scales) == len(step_list) - 1
+    assert scales[0] == 1.
+    if kernel_scaling == 'fixed':
+        assert all(scale == 1. for scale in scales)
+    else:
+        assert len(set(scales)) > 1
+
+
+def test_invalid_kernel_scaling(sampler):
+    with pytest.raises(ValueError):
+        sampler.kernel_scaling = 'bad'
+    with pytest.raises(ValueError):
+        sampler.sample(5, 3, 1, 0.5, kernel_scaling='adaptive',
+                       target_acceptance=1.)
+
+
+def test_adaptive_mcmc_steps(sampler):
+    np.random.seed(0)
+    step_list = sampler.sample(20, 4, 2, None, ess_threshold=10,
+                               mcmc_step_control='adaptive',
+                               max_mcmc_steps=6)
+    counts = sampler.get_mcmc_step_counts()
+    assert len(counts) == len(step_list) - 1
+    assert all(2 <= count <= 6 for count in counts)
+
+
+def test_invalid_mcmc_step_control(sampler):
+    with pytest.raises(ValueError):
+        sampler.mcmc_step_control = 'bad'
+    with pytest.raises(ValueError):
+        sampler.sample(5, 3, 2, 0.5, mcmc_step_control='adaptive',
+                       max_mcmc_steps=1)
+
+
+@pytest.mark.parametrize('distributed', [False, True])
+def test_process_pool_sampling(make_sampler, distributed):
+    np.random.seed(0)
+    sampler = make_sampler(num_processes=2)
+    step_list = sampler.sample(10, 4, 1, None, ess_threshold=10,
+                               distributed=distributed)
+    assert len(step_list) == 3
+    for step in step_list:
+        assert step.get_num_particles() == 10
+        assert len(np.unique(step.get_params('a'))) > 1
+    assert sampler._size == 2 and sampler._rank == 0
+
+
+def test_threaded_sampling(make_sampler):
+    sampler = make_sampler(num_processes=2, num_threads=2)
+    assert isinstance(sampler._mcmc.model, ThreadedModel)
+    step_list = sampler.sample(10, 3, 1, None, ess_threshold=10)
+    assert len(step_list) == 2
+    assert step_list[-1].get_num_particles() == 10
+
+
+def test_invalid_distributed(sampler):
+    with pytest.raises(TypeError):
+        sampler.distributed = 1
+
+
+def test_unicode_resampling_scheme(sampler):
+    sampler.resampling_scheme = u'stratified'
+    assert sampler.resampling_scheme == 'stratified'
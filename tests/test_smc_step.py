@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+from smcpy.smc.smc_step import SMCStep
 
 arr_alm_eq = np.testing.assert_array_almost_equal
 
@@ -10,12 +11,44 @@ def test_add_particle(filled_step, particle):
     assert len(filled_step.particles) == orig_num_particles + 1
 
 
+def test_add_particle_appends_to_storage(filled_step, particle):
+    particle_array = filled_step.get_particle_array()
+    particles = filled_step.get_particles()
+    filled_step.add_particle(particle)
+    assert filled_step.get_particle_array() is particle_array
+    assert filled_step.get_particles()[-1] is particle
+    assert particle.is_view()
+    particle.log_weight = 1.
+    assert filled_step.get_log_weights()[-1] == 1.
+    assert particles[0].params == particle_array.get_param_dict(0)
+
+
+def test_add_particle_to_empty_step(step_tester, particle):
+    for _ in range(3):
+        step_tester.add_particle(particle.copy())
+    assert step_tester.get_num_particles() == 3
+
+
 def test_copy_step(filled_step):
     filled_step_copy = filled_step.copy()
     filled_step_copy.particles == []
     assert filled_step.particles != []
 
 
+def test_copy_step_is_independent(filled_step):
+    filled_step_copy = filled_step.copy()
+    filled_step.get_particles()[0].log_weight = 1.
+    assert filled_step_copy.get_log_weights()[0] == 0.2
+
+
+def test_copy_step_pickles_without_views(filled_step):
+    import pickle
+    filled_step.get_particles()
+    step = pickle.loads(pickle.dumps(filled_step))
+    step.get_particles()[0].log_weight = 1.
+    assert step.get_log_weights()[0] == 1.
+
+
 def test_type_error_when_particle_not_list(step_tester):
     with pytest.raises(TypeError):
         step_tester.set_particles("Bad param type")
@@ -45,11 +78,11 @@ def test_get_mean(filled_step):
 
 
 def test_get_std_dev(mixed_step):
-    assert mixed_step.get_std_dev()['a'] == np.sqrt(0.3)
+    assert mixed_step.get_std_dev()['a'] == pytest.approx(np.sqrt(0.3))
 
 
 def test_get_variance(mixed_step):
-    assert mixed_step.get_variance()['a'] == 0.3
+    assert mixed_step.get_variance()['a'] == pytest.approx(0.3)
 
 
 def test_get_log_weights(filled_step):
@@ -67,6 +100,13 @@ def test_get_covariance(linear_step):
     arr_alm_eq(linear_step.get_covariance(), exp_cov)
 
 
+def test_get_factorized_covariance(linear_step):
+    factorized = linear_step.get_factorized_covariance()
+    arr_alm_eq(factorized.covariance, linear_step.get_covariance())
+    arr_alm_eq(np.dot(factorized.cholesky, factorized.cholesky.T),
+               factorized.covariance)
+
+
 def test_normalize_step_log_weights(mixed_weight_step):
     mixed_weight_step.normalize_step_log_weights()
     for index, p in enumerate(mixed_weight_step.particles):
@@ -107,4 +147,66 @@ def test_resample_uniform(mixed_step):
 def test_print_particle_info(filled_step, capfd):
     filled_step.print_particle_info(3)
     out, err = capfd.readouterr()
-    assert "params = {'a': 1, 'b': 2}" in out
+    assert "params = {'a': 1.0, 'b': 2.0}" in out
+
+
+def test_set_particles_binds_particles_to_step(filled_step, particle_list):
+    particle_list[0].log_weight = 1.
+    assert filled_step.get_log_weights()[0] == 1.
+
+
+def test_set_particles_copies_views_of_other_steps(filled_step):
+    other_step = SMCStep()
+    particles = filled_step.get_particles()
+    other_step.set_particles(particles)
+    other_step.get_particles()[0].log_weight = 1.
+    assert filled_step.get_log_weights()[0] != 1.
+    particles[0].log_weight = 2.
+    assert filled_step.get_log_weights()[0] == 2.
+    assert other_step.get_log_weights()[0] != 2.
+
+
+def test_get_param_names(filled_step):
+    assert sorted(filled_step.get_param_names()) == ['a', 'b']
+
+
+def test_get_covariance_ordering(linear_step):
+    names = linear_step.get_param_names()
+    cov = linear_step.get_covariance()
+    var = linear_step.get_variance()
+    arr_alm_eq(np.diag(cov), [var[key] for key in names])
+
+
+def test_get_moments_is_cached(linear_step):
+    assert linear_step.get_moments() is linear_step.get_moments()
+
+
+def test_get_moments_updates_with_weights(linear_step):
+    first_mean = linear_step.get_mean()['a']
+    linear_step.get_particles()[0].log_weight = 10.
+    assert linear_step.get_mean()['a'] != first_mean
+
+
+def test_get_factorized_covariance_is_cached(linear_step):
+    factorized = linear_step.get_factorized_covariance()
+    assert linear_step.get_factorized_covariance() is factorized
+    linear_step.get_covariance()[0, 0] = 100.
+    assert linear_step.get_covariance()[0, 0] != 100.
+    linear_step.get_particles()[0].log_weight = 10.
+    updated = linear_step.get_factorized_covariance()
+    assert updated is not factorized
+    arr_alm_eq(updated.covariance, linear_step.get_moments().covariance)
+
+
+@pytest.mark.parametrize('scheme', ['stratified', 'systematic', 'residual'])
+def test_resample_schemes(mixed_step, scheme):
+    mixed_step.resample(scheme)
+    assert mixed_step.get_num_particles() == 5
+    np.testing.assert_array_almost_equal(mixed_step.get_log_weights(),
+                                         [np.log(0.2)] * 5)
+
+
+def test_temperature_copied_with_step(filled_step):
+    assert filled_step.get_temperature() is None
+    filled_step.set_temperature(0.5)
+    assert filled_step.copy().get_temperature() == 0.5
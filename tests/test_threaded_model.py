@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import threading
+import time
+from smcpy.model.base_model import BaseModel, evaluate_model_batch
+from smcpy.model.threaded_model import ThreadedModel
+from smcpy.utils.process_comm import ProcessPool
+
+
+class SleepingModel(BaseModel):
+
+    def __init__(self, delay=0.):
+        self.delay = delay
+        self.thread_names = set()
+
+    def evaluate(self, *args, **kwargs):
+        params = self.process_args(args, kwargs)
+        self.thread_names.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        return np.array([params['a'], params['a'] * params['b']])
+
+
+@pytest.fixture
+def param_matrix():
+    return np.random.RandomState(0).uniform(0, 1, (9, 2))
+
+
+def test_evaluate_batch_matches_serial(param_matrix):
+    model = SleepingModel()
+    threaded = ThreadedModel(model, num_threads=4)
+    outputs = evaluate_model_batch(threaded, param_matrix, ['a', 'b'])
+    assert 'MainThread' not in model.thread_names
+    expected = evaluate_model_batch(model, param_matrix, ['a', 'b'])
+    np.testing.assert_array_equal(outputs, expected)
+
+
+def test_batches_run_concurrently(param_matrix):
+    threaded = ThreadedModel(SleepingModel(delay=0.02), num_threads=9)
+    start = time.time()
+    threaded.evaluate_batch(param_matrix, ['a', 'b'])
+    assert time.time() - start < 9 * 0.02
+
+
+def test_single_row_and_empty_batches(param_matrix):
+    threaded = ThreadedModel(SleepingModel(), num_threads=2)
+    assert threaded.evaluate_batch(param_matrix[:1], ['a', 'b']).shape == \
+        (1, 2)
+    assert evaluate_model_batch(threaded, param_matrix[:0], ['a', 'b']).size \
+        == 0
+
+
+def test_delegates_to_wrapped_model():
+    model = SleepingModel(delay=0.5)
+    threaded = ThreadedModel(model, num_threads=2)
+    assert threaded.delay == 0.5
+    assert threaded.model is model
+    np.testing.assert_array_equal(threaded.evaluate(a=2., b=3.), [2., 6.])
+
+
+def test_pool_restarted_in_forked_process(param_matrix):
+    threaded = ThreadedModel(SleepingModel(), num_threads=2)
+    expected = threaded.evaluate_batch(param_matrix, ['a', 'b'])
+
+    def run(comm):
+        return comm.gather(threaded.evaluate_batch(param_matrix, ['a', 'b']))
+
+    for outputs in ProcessPool(2).run(run):
+        np.testing.assert_array_equal(outputs, expected)
+
+
+def test_close_and_reuse(param_matrix):
+    threaded = ThreadedModel(SleepingModel(), num_threads=2)
+    threaded.evaluate_batch(param_matrix, ['a', 'b'])
+    threaded.close()
+    assert threaded.evaluate_batch(param_matrix, ['a', 'b']).shape == (9, 2)
+
+
+def test_invalid_num_threads():
+    with pytest.raises(ValueError):
+        ThreadedModel(SleepingModel(), num_threads=0)
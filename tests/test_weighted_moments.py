@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from smcpy.utils.weighted_moments import WeightedMoments
+
+arr_alm_eq = np.testing.assert_array_almost_equal
+
+
+@pytest.fixture
+def samples():
+    np.random.seed(0)
+    params = np.random.normal(0, 1, (200, 3))
+    weights = np.random.uniform(0, 1, 200)
+    return params, weights / np.sum(weights)
+
+
+def expected_covariance(params, weights):
+    return np.cov(params, rowvar=False, aweights=weights)
+
+
+def test_update_matches_numpy(samples):
+    params, weights = samples
+    moments = WeightedMoments(3)
+    moments.update(params, weights)
+    arr_alm_eq(moments.mean, np.average(params, axis=0, weights=weights))
+    arr_alm_eq(moments.covariance, expected_covariance(params, weights))
+    arr_alm_eq(moments.variance, np.diag(moments.covariance))
+    arr_alm_eq(moments.std_dev, np.sqrt(np.diag(moments.covariance)))
+
+
+def test_merge_matches_single_update(samples):
+    params, weights = samples
+    moments_1 = WeightedMoments(3)
+    moments_1.update(params[:50], weights[:50])
+    moments_2 = WeightedMoments(3)
+    moments_2.update(params[50:], weights[50:])
+    moments_1.merge(moments_2)
+    arr_alm_eq(moments_1.mean, np.average(params, axis=0, weights=weights))
+    arr_alm_eq(moments_1.covariance, expected_covariance(params, weights))
+
+
+def test_from_log_weights(samples):
+    params, weights = samples
+    moments = WeightedMoments.from_log_weights(params, np.log(weights) + 700)
+    arr_alm_eq(moments.covariance, expected_covariance(params, weights))
+
+
+def test_large_offset_is_stable():
+    params = 1e9 + np.array([[4.], [7.], [13.], [16.]])
+    weights = np.ones(4) / 4.
+    moments = WeightedMoments(1)
+    moments.update(params, weights)
+    assert moments.variance[0] == pytest.approx(30.)
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+import time
+from smcpy.utils.single_rank_comm import SingleRankComm
+from smcpy.utils.work_queue import WorkQueue, compute_idle_fraction
+from thread_comm import run_on_ranks
+
+
+def test_map_single_rank():
+    work_queue = WorkQueue(SingleRankComm(), chunk_size=3)
+    results = work_queue.map(lambda start, stop: range(start, stop), 10)
+    assert results == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    assert len(work_queue.load_report) == 1
+    assert work_queue.load_report[0]['num_chunks'] == 4
+    assert work_queue.load_report[0]['num_items'] == 10
+
+
+def test_map_no_items():
+    work_queue = WorkQueue(SingleRankComm())
+    assert work_queue.map(lambda start, stop: None, 0) == []
+
+
+def test_guided_chunks_shrink():
+    work_queue = WorkQueue(SingleRankComm())
+    chunks = work_queue.map(lambda start, stop: stop - start, 100)
+    assert sum(chunks) == 100
+    assert chunks == sorted(chunks, reverse=True)
+    assert chunks[-1] == 1
+
+
+@pytest.mark.parametrize('chunk_size', [None, 2])
+def test_map_multi_rank(chunk_size):
+
+    def run(comm):
+        work_queue = WorkQueue(comm, chunk_size=chunk_size)
+        results = work_queue.map(lambda start, stop: np.arange(start, stop),
+                                 50)
+        return results, work_queue.load_report
+
+    results = run_on_ranks(3, run)
+    assert results[1] == (None, None)
+    assert results[2] == (None, None)
+    chunks, load_report = results[0]
+    np.testing.assert_array_equal(np.concatenate(chunks), np.arange(50))
+    assert len(load_report) == 3
+    assert sum(report['num_items'] for report in load_report) == 50
+
+
+def test_slow_rank_processes_fewer_items():
+
+    def run(comm):
+        delay = 0.02 if comm.Get_rank() == 1 else 0.
+
+        def process(start, stop):
+            time.sleep(delay + 0.001)
+            return stop - start
+
+        work_queue = WorkQueue(comm, chunk_size=1)
+        work_queue.map(process, 40)
+        return work_queue.load_report
+
+    load_report = run_on_ranks(3, run)[0]
+    items = [report['num_items'] for report in load_report]
+    assert sum(items) == 40
+    assert items[1] < items[2]
+
+
+def test_invalid_chunk_size():
+    with pytest.raises(ValueError):
+        WorkQueue(SingleRankComm(), chunk_size=0)
+
+
+def test_compute_idle_fraction():
+    load_report = [{'busy_time': 3., 'idle_time': 1.},
+                   {'busy_time': 4., 'idle_time': 0.}]
+    assert compute_idle_fraction(load_report) == pytest.approx(0.125)
+    assert compute_idle_fraction([{'busy_time': 0., 'idle_time': 0.}]) == 0.
+
+
+def test_map_sends_chunk_inputs():
+    items = np.arange(30) * 10
+
+    def run(comm):
+        loaded = []
+
+        def load_chunk(start, stop):
+            loaded.append((start, stop))
+            return items[start:stop]
+
+        work_queue = WorkQueue(comm, chunk_size=4)
+        results = work_queue.map(lambda start, stop, chunk: chunk + 1, 30,
+                                 load_chunk)
+        return results, loaded
+
+    results = run_on_ranks(3, run)
+    np.testing.assert_array_equal(np.concatenate(results[0][0]), items + 1)
+    assert len(results[0][1]) == 8
+    assert results[1] == (None, []) and results[2] == (None, [])
+
+
+def test_uniform_work_is_shared_evenly():
+
+    def run(comm):
+
+        def process(start, stop):
+            time.sleep(0.002 * (stop - start))
+            return stop - start
+
+        work_queue = WorkQueue(comm)
+        work_queue.map(process, 200)
+        return work_queue.load_report
+
+    load_report = run_on_ranks(4, run)[0]
+    items = [report['num_items'] for report in load_report]
+    assert sum(items) == 200
+    assert max(items) < 2 * min(items)
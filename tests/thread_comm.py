@@ -0,0 +1,171 @@
+import Queue
+import threading
+import numpy as np
+from smcpy.utils import mpi_ops
+
+
+def _reduce(values, op):
+    for reduce_op, function in [(mpi_ops.SUM, np.sum), (mpi_ops.MAX, np.max),
+                                (mpi_ops.MIN, np.min)]:
+        if op == reduce_op:
+            return function(values, axis=0)
+    raise ValueError('unsupported reduction %s' % op)
+
+
+class ThreadCommWorld(object):
+    '''
+    Shared state for a group of ThreadComm instances. Emulates an mpi
+    communicator with one thread per rank so that multi-rank code paths can
+    be tested without mpi4py.
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self._slots = [None] * size
+        self._mailboxes = {}
+        self._mailbox_lock = threading.Lock()
+        self._inboxes = {}
+        self._inbox_condition = threading.Condition()
+        self._condition = threading.Condition()
+        self._count = 0
+        self._generation = 0
+
+    def barrier(self):
+        with self._condition:
+            generation = self._generation
+            self._count += 1
+            if self._count == self.size:
+                self._count = 0
+                self._generation += 1
+                self._condition.notify_all()
+            else:
+                while generation == self._generation:
+                    self._condition.wait()
+
+    def mailbox(self, source, dest, tag):
+        with self._mailbox_lock:
+            key = (source, dest, tag)
+            if key not in self._mailboxes:
+                self._mailboxes[key] = Queue.Queue()
+            return self._mailboxes[key]
+
+    def post(self, source, dest, tag, obj):
+        with self._inbox_condition:
+            self._inboxes.setdefault((dest, tag), []).append((source, obj))
+            self._inbox_condition.notify_all()
+
+    def take(self, dest, tag, source, block=True):
+        '''
+        Removes and returns the oldest (source, obj) message matching source
+        (or any source); returns None if block is False and there is none.
+        '''
+        with self._inbox_condition:
+            while True:
+                inbox = self._inboxes.setdefault((dest, tag), [])
+                for i, (message_source, obj) in enumerate(inbox):
+                    if source in (mpi_ops.ANY_SOURCE, message_source):
+                        return inbox.pop(i) if block else (message_source, obj)
+                if not block:
+                    return None
+                self._inbox_condition.wait(60)
+
+    def exchange(self, rank, value):
+        self._slots[rank] = value
+        self.barrier()
+        values = list(self._slots)
+        self.barrier()
+        return values
+
+
+class ThreadComm(object):
+
+    def __init__(self, world, rank):
+        self._world = world
+        self._rank = rank
+
+    def Get_rank(self):
+        return self._rank
+
+    def Get_size(self):
+        return self._world.size
+
+    def bcast(self, obj, root=0):
+        return self._world.exchange(self._rank, obj)[root]
+
+    def scatter(self, scatter_list, root=0):
+        return self._world.exchange(self._rank, scatter_list)[root][self._rank]
+
+    def gather(self, obj, root=0):
+        values = self._world.exchange(self._rank, obj)
+        return values if self._rank == root else None
+
+    def allgather(self, obj):
+        return self._world.exchange(self._rank, obj)
+
+    def Allreduce(self, sendbuf, recvbuf, op=mpi_ops.SUM):
+        values = self._world.exchange(self._rank, np.array(sendbuf))
+        recvbuf[...] = _reduce(values, op)
+
+    def Exscan(self, sendbuf, recvbuf, op=mpi_ops.SUM):
+        values = self._world.exchange(self._rank, np.array(sendbuf))
+        if self._rank > 0:
+            recvbuf[...] = _reduce(values[:self._rank], op)
+
+    def Send(self, buf, dest, tag=0):
+        self._world.mailbox(self._rank, dest, tag).put(np.array(buf))
+
+    def Recv(self, buf, source, tag=0):
+        buf[...] = self._world.mailbox(source, self._rank, tag).get(timeout=60)
+
+    def send(self, obj, dest, tag=0):
+        self._world.post(self._rank, dest, tag, obj)
+
+    def recv(self, source=mpi_ops.ANY_SOURCE, tag=0):
+        return self._world.take(self._rank, tag, source)[1]
+
+    def iprobe(self, source=mpi_ops.ANY_SOURCE, tag=0):
+        return self._world.take(self._rank, tag, source, block=False) \
+            is not None
+
+    def Scatterv(self, sendbuf, recvbuf, root=0):
+        values = self._world.exchange(self._rank, sendbuf)
+        array, (counts, displacements) = values[root]
+        start = displacements[self._rank]
+        stop = start + counts[self._rank]
+        recvbuf.reshape(-1)[:] = np.ravel(array)[start:stop]
+
+    def Gatherv(self, sendbuf, recvbuf, root=0):
+        values = self._world.exchange(self._rank, np.array(sendbuf))
+        if self._rank == root:
+            array, (counts, displacements) = recvbuf
+            flat = array.reshape(-1)
+            for value, count, start in zip(values, counts, displacements):
+                flat[start:start + count] = np.ravel(value)
+
+
+def run_on_ranks(size, function):
+    '''
+    Calls function(comm) on <size> threads, one per emulated rank, and
+    returns the list of results ordered by rank. Exceptions raised on any
+    rank are re-raised.
+    '''
+    world = ThreadCommWorld(size)
+    results = [None] * size
+    errors = []
+
+    def target(rank):
+        try:
+            results[rank] = function(ThreadComm(world, rank))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=target, args=(rank,))
+               for rank in range(size)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    if errors:
+        raise errors[0]
+    return results